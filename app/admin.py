@@ -1,43 +1,161 @@
 from django.contrib import admin
-from .models import Seller, CreditRequest, CreditTransaction, PhoneNumber, RechargeSale
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+from .db_routing import MAX_ROW_ID, place_new_seller, shard_for_id
+from .fields import normalize_msisdn
+from .models import Seller, CreditRequest, CreditTransaction, PhoneNumber, RechargeSale, BalanceHold, TopUpDispatch, Job
+
+
+def estimated_row_count(queryset):
+    # table size without scanning the table; None when no estimate is available
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # -1 / 0 until the table has been analyzed
+        return row[0] if row and row[0] > 0 else None
+    # highest primary key is one index probe; over-counts deleted rows
+    return queryset.model._default_manager.using(queryset.db).aggregate(top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    # exact COUNT(*) over a ledger with millions of rows takes seconds per page view
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list)
+            if estimate is not None and estimate >= self.count_limit:
+                return estimate
+        # filtered (or small) lists: count at most count_limit rows
+        return self.object_list[:self.count_limit].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # changelists that stay usable on very large tables: estimated counts, no
+    # full-table count next to the filtered one, newest-first along the primary key
+    # and no date_hierarchy (it aggregates dates over the whole table)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-id']
+    # numeric search terms become exact, index-backed lookups on these fields
+    search_id_fields = ['id', 'seller_id']
+    # phone numbers in any format ('09120000001' is all digits too) also match this foreign key
+    search_phone_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        lookups = Q()
+        if self.search_phone_field:
+            try:
+                phones = PhoneNumber.objects.filter(msisdn=normalize_msisdn(term))
+                lookups |= Q((f'{self.search_phone_field}__in', phones))
+            except ValueError:
+                pass
+        if term.isdigit() and int(term) <= MAX_ROW_ID:
+            lookups |= Q.create([(field, int(term)) for field in self.search_id_fields], connector=Q.OR)
+        if lookups:
+            return queryset.filter(lookups), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Seller)
 class SellerAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'balance', 'created_at']
+    list_display = ['id', 'name', 'balance', 'held_balance', 'daily_sales_limit', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name']
     readonly_fields = ['created_at']
 
+    def get_object(self, request, object_id, from_field=None):
+        # the changelist lists the default shard; a seller's own pages follow its id
+        try:
+            return self.get_queryset(request).using(shard_for_id(object_id)).get(pk=object_id)
+        except (Seller.DoesNotExist, ValidationError, ValueError):
+            return None
+
+    def save_model(self, request, obj, form, change):
+        obj.save(using=None if change else place_new_seller(obj.name))
+
 
 @admin.register(CreditRequest)
-class CreditRequestAdmin(admin.ModelAdmin):
+class CreditRequestAdmin(LargeTableAdmin):
     list_display = ['id', 'seller', 'amount', 'status', 'created_at', 'approved_at']
     list_filter = ['status', 'created_at']
+    list_select_related = ['seller']
     search_fields = ['seller__name']
+    autocomplete_fields = ['seller']
     readonly_fields = ['created_at', 'approved_at']
-    date_hierarchy = 'created_at'
 
 
 @admin.register(CreditTransaction)
-class CreditTransactionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'seller', 'amount', 'transaction_type', 'balance_after', 'created_at']
+class CreditTransactionAdmin(LargeTableAdmin):
+    list_display = ['id', 'seller', 'sequence', 'amount', 'transaction_type', 'balance_after', 'created_at']
     list_filter = ['transaction_type', 'created_at']
+    list_select_related = ['seller']
     search_fields = ['seller__name']
+    search_id_fields = ['id', 'seller_id', 'reference_id']
+    autocomplete_fields = ['seller']
     readonly_fields = ['created_at']
-    date_hierarchy = 'created_at'
 
 
 @admin.register(PhoneNumber)
 class PhoneNumberAdmin(admin.ModelAdmin):
-    list_display = ['id', 'phone_number', 'is_active', 'created_at']
+    list_display = ['id', 'phone_number', 'msisdn', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['phone_number']
+    readonly_fields = ['msisdn']
+
+    def get_search_results(self, request, queryset, search_term):
+        # a phone number in any format is one probe of the msisdn index
+        try:
+            return queryset.filter(msisdn=normalize_msisdn(search_term)), False
+        except ValueError:
+            return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(RechargeSale)
-class RechargeSaleAdmin(admin.ModelAdmin):
+class RechargeSaleAdmin(LargeTableAdmin):
     list_display = ['id', 'seller', 'phone_number', 'amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
+    list_select_related = ['seller', 'phone_number']
     search_fields = ['seller__name', 'phone_number__phone_number']
-    date_hierarchy = 'created_at'
+    search_phone_field = 'phone_number'
+    autocomplete_fields = ['seller', 'phone_number']
+
+
+@admin.register(BalanceHold)
+class BalanceHoldAdmin(LargeTableAdmin):
+    list_display = ['id', 'seller', 'phone_number', 'amount', 'status', 'expires_at', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['seller', 'phone_number']
+    search_fields = ['seller__name']
+    search_phone_field = 'phone_number'
+    autocomplete_fields = ['seller', 'phone_number']
+    raw_id_fields = ['recharge_sale']
+    readonly_fields = ['created_at', 'resolved_at']
+
+
+@admin.register(TopUpDispatch)
+class TopUpDispatchAdmin(LargeTableAdmin):
+    list_display = ['id', 'recharge_sale', 'provider', 'status', 'attempts', 'next_attempt_at', 'updated_at']
+    list_filter = ['status', 'provider']
+    search_id_fields = ['id', 'recharge_sale_id']
+    raw_id_fields = ['recharge_sale']
+    readonly_fields = ['created_at', 'updated_at', 'claimed_at']
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['id', 'task', 'status', 'priority', 'attempts', 'run_at', 'locked_by', 'finished_at']
+    list_filter = ['status', 'task']
+    search_id_fields = ['id']
+    readonly_fields = ['created_at', 'locked_by', 'locked_at', 'finished_at']
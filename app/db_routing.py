@@ -0,0 +1,169 @@
+import functools
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+# seller-scoped rows (sellers, credit requests, ledger, sales, holds, dispatches) get ids
+# from a per-shard range: shard i of SELLER_SHARDS allocates [i * SPAN, (i + 1) * SPAN),
+# so any seller-scoped id names its shard without a lookup. see `manage.py init_shards`
+SHARD_ID_SPAN = 10 ** 12
+# ids and columns referring to them are BIGINT
+MAX_ROW_ID = 2 ** 63 - 1
+
+# set inside the read paths that tolerate replication lag
+_replica_reads = ContextVar('replica_reads', default=False)
+# set by the first write of a request; later reads of that request see the write on the primary
+_primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+def seller_shards() -> list:
+    return list(settings.SELLER_SHARDS)
+
+
+def shard_for_id(row_id: int) -> str:
+    # database alias holding a seller-scoped row (seller ids included); ids outside every
+    # shard's range map to the first shard, where the lookup then finds nothing
+    shards = settings.SELLER_SHARDS
+    index = int(row_id) // SHARD_ID_SPAN
+    return shards[index] if 0 <= index < len(shards) else shards[0]
+
+
+def shard_id_offset(alias: str) -> int:
+    return settings.SELLER_SHARDS.index(alias) * SHARD_ID_SPAN
+
+
+def place_new_seller(name: str) -> str:
+    # shard for a new seller, by hash of its name; every seller-creation path writes the
+    # seller with .using(place_new_seller(name)) and its ids then keep it there
+    shards = settings.SELLER_SHARDS
+    return shards[zlib.crc32(name.encode()) % len(shards)]
+
+
+def replica_alias(alias: str) -> str:
+    return REPLICA_DB_ALIAS if alias == DEFAULT_DB_ALIAS else f'{alias}_{REPLICA_DB_ALIAS}'
+
+
+def replica_configured(alias: str = DEFAULT_DB_ALIAS) -> bool:
+    return replica_alias(alias) in connections.settings
+
+
+def _read_alias(alias: str) -> str:
+    if (
+        _replica_reads.get()
+        and not _primary_pinned.get()
+        and replica_configured(alias)
+        and not connections[alias].in_atomic_block
+    ):
+        return replica_alias(alias)
+    return alias
+
+
+def shard_db_for_read(alias: str) -> str:
+    # a shard, or its replica inside replica_reads()
+    return _read_alias(alias)
+
+
+def seller_db_for_read(seller_id: int) -> str:
+    # the seller's shard, or its replica inside replica_reads()
+    return _read_alias(shard_for_id(seller_id))
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads_from_replica(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def primary_pin_scope():
+    # one request (or job): starts unpinned, pinned from its first write on
+    token = _primary_pinned.set(False)
+    try:
+        yield
+    finally:
+        _primary_pinned.reset(token)
+
+
+class ReplicaRouter:
+    # queries without an explicit .using() run on the default database. reads inside
+    # replica_reads() go to its replica alias; everything else, and any read after a write
+    # in the same request or inside a transaction, stays on the primary. without a replica
+    # alias in DATABASES every read goes to the primary. seller-scoped queries pick their
+    # shard with .using(shard_for_id(...)) and related objects follow that instance
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return _read_alias(DEFAULT_DB_ALIAS)
+
+    def db_for_write(self, model, **hints):
+        _primary_pinned.set(True)
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # writes through an object read from a replica go to that replica's primary
+            for alias in settings.SELLER_SHARDS:
+                if instance._state.db == replica_alias(alias):
+                    return alias
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # a shard and its replica hold the same rows
+        return self._primary(obj1._state.db) == self._primary(obj2._state.db) or None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from their primary; every shard has the full schema
+        return not any(db == replica_alias(alias) for alias in settings.SELLER_SHARDS)
+
+    def _primary(self, db):
+        for alias in settings.SELLER_SHARDS:
+            if db == replica_alias(alias):
+                return alias
+        return db
+
+
+class PrimaryPinMiddleware:
+    # scopes the sticky-to-primary flag to one request (worker threads are reused)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with primary_pin_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with primary_pin_scope():
+            return await self.get_response(request)
+
+
+def sync_sqlite_replica(source=DEFAULT_DB_ALIAS, target=REPLICA_DB_ALIAS):
+    # local stand-in for replication: copy the primary SQLite database over the replica file
+    source_connection, target_connection = connections[source], connections[target]
+    source_connection.ensure_connection()
+    target_connection.ensure_connection()
+    source_connection.connection.backup(target_connection.connection)
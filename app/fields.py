@@ -0,0 +1,74 @@
+import re
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from django.conf import settings
+from django.db import models
+
+
+MONEY_DECIMAL_PLACES = 2
+
+
+def to_minor_units(value) -> int:
+    # Decimal('12.34') -> 1234
+    return int(Decimal(value).scaleb(MONEY_DECIMAL_PLACES).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_minor_units(value) -> Decimal:
+    # 1234 -> Decimal('12.34')
+    return Decimal(value).scaleb(-MONEY_DECIMAL_PLACES)
+
+
+_PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+
+
+def normalize_msisdn(value, country_code=None) -> int:
+    # '0912 000 0001', '+98 912 000 0001', '0098 9120000001', '9120000001' -> 989120000001
+    # (E.164 digits as an integer); raises ValueError for anything that is not a phone number
+    country_code = country_code or settings.PHONE_DEFAULT_COUNTRY_CODE
+    digits = _PHONE_SEPARATORS.sub('', str(value))
+    if digits.startswith('+'):
+        digits = digits[1:]
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = country_code + digits[1:]
+    elif len(digits) <= 10:
+        # national number without the trunk 0
+        digits = country_code + digits
+    if not digits.isdigit() or not 8 <= len(digits) <= 15:
+        raise ValueError(f"{value!r} is not a valid phone number")
+    return int(digits)
+
+
+class MoneyField(models.DecimalField):
+    """
+    Decimal in Python, forms and serializers; a BIGINT count of minor units in
+    the database, so sums are exact integer aggregates on every backend.
+
+    Avoid F() arithmetic with plain Decimal operands on these columns: combine
+    with Value(to_minor_units(amount), output_field=MoneyField()) instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_digits', 15)
+        kwargs.setdefault('decimal_places', MONEY_DECIMAL_PLACES)
+        super().__init__(*args, **kwargs)
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return from_minor_units(value)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return value
+        return to_minor_units(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        return value
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from decimal import Decimal
+from app.db_routing import place_new_seller
+from app.fields import normalize_msisdn
 from app.models import Seller, PhoneNumber
 
 
@@ -10,7 +12,7 @@ class Command(BaseCommand):
         self.stdout.write('Creating sample data...')
         
         # Create sample sellers
-        seller1, created = Seller.objects.get_or_create(
+        seller1, created = Seller.objects.using(place_new_seller("Seller 1")).get_or_create(
             name="Seller 1",
             defaults={'balance': Decimal('1000000.00')}
         )
@@ -19,7 +21,7 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.WARNING(f'Seller already exists: {seller1.name} (ID: {seller1.id})'))
         
-        seller2, created = Seller.objects.get_or_create(
+        seller2, created = Seller.objects.using(place_new_seller("Seller 2")).get_or_create(
             name="Seller 2",
             defaults={'balance': Decimal('500000.00')}
         )
@@ -40,8 +42,8 @@ class Command(BaseCommand):
         created_count = 0
         for phone_num in phone_numbers:
             phone, created = PhoneNumber.objects.get_or_create(
-                phone_number=phone_num,
-                defaults={'is_active': True}
+                msisdn=normalize_msisdn(phone_num),
+                defaults={'phone_number': phone_num, 'is_active': True}
             )
             if created:
                 created_count += 1
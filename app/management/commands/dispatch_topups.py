@@ -0,0 +1,31 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from app.services.topup_dispatcher import TopUpDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Sends pending recharge sales to the top-up provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='exit once nothing is due instead of polling')
+        parser.add_argument('--claim-batch', type=int, default=200, help='max sales in flight at once (default: 200)')
+        parser.add_argument('--poll-interval', type=float, default=0.5, help='seconds between polls when idle (default: 0.5)')
+
+    def handle(self, *args, **options):
+        dispatcher = TopUpDispatcher(claim_batch=options['claim_batch'], poll_interval=options['poll_interval'])
+        asyncio.run(self._run(dispatcher, options['once']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {dispatcher.stats['completed']}, retried {dispatcher.stats['retried']}, "
+            f"failed {dispatcher.stats['failed']} top-ups"
+        ))
+
+    async def _run(self, dispatcher, once):
+        # finish in-flight batches on SIGINT/SIGTERM instead of leaving them to the lease
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await dispatcher.run(stop, until_idle=once)
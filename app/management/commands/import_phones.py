@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.phone_import import PhoneImportService
+
+
+class Command(BaseCommand):
+    help = 'Imports phone numbers from a CSV (number[,active]) or a plain list, one number per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="file to read, or - for stdin")
+        parser.add_argument('--batch-size', type=int, default=5000, help='numbers written per chunk (default: 5000)')
+        state = parser.add_mutually_exclusive_group()
+        state.add_argument('--activate', dest='active', action='store_const', const=True, help='mark every listed number active')
+        state.add_argument('--deactivate', dest='active', action='store_const', const=False, help='mark every listed number inactive')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        def progress(result):
+            self.stdout.write(f'{result.rows} rows, {result.rows_per_second:.0f} rows/s')
+
+        if options['path'] == '-':
+            result = self._import(sys.stdin, options, progress)
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8') as lines:
+                    result = self._import(lines, options, progress)
+            except OSError as e:
+                raise CommandError(str(e))
+
+        for sample in result.invalid_samples:
+            self.stdout.write(self.style.WARNING(f'Invalid row: {sample}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows} rows in {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/s): '
+            f'{result.inserted} inserted, {result.existing} already known, {result.toggled} toggled, '
+            f'{result.duplicates} duplicates, {result.invalid} invalid'
+        ))
+
+    def _import(self, lines, options, progress):
+        return PhoneImportService.import_lines(
+            lines, batch_size=options['batch_size'], active=options['active'],
+            progress=progress if options['verbosity'] > 1 else None
+        )
@@ -0,0 +1,52 @@
+from itertools import islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from app.db_routing import seller_shards, shard_id_offset
+from app.models import Seller, CreditRequest, CreditTransaction, RechargeSale, BalanceHold, TopUpDispatch, PhoneNumber
+
+# tables whose ids must come from the shard's id range
+SHARDED_MODELS = [Seller, CreditRequest, CreditTransaction, RechargeSale, BalanceHold, TopUpDispatch]
+PHONE_COPY_CHUNK = 1000
+
+
+class Command(BaseCommand):
+    help = 'Migrates every seller shard, moves its id sequences into its range and copies phone numbers'
+
+    def handle(self, *args, **options):
+        for db in seller_shards():
+            call_command('migrate', database=db, verbosity=0)
+            offset = shard_id_offset(db)
+            if offset:
+                for model in SHARDED_MODELS:
+                    self.start_ids_at(db, model, offset)
+            if db != DEFAULT_DB_ALIAS:
+                self.copy_phone_numbers(db)
+            self.stdout.write(self.style.SUCCESS(f'Shard {db}: ids from {offset}'))
+
+    def start_ids_at(self, db, model, offset):
+        # only ever moves a sequence forward
+        table = model._meta.db_table
+        current = model.objects.using(db).aggregate(top=Max('id'))['top'] or 0
+        if current >= offset:
+            return
+
+        connection = connections[db]
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, false)", [table, offset])
+            elif connection.vendor == 'sqlite':
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", [table])
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, offset - 1])
+            else:
+                raise NotImplementedError(f"No id range support for {connection.vendor}")
+
+    def copy_phone_numbers(self, db):
+        # streamed in chunks: the phone table can hold millions of rows. rows already on the
+        # shard are skipped; saves and imports on default keep them current from then on
+        phones = PhoneNumber.objects.using(DEFAULT_DB_ALIAS).order_by('id').iterator(chunk_size=PHONE_COPY_CHUNK)
+        for chunk in iter(lambda: list(islice(phones, PHONE_COPY_CHUNK)), []):
+            PhoneNumber.objects.using(db).bulk_create(chunk, ignore_conflicts=True)
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.services.spending_limits import SpendingLimits
+
+
+class Command(BaseCommand):
+    help = 'Deletes daily spending counters of past days, on every shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SPENDING_COUNTER_RETENTION_DAYS,
+            help=f'days of counters to keep (default: SPENDING_COUNTER_RETENTION_DAYS, {settings.SPENDING_COUNTER_RETENTION_DAYS})'
+        )
+
+    def handle(self, *args, **options):
+        deleted = SpendingLimits.purge_expired(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} spending counters'))
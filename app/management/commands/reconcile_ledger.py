@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.db_routing import seller_shards
+from app.services.credit_service import CreditService
+
+
+class Command(BaseCommand):
+    help = 'Checks every seller balance against its ledger sum, shard by shard'
+
+    def handle(self, *args, **options):
+        mismatched = 0
+        for db in seller_shards():
+            mismatches = CreditService.find_accounting_mismatches(db)
+            for row in mismatches:
+                self.stdout.write(self.style.ERROR(
+                    f"{db}: seller {row['id']} balance {row['balance']} != ledger {row['calculated_balance']}"
+                ))
+            mismatched += len(mismatches)
+
+        if mismatched:
+            raise CommandError(f'{mismatched} sellers do not match their ledger')
+        self.stdout.write(self.style.SUCCESS('All seller balances match their ledgers'))
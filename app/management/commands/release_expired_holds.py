@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.hold_service import HoldService
+
+
+class Command(BaseCommand):
+    help = 'Releases balance holds that are past their expiry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='holds released per pass (default: 500)')
+        parser.add_argument('--loop', action='store_true', help='keep sweeping instead of a single pass')
+        parser.add_argument('--interval', type=float, default=10.0, help='seconds between passes with --loop (default: 10)')
+
+    def handle(self, *args, **options):
+        while True:
+            # drain everything that is already expired before sleeping
+            released = 0
+            while True:
+                count = HoldService.release_expired(batch_size=options['batch_size'])
+                released += count
+                if count < options['batch_size']:
+                    break
+
+            if released:
+                self.stdout.write(self.style.SUCCESS(f'Released {released} expired balance holds'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,118 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+def available_cpus():
+    # respects container CPU pinning where the platform exposes it
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers(asgi=False):
+    # sync workers block on the database, so run more of them than cores;
+    # uvicorn workers multiplex connections on an event loop
+    cpus = available_cpus()
+    return cpus if asgi else cpus * 2 + 1
+
+
+def close_db_connections(server, worker):
+    # never let forked workers inherit a connection opened in the master
+    from django.db import connections
+    connections.close_all()
+
+
+def asgi_worker_class():
+    # the worker moved out of uvicorn into the uvicorn-worker package; older installs only
+    # have the deprecated uvicorn.workers copy
+    try:
+        import uvicorn_worker  # noqa: F401
+        return 'uvicorn_worker.UvicornWorker'
+    except ImportError:
+        return 'uvicorn.workers.UvicornWorker'
+
+
+def gunicorn_config(options):
+    # -> (dotted path of the app, gunicorn settings) for the command's options
+    asgi = options['asgi']
+    if asgi:
+        app_path = 'recharge_system.asgi.application'
+        worker_class = asgi_worker_class()
+    else:
+        app_path = 'recharge_system.wsgi.application'
+        worker_class = 'gthread' if options['threads'] > 1 else 'sync'
+
+    config = {
+        'bind': options['bind'],
+        'workers': options['workers'] or default_workers(asgi),
+        'worker_class': worker_class,
+        'threads': options['threads'],
+        'preload_app': options['preload'],
+        'max_requests': options['max_requests'],
+        'max_requests_jitter': options['max_requests_jitter'],
+        'timeout': options['timeout'],
+        'graceful_timeout': options['graceful_timeout'],
+        'keepalive': options['keep_alive'],
+        'pre_fork': close_db_connections,
+        'accesslog': None,
+        'errorlog': '-',
+    }
+    return app_path, config
+
+
+def gunicorn_application(app_path, config):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+
+        def load_config(self):
+            for key, value in config.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return import_string(app_path)
+
+    return Application()
+
+
+class Command(BaseCommand):
+    help = 'Runs the app under a prefork multi-worker gunicorn server (production entry point)'
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default=os.environ.get('SERVE_BIND', '0.0.0.0:8000'),
+                            help='address to listen on (default: 0.0.0.0:8000)')
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVE_WORKERS', '0')),
+                            help='worker processes (default: 2 x CPUs + 1, or CPUs with --asgi)')
+        parser.add_argument('--threads', type=int, default=int(os.environ.get('SERVE_THREADS', '1')),
+                            help='threads per sync worker (default: 1)')
+        parser.add_argument('--asgi', action='store_true', default=os.environ.get('SERVE_ASGI') == 'True',
+                            help='serve the ASGI app with uvicorn workers (needed for the balance stream)')
+        parser.add_argument('--max-requests', type=int, default=int(os.environ.get('SERVE_MAX_REQUESTS', '10000')),
+                            help='restart a worker after this many requests, 0 disables (default: 10000)')
+        parser.add_argument('--max-requests-jitter', type=int, default=int(os.environ.get('SERVE_MAX_REQUESTS_JITTER', '1000')),
+                            help='random extra requests so workers do not restart together (default: 1000)')
+        parser.add_argument('--timeout', type=int, default=int(os.environ.get('SERVE_TIMEOUT', '30')),
+                            help='kill a worker silent for this many seconds (default: 30)')
+        parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('SERVE_GRACEFUL_TIMEOUT', '30')),
+                            help='seconds workers get to finish in-flight requests on restart (default: 30)')
+        parser.add_argument('--keep-alive', type=int, default=int(os.environ.get('SERVE_KEEP_ALIVE', '5')),
+                            help='seconds to hold idle keep-alive connections (default: 5)')
+        parser.add_argument('--no-preload', action='store_false', dest='preload',
+                            help='import the app in each worker instead of once in the master')
+
+    def handle(self, *args, **options):
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            raise CommandError('gunicorn is not installed: pip install -r requirements.txt')
+
+        app_path, config = gunicorn_config(options)
+        application = gunicorn_application(app_path, config)
+        self.stdout.write(
+            f"Serving {app_path} on {config['bind']} with {config['workers']} {config['worker_class']} workers"
+        )
+        application.run()
@@ -0,0 +1,47 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.job_queue import JobService
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10, help='jobs claimed per poll (default: 10)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between polls when idle (default: 1)')
+        parser.add_argument('--once', action='store_true', help='exit once nothing is due instead of polling')
+        parser.add_argument('--worker-id', default=None, help='name recorded on claimed jobs (default: host:pid)')
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or f'{socket.gethostname()}:{os.getpid()}'
+        # finish the job at hand on SIGINT/SIGTERM; the rest of the batch is released right away
+        self.stopping = False
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._stop)
+
+        done = failed = 0
+        while not self.stopping:
+            jobs = JobService.claim(worker_id, batch_size=options['batch_size'])
+            for index, job in enumerate(jobs):
+                if self.stopping:
+                    JobService.release(jobs[index:])
+                    break
+                if JobService.run(job):
+                    done += 1
+                else:
+                    failed += 1
+
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} ran {done} jobs, {failed} failed'))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
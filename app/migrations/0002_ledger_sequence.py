@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+
+def backfill_ledger_sequence(apps, schema_editor):
+    Seller = apps.get_model("app", "Seller")
+    CreditTransaction = apps.get_model("app", "CreditTransaction")
+    db = schema_editor.connection.alias
+
+    for seller_id in Seller.objects.using(db).values_list("id", flat=True).iterator():
+        batch = []
+        sequence = 0
+        for transaction in CreditTransaction.objects.using(db).filter(
+            seller_id=seller_id
+        ).order_by("created_at", "id").only("id").iterator():
+            sequence += 1
+            transaction.sequence = sequence
+            batch.append(transaction)
+            if len(batch) >= 1000:
+                CreditTransaction.objects.using(db).bulk_update(batch, ["sequence"])
+                batch = []
+        if batch:
+            CreditTransaction.objects.using(db).bulk_update(batch, ["sequence"])
+        Seller.objects.using(db).filter(id=seller_id).update(ledger_seq=sequence)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="seller",
+            name="ledger_seq",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="credittransaction",
+            name="sequence",
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(backfill_ledger_sequence, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="credittransaction",
+            name="sequence",
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name="credittransaction",
+            constraint=models.UniqueConstraint(
+                fields=("seller", "sequence"), name="unique_seller_ledger_sequence"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0002_ledger_sequence"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="rechargesale",
+            name="status",
+            field=models.CharField(choices=[("completed", "Completed")], db_index=True, default="completed", max_length=20),
+        ),
+    ]
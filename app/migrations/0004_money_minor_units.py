@@ -0,0 +1,79 @@
+import app.fields
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+
+# (model, field, validators) of every money column moved from DECIMAL to BIGINT minor units
+MONEY_FIELDS = [
+    ("seller", "balance", [django.core.validators.MinValueValidator(Decimal("0.00"))]),
+    ("creditrequest", "amount", [django.core.validators.MinValueValidator(Decimal("0.01"))]),
+    ("credittransaction", "amount", []),
+    ("credittransaction", "balance_after", []),
+    ("rechargesale", "amount", [django.core.validators.MinValueValidator(Decimal("0.01"))]),
+]
+
+
+def copy_to_minor_units(apps, schema_editor):
+    # one UPDATE per column; ROUND guards against backends that hold decimals as REAL
+    for model_name, field_name, _ in MONEY_FIELDS:
+        model = apps.get_model("app", model_name)
+        model.objects.using(schema_editor.connection.alias).update(**{
+            f"{field_name}_minor": Cast(Round(F(field_name) * 100), models.BigIntegerField())
+        })
+
+
+def add_minor_columns():
+    return [
+        migrations.AddField(
+            model_name=model_name,
+            name=f"{field_name}_minor",
+            field=models.BigIntegerField(null=True),
+        )
+        for model_name, field_name, _ in MONEY_FIELDS
+    ]
+
+
+def swap_columns():
+    operations = []
+    for model_name, field_name, validators in MONEY_FIELDS:
+        operations += [
+            migrations.RemoveField(model_name=model_name, name=field_name),
+            migrations.RenameField(model_name=model_name, old_name=f"{field_name}_minor", new_name=field_name),
+            migrations.AlterField(
+                model_name=model_name,
+                name=field_name,
+                field=app.fields.MoneyField(
+                    decimal_places=2,
+                    max_digits=15,
+                    validators=validators,
+                    **({"default": Decimal("0.00")} if field_name == "balance" else {}),
+                ),
+            ),
+        ]
+    return operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0003_recharge_sale_status_choices"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="seller",
+            name="check_balance_positive",
+        ),
+        *add_minor_columns(),
+        migrations.RunPython(copy_to_minor_units),
+        *swap_columns(),
+        migrations.AddConstraint(
+            model_name="seller",
+            constraint=models.CheckConstraint(
+                check=models.Q(balance__gte=0), name="check_balance_positive"
+            ),
+        ),
+    ]
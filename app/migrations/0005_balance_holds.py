@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:23
+
+import app.fields
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0004_money_minor_units"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceHold",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("amount", app.fields.MoneyField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal("0.01"))])),
+                ("status", models.CharField(choices=[("held", "Held"), ("confirmed", "Confirmed"), ("released", "Released"), ("expired", "Expired")], default="held", max_length=20)),
+                ("expires_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("resolved_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "balance_holds",
+            },
+        ),
+        migrations.AddField(
+            model_name="seller",
+            name="held_balance",
+            field=app.fields.MoneyField(decimal_places=2, default=Decimal("0.00"), max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal("0.00"))]),
+        ),
+        migrations.AddConstraint(
+            model_name="seller",
+            constraint=models.CheckConstraint(condition=models.Q(("held_balance__gte", 0)), name="check_held_balance_positive"),
+        ),
+        migrations.AddConstraint(
+            model_name="seller",
+            constraint=models.CheckConstraint(condition=models.Q(("held_balance__lte", models.F("balance"))), name="check_held_within_balance"),
+        ),
+        migrations.AddField(
+            model_name="balancehold",
+            name="phone_number",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="balance_holds", to="app.phonenumber"),
+        ),
+        migrations.AddField(
+            model_name="balancehold",
+            name="recharge_sale",
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="balance_hold", to="app.rechargesale"),
+        ),
+        migrations.AddField(
+            model_name="balancehold",
+            name="seller",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="balance_holds", to="app.seller"),
+        ),
+        migrations.AddIndex(
+            model_name="balancehold",
+            index=models.Index(fields=["seller", "status"], name="balance_hol_seller__56cff5_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="balancehold",
+            index=models.Index(fields=["status", "expires_at"], name="balance_hol_status_ae5a4e_idx"),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_balance_holds"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="credittransaction",
+            name="transaction_type",
+            field=models.CharField(choices=[("credit_increase", "Credit Increase"), ("recharge_sale", "Recharge Sale"), ("initial_balance", "Initial Balance"), ("recharge_refund", "Recharge Refund")], db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name="rechargesale",
+            name="status",
+            field=models.CharField(choices=[("pending", "Pending"), ("completed", "Completed"), ("failed", "Failed")], db_index=True, default="completed", max_length=20),
+        ),
+        migrations.CreateModel(
+            name="TopUpDispatch",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("provider", models.CharField(max_length=50)),
+                ("status", models.CharField(choices=[("pending", "Pending"), ("in_flight", "In Flight"), ("done", "Done"), ("failed", "Failed")], default="pending", max_length=20)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField()),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("provider_reference", models.CharField(blank=True, max_length=100)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("recharge_sale", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="dispatch", to="app.rechargesale")),
+            ],
+            options={
+                "db_table": "topup_dispatches",
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="topup_dispa_status_12e849_idx")],
+            },
+        ),
+    ]
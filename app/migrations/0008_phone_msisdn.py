@@ -0,0 +1,76 @@
+import re
+
+from django.db import migrations, models
+
+
+def normalize_msisdn(value):
+    # app.fields.normalize_msisdn as of this migration with the default country code, frozen
+    # so that replaying it always gives the same numbers whatever the settings
+    country_code = "98"
+    digits = re.sub(r"[\s\-().]", "", str(value))
+    if digits.startswith("+"):
+        digits = digits[1:]
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = country_code + digits[1:]
+    elif len(digits) <= 10:
+        digits = country_code + digits
+    if not digits.isdigit() or not 8 <= len(digits) <= 15:
+        raise ValueError(f"{value!r} is not a valid phone number")
+    return int(digits)
+
+
+def fill_msisdn(apps, schema_editor):
+    PhoneNumber = apps.get_model("app", "PhoneNumber")
+    phones = PhoneNumber.objects.using(schema_editor.connection.alias)
+    invalid, duplicates = [], []
+    seen = set()
+    batch = []
+    for phone in phones.only("id", "phone_number").iterator(chunk_size=2000):
+        try:
+            phone.msisdn = normalize_msisdn(phone.phone_number)
+        except ValueError:
+            invalid.append(phone.phone_number)
+            continue
+        if phone.msisdn in seen:
+            duplicates.append(phone.phone_number)
+            continue
+        seen.add(phone.msisdn)
+        batch.append(phone)
+        if len(batch) >= 2000:
+            phones.bulk_update(batch, ["msisdn"])
+            batch = []
+    phones.bulk_update(batch, ["msisdn"])
+    if invalid or duplicates:
+        raise ValueError(
+            f"Fix or delete these phone numbers before migrating: invalid {invalid[:20]}, "
+            f"same number written differently {duplicates[:20]}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0007_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="phonenumber",
+            name="msisdn",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(fill_msisdn, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="phonenumber",
+            name="msisdn",
+            field=models.BigIntegerField(unique=True),
+        ),
+        # the unique msisdn index replaces both string indexes (unique + LIKE) on phone_number
+        migrations.AlterField(
+            model_name="phonenumber",
+            name="phone_number",
+            field=models.CharField(max_length=20),
+        ),
+    ]
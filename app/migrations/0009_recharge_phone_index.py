@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0008_phone_msisdn"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="rechargesale",
+            index=models.Index(fields=["phone_number", "created_at", "id"], name="recharge_phone_created_id"),
+        ),
+        # the composite index leads with phone_number_id and takes over the FK index
+        migrations.AlterField(
+            model_name="rechargesale",
+            name="phone_number",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="recharge_sales", to="app.phonenumber"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:09
+
+import app.fields
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0009_recharge_phone_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="seller",
+            name="daily_phone_limit",
+            field=app.fields.MoneyField(blank=True, decimal_places=2, max_digits=15, null=True, validators=[django.core.validators.MinValueValidator(Decimal("0.00"))]),
+        ),
+        migrations.AddField(
+            model_name="seller",
+            name="daily_sales_limit",
+            field=app.fields.MoneyField(blank=True, decimal_places=2, max_digits=15, null=True, validators=[django.core.validators.MinValueValidator(Decimal("0.00"))]),
+        ),
+        migrations.CreateModel(
+            name="SpendingCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(choices=[("seller", "Seller daily sales"), ("phone", "Phone daily top-ups")], max_length=10)),
+                ("subject_id", models.PositiveBigIntegerField()),
+                ("day", models.DateField()),
+                ("amount", app.fields.MoneyField(decimal_places=2, default=Decimal("0.00"), max_digits=15)),
+            ],
+            options={
+                "db_table": "spending_counters",
+                "indexes": [models.Index(fields=["day"], name="spending_co_day_69031b_idx")],
+                "constraints": [models.UniqueConstraint(fields=("kind", "subject_id", "day"), name="unique_spending_counter")],
+            },
+        ),
+    ]
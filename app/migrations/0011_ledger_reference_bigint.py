@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0010_spending_limits"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="credittransaction",
+            name="reference_id",
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0011_ledger_reference_bigint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topupdispatch",
+            name="claim_token",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
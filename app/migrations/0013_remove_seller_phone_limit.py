@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0012_topup_claim_token"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="seller",
+            name="daily_phone_limit",
+        ),
+    ]
@@ -1,24 +1,63 @@
-from django.db import models
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from .fields import MoneyField, normalize_msisdn
+
 
 class CreditRequestStatus(models.TextChoices):
     PENDING = "pending", "Pending"
     APPROVED = "approved", "Approved"
     REJECTED = "rejected", "Rejected"
 
+class RechargeSaleStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    COMPLETED = "completed", "Completed"
+    FAILED = "failed", "Failed"
+
+class TopUpDispatchStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    IN_FLIGHT = "in_flight", "In Flight"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
+
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
+
+class BalanceHoldStatus(models.TextChoices):
+    HELD = "held", "Held"
+    CONFIRMED = "confirmed", "Confirmed"
+    RELEASED = "released", "Released"
+    EXPIRED = "expired", "Expired"
+
+class SpendingCounterKind(models.TextChoices):
+    SELLER = "seller", "Seller daily sales"
+    PHONE = "phone", "Phone daily top-ups"
+
+
 class TransactionType(models.TextChoices):
     CREDIT_INCREASE = "credit_increase", "Credit Increase"
     RECHARGE_SALE = "recharge_sale", "Recharge Sale"
     INITIAL_BALANCE = "initial_balance", "Initial Balance"
+    RECHARGE_REFUND = "recharge_refund", "Recharge Refund"
 
 
 class Seller(models.Model):
     name = models.CharField(max_length=100)
-    balance = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'), validators=[MinValueValidator(Decimal('0.00'))])
+    balance = MoneyField(default=Decimal('0.00'), validators=[MinValueValidator(Decimal('0.00'))])
+    # reserved by open balance holds; available balance = balance - held_balance
+    held_balance = MoneyField(default=Decimal('0.00'), validators=[MinValueValidator(Decimal('0.00'))])
+    # last ledger sequence number handed out, bumped under the seller row lock
+    ledger_seq = models.PositiveBigIntegerField(default=0)
+    # daily sales cap; null falls back to SELLER_DAILY_SALES_LIMIT
+    daily_sales_limit = MoneyField(null=True, blank=True, validators=[MinValueValidator(Decimal('0.00'))])
     created_at = models.DateTimeField(auto_now_add=True)
 
 
@@ -28,16 +67,22 @@ class Seller(models.Model):
         indexes=[models.Index(fields=['name'])]
 
         constraints=[
-            models.CheckConstraint(check=models.Q(balance__gte=0), name='check_balance_positive')
+            models.CheckConstraint(check=models.Q(balance__gte=0), name='check_balance_positive'),
+            models.CheckConstraint(check=models.Q(held_balance__gte=0), name='check_held_balance_positive'),
+            models.CheckConstraint(check=models.Q(held_balance__lte=models.F('balance')), name='check_held_within_balance')
         ]
 
+    @property
+    def available_balance(self):
+        return self.balance - self.held_balance
+
 
     def __str__(self):
         return f"seller: {self.id}: {self.name}"
 
 class CreditRequest(models.Model):
     seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='credit_requests', db_index=True)
-    amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    amount = MoneyField(validators=[MinValueValidator(Decimal('0.01'))])
     status = models.CharField(max_length=20, choices=CreditRequestStatus.choices, default=CreditRequestStatus.PENDING, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
@@ -54,10 +99,13 @@ class CreditRequest(models.Model):
 
 class CreditTransaction(models.Model):
     seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='credit_transactions', db_index=True)
-    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    amount = MoneyField()
     transaction_type = models.CharField(max_length=20, choices=TransactionType.choices, db_index=True)
-    reference_id = models.IntegerField(null=True, blank=True, db_index=True)
-    balance_after = models.DecimalField(max_digits=15, decimal_places=2)
+    # id of a seller-scoped row: shard-range ids (SHARD_ID_SPAN) do not fit a 32-bit column
+    reference_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    balance_after = MoneyField()
+    # gap-free per seller: 1, 2, 3, ...
+    sequence = models.PositiveBigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -65,25 +113,43 @@ class CreditTransaction(models.Model):
         indexes=[
             models.Index(fields=['seller','created_at']),
         ]
+        constraints=[
+            models.UniqueConstraint(fields=['seller', 'sequence'], name='unique_seller_ledger_sequence')
+        ]
     def __str__(self):
         return f"Credit Request {self.id}: seller {self.seller.name} - {self.amount} {self.transaction_type}"
 
 
 class PhoneNumber(models.Model):
-    phone_number = models.CharField(max_length=20, unique=True, db_index=True)
+    # as entered; lookups and uniqueness go through msisdn
+    phone_number = models.CharField(max_length=20)
+    # normalized E.164 digits as an integer (989120000001), set on save
+    msisdn = models.BigIntegerField(unique=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table='phone_numbers'
+
+    def clean(self):
+        try:
+            normalize_msisdn(self.phone_number)
+        except ValueError as e:
+            raise ValidationError({'phone_number': str(e)})
+
+    def save(self, *args, **kwargs):
+        self.msisdn = normalize_msisdn(self.phone_number)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"phone number {self.id}: {self.phone_number}"
 
 class RechargeSale(models.Model):
     seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='recharge_sale', db_index=True)
-    phone_number = models.ForeignKey(PhoneNumber, on_delete=models.CASCADE, related_name='recharge_sales', db_index=True)
-    amount = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
-    status = models.CharField(max_length=20, default="completed", db_index=True)
+    # indexed through recharge_phone_created_id below
+    phone_number = models.ForeignKey(PhoneNumber, on_delete=models.CASCADE, related_name='recharge_sales', db_index=False)
+    amount = MoneyField(validators=[MinValueValidator(Decimal('0.01'))])
+    status = models.CharField(max_length=20, choices=RechargeSaleStatus.choices, default=RechargeSaleStatus.COMPLETED, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 
@@ -91,27 +157,155 @@ class RechargeSale(models.Model):
         db_table="recharge_sales"
         indexes=[
             models.Index(fields=['seller','created_at']),
+            # recharges of one number, newest first, keyset paged on (created_at, id)
+            models.Index(fields=['phone_number','created_at','id'], name='recharge_phone_created_id'),
         ]
 
     def __str__(self):
         return f"Recharge sale {self.id}: seller {self.seller_id} {self.amount} "
 
 
+class TopUpDispatch(models.Model):
+    # outbox row: a recharge sale waiting to be sent to (or retried at) its top-up provider
+    recharge_sale = models.OneToOneField(RechargeSale, on_delete=models.CASCADE, related_name='dispatch')
+    provider = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=TopUpDispatchStatus.choices, default=TopUpDispatchStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    # set by each claim; results are written back only while the row still carries it
+    claim_token = models.UUIDField(null=True, blank=True)
+    provider_reference = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    class Meta:
+        db_table="topup_dispatches"
+        indexes=[
+            # dispatcher claim: due rows per status
+            models.Index(fields=['status','next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"Top-up dispatch {self.id}: sale {self.recharge_sale_id} via {self.provider} ({self.status})"
+
+
+class BalanceHold(models.Model):
+    # amount reserved against a seller's balance while a top-up is in flight at the provider
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='balance_holds')
+    phone_number = models.ForeignKey(PhoneNumber, on_delete=models.CASCADE, related_name='balance_holds')
+    amount = MoneyField(validators=[MinValueValidator(Decimal('0.01'))])
+    status = models.CharField(max_length=20, choices=BalanceHoldStatus.choices, default=BalanceHoldStatus.HELD)
+    recharge_sale = models.OneToOneField(RechargeSale, on_delete=models.SET_NULL, null=True, blank=True, related_name='balance_hold')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+
+    class Meta:
+        db_table="balance_holds"
+        indexes=[
+            models.Index(fields=['seller','status']),
+            # expiry sweeper: open holds past expires_at
+            models.Index(fields=['status','expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Balance hold {self.id}: seller {self.seller_id} {self.amount} ({self.status})"
+
+
+class SpendingCounter(models.Model):
+    # running total of one seller's sales or one phone number's top-ups on one day, for the
+    # daily limits; lives on the seller's shard and is bumped in the charge transaction
+    kind = models.CharField(max_length=10, choices=SpendingCounterKind.choices)
+    # seller id or phone number id
+    subject_id = models.PositiveBigIntegerField()
+    day = models.DateField()
+    amount = MoneyField(default=Decimal('0.00'))
+
+    class Meta:
+        db_table="spending_counters"
+        constraints=[
+            models.UniqueConstraint(fields=['kind','subject_id','day'], name='unique_spending_counter')
+        ]
+        indexes=[
+            # cleanup of past days
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.subject_id} on {self.day}: {self.amount}"
+
+
+class Job(models.Model):
+    # deferred work for `manage.py worker`; always on the default database
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    # higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    run_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table="jobs"
+        indexes=[
+            # worker claim: due queued jobs, highest priority first
+            models.Index(fields=['status','priority','run_at']),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id}: {self.task} ({self.status})"
+
+
 @receiver(post_save, sender=Seller)
-def record_initial_balance(sender, instance, created, **kwargs):
+def record_initial_balance(sender, instance, created, using, **kwargs):
     """Record initial balance as transaction if seller created with non-zero balance."""
     if created and instance.balance > Decimal('0.00'):
         # Avoid duplicates on bulk create
-        existing_transaction = CreditTransaction.objects.filter(
+        existing_transaction = CreditTransaction.objects.using(using).filter(
             seller=instance,
             transaction_type=TransactionType.INITIAL_BALANCE
         ).first()
         
         if not existing_transaction:
-            CreditTransaction.objects.create(
+            instance.ledger_seq += 1
+            Seller.objects.using(using).filter(pk=instance.pk).update(ledger_seq=instance.ledger_seq)
+            CreditTransaction.objects.using(using).create(
                 seller=instance,
                 amount=instance.balance,
                 transaction_type=TransactionType.INITIAL_BALANCE,
                 reference_id=None,
-                balance_after=instance.balance
-            )
\ No newline at end of file
+                balance_after=instance.balance,
+                sequence=instance.ledger_seq
+            )
+
+
+@receiver(post_save, sender=PhoneNumber)
+def replicate_phone_number(sender, instance, using, raw=False, **kwargs):
+    """Copy phone numbers saved on the default database to the other seller shards (same id)."""
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    for alias in settings.SELLER_SHARDS:
+        if alias != using:
+            PhoneNumber.objects.using(alias).update_or_create(
+                id=instance.id,
+                defaults={'phone_number': instance.phone_number, 'msisdn': instance.msisdn, 'is_active': instance.is_active}
+            )
+
+
+@receiver(post_delete, sender=PhoneNumber)
+def remove_replicated_phone_number(sender, instance, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in settings.SELLER_SHARDS:
+        if alias != using:
+            PhoneNumber.objects.using(alias).filter(id=instance.id).delete()
@@ -1,14 +1,71 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from datetime import datetime
 from decimal import Decimal
+from django.db import models
+from .db_routing import MAX_ROW_ID, seller_shards
+from .fields import MONEY_DECIMAL_PLACES, MoneyField, normalize_msisdn
 from .models import (Seller, CreditRequest, CreditTransaction, PhoneNumber, RechargeSale,
-    CreditRequestStatus, TransactionType)
+    BalanceHold, CreditRequestStatus, TransactionType)
+from .services.charge_service import DEFAULT_PHONE_RECHARGES_LIMIT, MAX_PHONE_RECHARGES_LIMIT, decode_recharge_cursor
+from .services.ledger_service import DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT
+
+
+class MoneyDecimalField(serializers.DecimalField):
+    # MoneyField values already carry exactly two places: skip DecimalField's per-value
+    # context copy and quantize (same output; the history endpoint renders thousands)
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_digits', 15)
+        kwargs.setdefault('decimal_places', MONEY_DECIMAL_PLACES)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if (
+            isinstance(value, Decimal)
+            and value.as_tuple().exponent == -MONEY_DECIMAL_PLACES
+            and getattr(self, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            and not self.localize
+        ):
+            return '{:f}'.format(value)
+        return super().to_representation(value)
+
+
+class FastDateTimeField(serializers.DateTimeField):
+    # DateTimeField reads the active timezone (a context-local) for every value; one
+    # serializer renders all rows of a response under the same timezone, so look it up once
+    def to_representation(self, value):
+        output_format = getattr(self, 'format', api_settings.DATETIME_FORMAT)
+        if not isinstance(value, datetime) or value.tzinfo is None or output_format is None or output_format.lower() != ISO_8601:
+            return super().to_representation(value)
+        try:
+            field_timezone = self._output_timezone
+        except AttributeError:
+            field_timezone = self._output_timezone = self.timezone if hasattr(self, 'timezone') else self.default_timezone()
+        if field_timezone is None:
+            return super().to_representation(value)
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            self.fail('overflow')
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+
+class FastModelSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        MoneyField: MoneyDecimalField,
+        models.DateTimeField: FastDateTimeField,
+    }
+
 
 class CreditRequestCreateSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
 
 
-class CreditRequestSerializer(serializers.ModelSerializer):
-    seller_id = serializers.IntegerField(source='seller.id', read_only=True)
+class CreditRequestSerializer(FastModelSerializer):
+    seller_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CreditRequest
@@ -16,13 +73,26 @@ class CreditRequestSerializer(serializers.ModelSerializer):
 
 
 class RechargeChargeRequestSerializer(serializers.Serializer):
-    phone_number_id = serializers.IntegerField()
+    # either our phone id or the number itself, in any common format
+    phone_number_id = serializers.IntegerField(required=False)
+    phone_number = serializers.CharField(max_length=32, required=False)
     amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
 
+    def validate_phone_number(self, value):
+        try:
+            return normalize_msisdn(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, attrs):
+        if ('phone_number_id' in attrs) == ('phone_number' in attrs):
+            raise serializers.ValidationError("Send exactly one of phone_number_id and phone_number.")
+        return attrs
 
-class RechargeSaleSerializer(serializers.ModelSerializer):
-    seller_id = serializers.IntegerField(source='seller.id', read_only=True)
-    phone_number_id = serializers.IntegerField(source='phone_number.id', read_only=True)
+
+class RechargeSaleSerializer(FastModelSerializer):
+    seller_id = serializers.IntegerField(read_only=True)
+    phone_number_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = RechargeSale
@@ -31,21 +101,162 @@ class RechargeSaleSerializer(serializers.ModelSerializer):
 
 class BalanceSerializer(serializers.Serializer):
     seller_id = serializers.IntegerField()
-    current_balance = serializers.DecimalField(max_digits=15, decimal_places=2)
+    current_balance = MoneyDecimalField()
+    held_balance = MoneyDecimalField()
+    available_balance = MoneyDecimalField()
     seller_name = serializers.CharField()
 
 
-class CreditTransactionSerializer(serializers.ModelSerializer):
-    seller_id = serializers.IntegerField(source='seller.id', read_only=True)
+class BalanceHoldCreateSerializer(serializers.Serializer):
+    phone_number_id = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
+    ttl_seconds = serializers.IntegerField(min_value=1, max_value=86400, required=False)
+
+
+class BalanceHoldSerializer(FastModelSerializer):
+    seller_id = serializers.IntegerField(read_only=True)
+    phone_number_id = serializers.IntegerField(read_only=True)
+    recharge_sale_id = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = BalanceHold
+        fields = ['id', 'seller_id', 'phone_number_id', 'amount', 'status', 'recharge_sale_id', 'expires_at', 'created_at', 'resolved_at']
+
+
+class CreditTransactionSerializer(FastModelSerializer):
+    seller_id = serializers.IntegerField(read_only=True)
     transaction_type = serializers.CharField()
 
     class Meta:
         model = CreditTransaction
-        fields = ['id', 'seller_id', 'amount', 'transaction_type', 'reference_id', 'balance_after', 'created_at']
+        fields = ['id', 'seller_id', 'sequence', 'amount', 'transaction_type', 'reference_id', 'balance_after', 'created_at']
 
 
 class TransactionHistorySerializer(serializers.Serializer):
     seller_id = serializers.IntegerField()
-    current_balance = serializers.DecimalField(max_digits=15, decimal_places=2)
+    current_balance = MoneyDecimalField()
     transactions = CreditTransactionSerializer(many=True)
-    total_count = serializers.IntegerField()
\ No newline at end of file
+    total_count = serializers.IntegerField()
+
+MAX_BATCH_SELLERS = 500
+# one chunk's numbers go into a single IN (...) lookup
+MAX_IMPORT_BATCH_SIZE = 10000
+
+
+class BalanceAtQuerySerializer(serializers.Serializer):
+    at = serializers.DateTimeField()
+
+
+class BalancesAtQuerySerializer(BalanceAtQuerySerializer):
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        return _parse_seller_ids(value)
+
+
+def _parse_seller_ids(value: str) -> list:
+    # "1,2,3" -> [1, 2, 3], duplicates dropped, at most MAX_BATCH_SELLERS
+    try:
+        seller_ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise serializers.ValidationError("ids must be a comma separated list of seller ids")
+    return _unique_seller_ids(seller_ids)
+
+
+def _unique_seller_ids(seller_ids: list) -> list:
+    if not seller_ids:
+        raise serializers.ValidationError("at least one seller id is required")
+    if len(seller_ids) > MAX_BATCH_SELLERS:
+        raise serializers.ValidationError(f"at most {MAX_BATCH_SELLERS} seller ids per request")
+    return list(dict.fromkeys(seller_ids))
+
+
+class SellerBalancesQuerySerializer(serializers.Serializer):
+    # GET ?ids=1,2,3&cached=true
+    ids = serializers.CharField()
+    cached = serializers.BooleanField(default=False)
+
+    def validate_ids(self, value):
+        return _parse_seller_ids(value)
+
+
+class SellerBalancesRequestSerializer(serializers.Serializer):
+    # POST {"ids": [1, 2, 3], "cached": true}, for lists too long for a query string
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1))
+    cached = serializers.BooleanField(default=False)
+
+    def validate_ids(self, value):
+        return _unique_seller_ids(value)
+
+
+class HistoricalBalanceSerializer(serializers.Serializer):
+    seller_id = serializers.IntegerField()
+    at = FastDateTimeField()
+    balance = MoneyDecimalField()
+
+
+class LedgerChangesQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, max_value=MAX_ROW_ID, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_CHANGES_LIMIT, default=DEFAULT_CHANGES_LIMIT)
+    # index into SELLER_SHARDS; each shard has its own feed
+    shard = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_shard(self, value):
+        shards = seller_shards()
+        if value >= len(shards):
+            raise serializers.ValidationError(f"There are {len(shards)} shards.")
+        return shards[value]
+
+
+class LedgerChangeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    seller_id = serializers.IntegerField()
+    sequence = serializers.IntegerField()
+    transaction_type = serializers.CharField()
+    amount = MoneyDecimalField()
+    reference_id = serializers.IntegerField(allow_null=True)
+    balance_after = MoneyDecimalField()
+    created_at = FastDateTimeField()
+
+
+class LedgerChangesSerializer(serializers.Serializer):
+    changes = LedgerChangeSerializer(many=True)
+    next_since = serializers.IntegerField()
+    has_more = serializers.BooleanField()
+
+
+class PhoneImportRequestSerializer(serializers.Serializer):
+    # CSV (number[,active]) or a plain list of numbers, one per line
+    file = serializers.FileField()
+    # sets is_active on every listed number, new or known
+    active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    batch_size = serializers.IntegerField(min_value=1, max_value=MAX_IMPORT_BATCH_SIZE, default=5000)
+
+
+class PhoneRechargesQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_PHONE_RECHARGES_LIMIT, default=DEFAULT_PHONE_RECHARGES_LIMIT)
+    seller_id = serializers.IntegerField(required=False)
+
+    def validate_cursor(self, value):
+        try:
+            decode_recharge_cursor(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class PhoneRechargeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    seller_id = serializers.IntegerField()
+    amount = MoneyDecimalField()
+    status = serializers.CharField()
+    created_at = FastDateTimeField()
+
+
+class PhoneRechargesSerializer(serializers.Serializer):
+    phone_number_id = serializers.IntegerField()
+    msisdn = serializers.IntegerField()
+    recharges = PhoneRechargeSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
+    has_more = serializers.BooleanField()
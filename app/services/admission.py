@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class AdmissionRejected(Exception):
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Too many charges ({reason}), retry in {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class LocalAdmissionBackend:
+    # per-seller token bucket (rate/burst) plus a cap on charges in flight, for one process.
+    # a rate or cap of 0 turns that check off
+
+    # concurrency rejections do not know when a slot frees up; ask clients to come back soon
+    concurrency_retry_after = 1.0
+
+    def __init__(self, rate=None, burst=None, max_in_flight=None):
+        self.rate = settings.SELLER_CHARGE_RATE if rate is None else rate
+        self.burst = settings.SELLER_CHARGE_BURST if burst is None else burst
+        self.max_in_flight = settings.SELLER_MAX_IN_FLIGHT_CHARGES if max_in_flight is None else max_in_flight
+        self._buckets = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, seller_id: int):
+        # returns a ticket to hand back to release(), or raises AdmissionRejected
+        now = time.monotonic()
+        with self._lock:
+            in_flight = self._in_flight.get(seller_id, 0)
+            if self.max_in_flight and in_flight >= self.max_in_flight:
+                raise AdmissionRejected('concurrency', self.concurrency_retry_after)
+
+            if self.rate:
+                tokens, updated = self._buckets.get(seller_id, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens < 1:
+                    self._buckets[seller_id] = (tokens, now)
+                    raise AdmissionRejected('rate', (1 - tokens) / self.rate)
+                self._buckets[seller_id] = (tokens - 1, now)
+
+            self._in_flight[seller_id] = in_flight + 1
+        return seller_id
+
+    def release(self, seller_id: int, ticket):
+        with self._lock:
+            in_flight = self._in_flight.get(seller_id, 0) - 1
+            if in_flight > 0:
+                self._in_flight[seller_id] = in_flight
+            else:
+                self._in_flight.pop(seller_id, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(self._in_flight.values())
+
+
+class SQLiteAdmissionBackend(LocalAdmissionBackend):
+    # same limits shared by every worker on the host through a small SQLite file.
+    # in-flight charges are leases, so a worker killed mid-request frees its slots
+    lease_seconds = 60
+
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = str(path or settings.SELLER_ADMISSION_SQLITE_PATH)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS admission_buckets "
+                "(seller_id INTEGER PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS admission_leases "
+                "(ticket TEXT PRIMARY KEY, seller_id INTEGER NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS admission_leases_seller ON admission_leases (seller_id)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return _Immediate(conn)
+
+    def acquire(self, seller_id: int):
+        # wall clock: the state is shared between processes
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("DELETE FROM admission_leases WHERE seller_id = ? AND expires <= ?", [seller_id, now])
+            if self.max_in_flight:
+                (in_flight,) = conn.execute(
+                    "SELECT COUNT(*) FROM admission_leases WHERE seller_id = ?", [seller_id]
+                ).fetchone()
+                if in_flight >= self.max_in_flight:
+                    raise AdmissionRejected('concurrency', self.concurrency_retry_after)
+
+            if self.rate:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM admission_buckets WHERE seller_id = ?", [seller_id]
+                ).fetchone()
+                tokens, updated = row if row else (self.burst, now)
+                tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                admitted = tokens >= 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO admission_buckets (seller_id, tokens, updated) VALUES (?, ?, ?)",
+                    [seller_id, tokens - 1 if admitted else tokens, now]
+                )
+                if not admitted:
+                    raise AdmissionRejected('rate', (1 - tokens) / self.rate)
+
+            ticket = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO admission_leases (ticket, seller_id, expires) VALUES (?, ?, ?)",
+                [ticket, seller_id, now + self.lease_seconds]
+            )
+        return ticket
+
+    def release(self, seller_id: int, ticket):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM admission_leases WHERE ticket = ?", [ticket])
+
+    def in_flight(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM admission_leases WHERE expires > ?", [time.time()]).fetchone()[0]
+
+
+class _Immediate:
+    # BEGIN IMMEDIATE ... COMMIT, rolled back when the block raises (rejections commit)
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None or issubclass(exc_type, AdmissionRejected):
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_admission_backend():
+    # None when both the rate limit and the in-flight cap are off
+    global _backend
+    if not (settings.SELLER_CHARGE_RATE or settings.SELLER_MAX_IN_FLIGHT_CHARGES):
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.SELLER_ADMISSION_BACKEND)()
+    return _backend
+
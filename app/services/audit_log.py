@@ -0,0 +1,218 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from app.services import metrics
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# structured audit trail of charges, approvals and rejections. emit() only appends a tuple to
+# a bounded in-memory queue (a few microseconds, no I/O, no locks); a writer thread per process
+# serializes batches as JSON lines to AUDIT_LOG_DIR, fsyncs every AUDIT_LOG_FSYNC_SECONDS and
+# starts a new file past AUDIT_LOG_MAX_BYTES. a full queue drops the event and counts it under
+# audit.dropped in GET /api/metrics/
+
+
+class ChargeEvent(NamedTuple):
+    sale_id: int
+    seller_id: int
+    phone_number_id: int
+    amount: Decimal
+    balance_after: Decimal
+    status: str
+
+    event = 'charge'
+
+
+class ApprovalEvent(NamedTuple):
+    request_id: int
+    seller_id: int
+    amount: Decimal
+    balance_after: Decimal
+
+    event = 'approval'
+
+
+class RejectionEvent(NamedTuple):
+    # operation: 'charge' or 'approve'; subject_id: the phone number or credit request
+    operation: str
+    seller_id: Optional[int]
+    subject_id: Optional[int]
+    amount: Optional[Decimal]
+    reason: str
+    detail: str
+
+    event = 'rejection'
+
+
+_queue = deque()
+_wakeup = threading.Event()
+_write_lock = threading.Lock()
+_writer = None
+_writer_pid = None
+_dropped = 0
+
+
+def emit(record):
+    # called on the request path: stay cheap. the length check races with other emitters by
+    # at most a few entries, which only matters at the bound
+    if _writer_pid != os.getpid():
+        _start_writer()
+    if len(_queue) >= settings.AUDIT_LOG_QUEUE_SIZE:
+        _drop()
+        return
+    _queue.append((time.time(), record))
+    if len(_queue) == settings.AUDIT_LOG_BATCH_SIZE:
+        _wakeup.set()
+
+
+def flush():
+    # write out everything queued so far and fsync; for shutdown and tests
+    _writer_file().write_pending(fsync=True)
+
+
+def reopen():
+    # write out the queue and close the current file; the next batch starts a new one
+    # (in AUDIT_LOG_DIR as it is then)
+    audit_file = _writer_file()
+    audit_file.write_pending(fsync=True)
+    audit_file.close()
+
+
+def dropped() -> int:
+    return _dropped
+
+
+def _drop():
+    global _dropped
+    _dropped += 1
+    metrics.increment('audit.dropped')
+
+
+def _start_writer():
+    global _writer, _writer_pid
+    with _write_lock:
+        if _writer_pid == os.getpid():
+            return
+        # a forked worker inherits the parent's queue but not its thread
+        _queue.clear()
+        _writer_pid = os.getpid()
+        _writer = _AuditFile()
+        thread = threading.Thread(target=_run_writer, args=(_writer,), name='audit-log-writer', daemon=True)
+        thread.start()
+
+
+def _writer_file():
+    if _writer_pid != os.getpid():
+        _start_writer()
+    return _writer
+
+
+def _run_writer(audit_file):
+    last_fsync = time.monotonic()
+    while audit_file.pid == os.getpid():
+        _wakeup.wait(settings.AUDIT_LOG_FLUSH_SECONDS)
+        _wakeup.clear()
+        fsync = time.monotonic() - last_fsync >= settings.AUDIT_LOG_FSYNC_SECONDS
+        try:
+            audit_file.write_pending(fsync=fsync)
+        except OSError:
+            logger.exception("Failed to write the audit log")
+            time.sleep(settings.AUDIT_LOG_FLUSH_SECONDS)
+        if fsync:
+            last_fsync = time.monotonic()
+
+
+def _encode(timestamp: float, record) -> bytes:
+    data = {'ts': datetime.fromtimestamp(timestamp, dt_timezone.utc).isoformat(), 'event': record.event}
+    data.update(record._asdict())
+    if orjson is not None:
+        return orjson.dumps(data, default=str) + b'\n'
+    return (json.dumps(data, default=str, separators=(',', ':')) + '\n').encode()
+
+
+class _AuditFile:
+    # one file per process at a time, so workers never interleave or rotate each other's writes
+
+    def __init__(self):
+        self.directory = None
+        self.pid = os.getpid()
+        self.file = None
+        self.size = 0
+        self.opened = 0
+        self.reported_drops = 0
+
+    def write_pending(self, fsync: bool):
+        with _write_lock:
+            batch = []
+            while _queue and len(batch) < settings.AUDIT_LOG_BATCH_SIZE * 10:
+                batch.append(_encode(*_queue.popleft()))
+            if batch:
+                if self.file is None or self.size >= settings.AUDIT_LOG_MAX_BYTES:
+                    self._open_next()
+                data = b''.join(batch)
+                self.file.write(data)
+                self.file.flush()
+                self.size += len(data)
+                metrics.increment('audit.written', len(batch))
+            if fsync and self.file is not None:
+                os.fsync(self.file.fileno())
+
+        if _dropped > self.reported_drops:
+            logger.warning("Audit log queue full: %s events dropped", _dropped - self.reported_drops)
+            self.reported_drops = _dropped
+
+    def close(self):
+        with _write_lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+    def _open_next(self):
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+            self.file.close()
+        self.directory = Path(settings.AUDIT_LOG_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        self.opened += 1
+        self.file = open(self.directory / f'audit-{stamp}-{self.pid}-{self.opened:06d}.jsonl', 'ab')
+        self.size = 0
+        self._prune()
+
+    def _prune(self):
+        # keep this process's newest AUDIT_LOG_MAX_FILES files (names sort by creation time);
+        # other workers' files are theirs to prune, and 0 leaves retention to logrotate / ops
+        if settings.AUDIT_LOG_MAX_FILES <= 0:
+            return
+        current = Path(self.file.name).name
+        files = sorted(
+            path for path in self.directory.glob(f'audit-*-{self.pid}-*.jsonl') if path.name != current
+        )
+        for old in files[:max(len(files) - settings.AUDIT_LOG_MAX_FILES + 1, 0)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+@atexit.register
+def _flush_at_exit():
+    if _writer_pid == os.getpid() and _queue:
+        flush()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceSubscription:
+    # one idle subscriber costs this object and a one-slot queue, no thread
+
+    def __init__(self, backend, seller_id: int):
+        self.backend = backend
+        self.seller_id = seller_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=1)
+
+    def offer(self, payload: dict):
+        # runs on the subscriber's loop; keep only the newest balance for slow readers
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class LocalBalanceEventBackend:
+    # in-process pub/sub: publishers run in request threads, subscribers on the ASGI loop
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, seller_id: int) -> BalanceSubscription:
+        subscription = BalanceSubscription(self, seller_id)
+        with self._lock:
+            self._subscribers.setdefault(seller_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: BalanceSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.seller_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.seller_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, seller_id: int, payload: dict):
+        self.deliver(seller_id, payload)
+
+    def deliver(self, seller_id: int, payload: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(seller_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, payload)
+            except RuntimeError:
+                # loop already closed, the stream is going away
+                self.unsubscribe(subscription)
+
+
+class PostgresNotifyBackend(LocalBalanceEventBackend):
+    # fan out across worker processes with LISTEN/NOTIFY; every worker delivers to its own subscribers
+    channel = 'seller_balance'
+    reconnect_delay = 1.0
+
+    def __init__(self, using: str = 'default'):
+        super().__init__()
+        self.using = using
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, seller_id: int, payload: dict):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, json.dumps(payload)])
+
+    def subscribe(self, seller_id: int) -> BalanceSubscription:
+        self._ensure_listener()
+        return super().subscribe(seller_id)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen_forever, name='balance-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Balance event listener lost its connection, reconnecting")
+                time.sleep(self.reconnect_delay)
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        params = connections[self.using].get_connection_params()
+        conn = psycopg2.connect(**params)
+        try:
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            while True:
+                if select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    payload = json.loads(conn.notifies.pop(0).payload)
+                    self.deliver(payload['seller_id'], payload)
+        finally:
+            conn.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.BALANCE_EVENTS_BACKEND)()
+    return _backend
+
+
+def notify_balance_changed(seller):
+    # queue a balance event for after the surrounding transaction commits
+    payload = {
+        'seller_id': seller.id,
+        'current_balance': str(seller.balance),
+        'held_balance': str(seller.held_balance),
+        'available_balance': str(seller.available_balance),
+        'ledger_seq': seller.ledger_seq
+    }
+
+    def publish():
+        try:
+            get_backend().publish(payload['seller_id'], payload)
+        except Exception:
+            logger.exception("Failed to publish balance event for seller %s", payload['seller_id'])
+
+    # on the seller's shard: that is the transaction the change commits with
+    transaction.on_commit(publish, using=seller._state.db)
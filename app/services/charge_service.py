@@ -1,12 +1,48 @@
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+from datetime import datetime
+from functools import partial
 from decimal import Decimal
+from typing import Optional
+import base64
 import logging
 
-from app.models import Seller, PhoneNumber, RechargeSale, CreditTransaction, TransactionType
+from app.db_routing import reads_from_replica, seller_db_for_read, seller_shards, shard_db_for_read, shard_for_id
+from app.fields import normalize_msisdn
+from app.models import Seller, RechargeSale, RechargeSaleStatus, CreditTransaction, TransactionType, TopUpDispatch
+from app.services import audit_log
+from app.services.audit_log import ChargeEvent, RejectionEvent
+from app.services.balance_events import notify_balance_changed
+from app.services.locks import BalanceTransaction
+from app.services.phone_directory import PhoneDirectory
+from app.services.spending_limits import SpendingLimits, SpendingLimitExceededError
 from app.services.credit_service import SellerNotFoundError, CreditServiceError, InsufficientBalanceError
+from app.services.retry import retry_on_conflict, is_transient_db_error
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PHONE_RECHARGES_LIMIT = 50
+MAX_PHONE_RECHARGES_LIMIT = 500
+
+PHONE_RECHARGE_FIELDS = ('id', 'seller_id', 'amount', 'status', 'created_at')
+
+
+def encode_recharge_cursor(created_at: datetime, sale_id: int) -> str:
+    # opaque to clients: position after the last row of a page
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{sale_id}".encode()).decode().rstrip('=')
+
+
+def decode_recharge_cursor(cursor: str):
+    # -> (created_at, id); ValueError for anything encode_recharge_cursor did not produce
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, sale_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(sale_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
 
 class PhoneNumberNotFoundError(CreditServiceError):
     pass
@@ -16,75 +52,194 @@ class PhoneNumberInactiveError(CreditServiceError):
     pass
 
 
-class ChargeService:
+class InvalidPhoneNumberError(CreditServiceError):
+    pass
 
-    @staticmethod
-    def charge_phone(seller_id: int, phone_number_id: int, amount: Decimal) -> RechargeSale:
-        # check phone number
-        try:
-            phone_number = PhoneNumber.objects.get(id=phone_number_id)
-        except PhoneNumber.DoesNotExist:
-            raise PhoneNumberNotFoundError(f"Phone number with ID {phone_number_id} not found")
 
-        if not phone_number.is_active:
-            raise PhoneNumberInactiveError(f"Phone number {phone_number.phone_number} is not active")
+class ChargeService:
 
-        # lock seller to prevent race conditions
+    @staticmethod
+    def charge_phone_number(seller_id: int, phone_number, amount: Decimal) -> RechargeSale:
+        # charge by the number itself ('09120000001', '+98 912 000 0001', 989120000001)
         try:
-            seller = Seller.objects.select_for_update().get(id=seller_id)
-        except Seller.DoesNotExist:
-            raise SellerNotFoundError(f"Seller with ID {seller_id} not found")
-
-        # check balance
-        current_balance = Decimal(str(seller.balance))
-        charge_amount = Decimal(str(amount))
+            msisdn = normalize_msisdn(phone_number)
+        except ValueError as e:
+            raise InvalidPhoneNumberError(str(e))
+        phone = PhoneDirectory.by_msisdn(msisdn, shard_for_id(seller_id))
+        if phone is None:
+            raise PhoneNumberNotFoundError(f"Phone number {phone_number} not found")
+        return ChargeService.charge_phone(seller_id, phone.id, amount)
 
-        if current_balance < charge_amount:
-            raise InsufficientBalanceError(
-                f"Insufficient balance. Current: {current_balance}, Required: {charge_amount}"
-            )
+    @staticmethod
+    @retry_on_conflict
+    def charge_phone(seller_id: int, phone_number_id: int, amount: Decimal) -> RechargeSale:
+        # phone numbers are copied to every shard; use the seller's copy
+        db = shard_for_id(seller_id)
+        charge_amount = amount if isinstance(amount, Decimal) else Decimal(str(amount))
 
         try:
-            with transaction.atomic():
-                new_balance = current_balance - charge_amount
-                seller.balance = new_balance
-                seller.save()
-
-                recharge_sale = RechargeSale(
-                    seller=seller,
-                    phone_number=phone_number,
-                    amount=charge_amount,
-                    status="completed"
-                )
-                recharge_sale.save()
-
-                # record transaction for accounting (- for deduction)
-                credit_transaction = CreditTransaction(
-                    seller=seller,
-                    amount=-charge_amount,
-                    transaction_type=TransactionType.RECHARGE_SALE,
-                    reference_id=recharge_sale.id,
-                    balance_after=new_balance
-                )
-                credit_transaction.save()
-
+            phone = PhoneDirectory.by_id(phone_number_id, db)
+            if phone is None:
+                raise PhoneNumberNotFoundError(f"Phone number with ID {phone_number_id} not found")
+
+            if not phone.is_active:
+                raise PhoneNumberInactiveError(f"Phone number {phone.msisdn} is not active")
+
+            with BalanceTransaction(db) as locks:
+                # lock seller to prevent race conditions; the balance is read under the lock
+                try:
+                    seller = locks.lock_seller(seller_id)
+                except Seller.DoesNotExist:
+                    raise SellerNotFoundError(f"Seller with ID {seller_id} not found")
+
+                # check balance against what open holds leave available (MoneyField already hands back Decimal)
+                available_balance = seller.available_balance
+                if available_balance < charge_amount:
+                    raise InsufficientBalanceError(
+                        f"Insufficient balance. Available: {available_balance}, Required: {charge_amount}"
+                    )
+
+                # today's counters for the seller and the phone, under the seller lock
+                SpendingLimits.consume(seller, phone.id, charge_amount)
+
+                recharge_sale = ChargeService.record_sale(seller, phone.id, charge_amount)
                 recharge_sale.refresh_from_db()
-                seller.refresh_from_db()
-                
-                logger.info(f"Recharge sale {recharge_sale.id} completed: seller {seller_id}, amount: {charge_amount}, new balance: {new_balance}")
 
                 return recharge_sale
 
-        except (InsufficientBalanceError, PhoneNumberNotFoundError, PhoneNumberInactiveError, SellerNotFoundError):
+        except (InsufficientBalanceError, SpendingLimitExceededError, PhoneNumberNotFoundError,
+                PhoneNumberInactiveError, SellerNotFoundError) as e:
+            audit_log.emit(RejectionEvent('charge', seller_id, phone_number_id, charge_amount, type(e).__name__, str(e)))
             raise
         except Exception as e:
-            logger.error(f"Failed to process charge for seller {seller_id}: {str(e)}", exc_info=True)
+            # lock conflicts go back to retry_on_conflict
+            if is_transient_db_error(e):
+                raise
+            audit_log.emit(RejectionEvent('charge', seller_id, phone_number_id, charge_amount, type(e).__name__, str(e)))
+            logger.error("Failed to process charge for seller %s: %s", seller_id, e, exc_info=True)
             raise CreditServiceError(f"Failed to process charge: {str(e)}")
 
     @staticmethod
+    def record_sale(seller: Seller, phone_number_id: int, amount: Decimal) -> RechargeSale:
+        # deduct balance, write the sale and its ledger row; caller holds the seller lock
+        # inside an open transaction and has already checked the balance
+        new_balance = seller.balance - amount
+        seller.balance = new_balance
+        seller.ledger_seq += 1
+        seller.save()
+        notify_balance_changed(seller)
+
+        # with provider dispatch on, the sale stays pending until the operator confirms it
+        dispatch = settings.TOPUP_DISPATCH_ENABLED
+        recharge_sale = RechargeSale(
+            seller=seller,
+            phone_number_id=phone_number_id,
+            amount=amount,
+            status=RechargeSaleStatus.PENDING if dispatch else RechargeSaleStatus.COMPLETED
+        )
+        recharge_sale.save()
+
+        if dispatch:
+            # outbox row in the same transaction: the top-up is sent if and only if the sale commits
+            TopUpDispatch.objects.using(seller._state.db).create(
+                recharge_sale=recharge_sale,
+                provider=settings.TOPUP_DEFAULT_PROVIDER,
+                next_attempt_at=timezone.now()
+            )
+
+        # record transaction for accounting (- for deduction)
+        credit_transaction = CreditTransaction(
+            seller=seller,
+            amount=-amount,
+            transaction_type=TransactionType.RECHARGE_SALE,
+            reference_id=recharge_sale.id,
+            balance_after=new_balance,
+            sequence=seller.ledger_seq
+        )
+        credit_transaction.save()
+
+        # audited once the sale commits (direct charges and confirmed holds alike)
+        transaction.on_commit(partial(audit_log.emit, ChargeEvent(
+            recharge_sale.id, seller.id, phone_number_id, amount, new_balance, recharge_sale.status
+        )), using=seller._state.db)
+
+        return recharge_sale
+
+    @staticmethod
+    @retry_on_conflict
+    def refund_sale(sale_id: int, reason: str = '') -> RechargeSale:
+        # provider gave up on a pending sale: mark it failed and credit the amount back
+        db = shard_for_id(sale_id)
+        with BalanceTransaction(db) as locks:
+            # the sale's seller first, then the sale (see app.services.locks)
+            try:
+                seller = locks.lock_seller(Subquery(RechargeSale.objects.filter(id=sale_id).values('seller_id')))
+            except Seller.DoesNotExist:
+                raise CreditServiceError(f"Recharge sale with ID {sale_id} not found")
+            recharge_sale = locks.lock(RechargeSale.objects, id=sale_id)
+            if recharge_sale.status != RechargeSaleStatus.PENDING:
+                raise CreditServiceError(f"Recharge sale {sale_id} is already {recharge_sale.status}")
+
+            seller.balance += recharge_sale.amount
+            seller.ledger_seq += 1
+            seller.save()
+            notify_balance_changed(seller)
+
+            recharge_sale.status = RechargeSaleStatus.FAILED
+            recharge_sale.save(update_fields=['status'])
+            SpendingLimits.give_back(
+                seller, recharge_sale.phone_number_id, recharge_sale.amount, timezone.localdate(recharge_sale.created_at)
+            )
+
+            CreditTransaction.objects.using(db).create(
+                seller=seller,
+                amount=recharge_sale.amount,
+                transaction_type=TransactionType.RECHARGE_REFUND,
+                reference_id=recharge_sale.id,
+                balance_after=seller.balance,
+                sequence=seller.ledger_seq
+            )
+
+        logger.info(f"Recharge sale {sale_id} failed at provider and was refunded: {reason}")
+        return recharge_sale
+
+    @staticmethod
+    @reads_from_replica
     def get_recharge_history(seller_id: int, limit: int = 100) -> list:
-        recharge_sales = RechargeSale.objects.filter(
+        recharge_sales = RechargeSale.objects.using(seller_db_for_read(seller_id)).filter(
             seller_id=seller_id
         ).order_by('-created_at')[:limit]
 
         return list(recharge_sales)   
+
+    @staticmethod
+    @reads_from_replica
+    def get_phone_recharges(phone_number_id: int, limit: int = DEFAULT_PHONE_RECHARGES_LIMIT,
+                            cursor: Optional[str] = None, seller_id: Optional[int] = None) -> dict:
+        # recharges to one number, newest first, keyset paged on (created_at, id) along the
+        # recharge_phone_created_id index: every page is an index range scan, however deep.
+        # sales of one number are spread over the shards; each gives its next page and the
+        # pages are merged (ids are unique across shards, so the order is total)
+        limit = max(1, min(limit, MAX_PHONE_RECHARGES_LIMIT))
+        query = Q(phone_number_id=phone_number_id)
+        if cursor:
+            created_at, sale_id = decode_recharge_cursor(cursor)
+            query &= Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=sale_id)
+        if seller_id is not None:
+            query &= Q(seller_id=seller_id)
+        shards = [shard_for_id(seller_id)] if seller_id is not None else seller_shards()
+
+        rows = []
+        for db in shards:
+            rows += RechargeSale.objects.using(shard_db_for_read(db)).filter(query).order_by(
+                '-created_at', '-id'
+            ).values(*PHONE_RECHARGE_FIELDS)[:limit + 1]
+        rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'recharges': rows,
+            'next_cursor': encode_recharge_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None,
+            'has_more': has_more
+        }
@@ -1,13 +1,30 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from functools import partial
+from typing import Iterable, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 from app.models import Seller, CreditRequest, RechargeSale, CreditTransaction, CreditRequestStatus, TransactionType
+from app.db_routing import seller_db_for_read, shard_for_id
+from app.fields import MoneyField
+from app.services import audit_log
+from app.services.audit_log import ApprovalEvent, RejectionEvent
+from app.services.balance_events import notify_balance_changed
+from app.services.job_queue import JobService
+from app.services.locks import BalanceTransaction
+from app.services.retry import retry_on_conflict, is_transient_db_error
+
+SELLER_BALANCE_CACHE_KEY = 'seller-balance:{}'
+
 
 class CreditServiceError(Exception):
     pass
@@ -28,13 +45,14 @@ class InsufficientBalanceError(CreditServiceError):
 class CreditService:
     @staticmethod
     def create_credit_request(seller_id: int, amount: Decimal) -> CreditRequest:
+        db = shard_for_id(seller_id)
         try:
-            seller = Seller.objects.get(id=seller_id)
+            seller = Seller.objects.using(db).get(id=seller_id)
         except Seller.DoesNotExist:
             raise SellerNotFoundError(f"Seller with id {seller_id} not found")
         
         # check for pending requests with same amount
-        existing_request = CreditRequest.objects.filter(
+        existing_request = CreditRequest.objects.using(db).filter(
             seller_id=seller_id,
             amount=amount,
             status=CreditRequestStatus.PENDING
@@ -52,24 +70,21 @@ class CreditService:
         return credit_request
 
     @staticmethod
+    @retry_on_conflict
     def approve_credit_request(request_id: int) -> CreditRequest:
-        # prevent race condition
-        try:
-            credit_request = CreditRequest.objects.select_for_update().get(id=request_id)
-        except CreditRequest.DoesNotExist:
-            raise CreditRequestNotFoundError(f"Credit request with ID {request_id} not found")
-        # check if still pending
-        if credit_request.status != CreditRequestStatus.PENDING:
-            raise InvalidCreditRequestError(f"Credit request {request_id} is already {credit_request.status}. Cannot approve.")
-
-        # lock seller to prevent concurrent balance updates
+        db = shard_for_id(request_id)
         try:
-            seller = Seller.objects.select_for_update().get(id=credit_request.seller_id)
-        except Seller.DoesNotExist:
-            raise SellerNotFoundError(f"Seller with ID {credit_request.seller_id} not found")
+            with BalanceTransaction(db) as locks:
+                # the request's seller first, then the request (see app.services.locks)
+                try:
+                    seller = locks.lock_seller(Subquery(CreditRequest.objects.filter(id=request_id).values('seller_id')))
+                    credit_request = locks.lock(CreditRequest.objects, id=request_id)
+                except (Seller.DoesNotExist, CreditRequest.DoesNotExist):
+                    raise CreditRequestNotFoundError(f"Credit request with ID {request_id} not found")
+                # check if still pending
+                if credit_request.status != CreditRequestStatus.PENDING:
+                    raise InvalidCreditRequestError(f"Credit request {request_id} is already {credit_request.status}. Cannot approve.")
 
-        try:
-            with transaction.atomic():
                 new_balance = seller.balance + credit_request.amount
 
                 credit_request.status = CreditRequestStatus.APPROVED
@@ -77,7 +92,9 @@ class CreditService:
                 credit_request.save()
 
                 seller.balance = new_balance
+                seller.ledger_seq += 1
                 seller.save()
+                notify_balance_changed(seller)
 
                 # record transaction for accounting
                 credit_transaction = CreditTransaction(
@@ -85,49 +102,150 @@ class CreditService:
                     amount=credit_request.amount,
                     transaction_type=TransactionType.CREDIT_INCREASE,
                     reference_id=credit_request.id,
-                    balance_after=new_balance
+                    balance_after=new_balance,
+                    sequence=seller.ledger_seq
                 )
                 credit_transaction.save()
 
+                # re-check the seller against its ledger off the request path
+                JobService.enqueue_on_commit(
+                    'app.tasks.verify_seller_ledger', {'seller_id': seller.id}, priority=-1, using=db
+                )
+                transaction.on_commit(partial(audit_log.emit, ApprovalEvent(
+                    credit_request.id, seller.id, credit_request.amount, new_balance
+                )), using=db)
+
                 credit_request.refresh_from_db()
                 seller.refresh_from_db()
 
                 return credit_request
 
+        except (CreditRequestNotFoundError, InvalidCreditRequestError, SellerNotFoundError) as e:
+            audit_log.emit(RejectionEvent('approve', None, request_id, None, type(e).__name__, str(e)))
+            raise
         except Exception as e:
+            # lock conflicts go back to retry_on_conflict
+            if is_transient_db_error(e):
+                raise
+            audit_log.emit(RejectionEvent('approve', None, request_id, None, type(e).__name__, str(e)))
             raise InvalidCreditRequestError(f"Failed to approve credit request: {str(e)}")
 
     @staticmethod
     def get_seller_balance(seller_id: int) -> Optional[Decimal]:
         try:
-            seller = Seller.objects.get(id=seller_id)
+            seller = Seller.objects.using(seller_db_for_read(seller_id)).get(id=seller_id)
             return seller.balance
         except Seller.DoesNotExist:
             return None
 
+    @staticmethod
+    def get_balances(seller_ids: Iterable[int], use_cache: bool = False) -> dict:
+        # seller id -> (name, balance, held_balance) for many sellers, one narrow IN query per
+        # shard; unknown ids are left out. with use_cache, sellers read within the last
+        # SELLER_BALANCES_CACHE_SECONDS come from the cache and only the rest are queried
+        seller_ids = list(seller_ids)
+        balances = {}
+        if use_cache:
+            cached = cache.get_many([SELLER_BALANCE_CACHE_KEY.format(seller_id) for seller_id in seller_ids])
+            for seller_id in seller_ids:
+                entry = cached.get(SELLER_BALANCE_CACHE_KEY.format(seller_id))
+                if entry is not None:
+                    balances[seller_id] = entry
+
+        by_shard = {}
+        for seller_id in seller_ids:
+            if seller_id not in balances:
+                by_shard.setdefault(seller_db_for_read(seller_id), []).append(seller_id)
+
+        fresh = {}
+        for db, shard_seller_ids in by_shard.items():
+            rows = Seller.objects.using(db).filter(
+                id__in=shard_seller_ids
+            ).values_list('id', 'name', 'balance', 'held_balance')
+            for seller_id, name, balance, held_balance in rows:
+                fresh[seller_id] = (name, balance, held_balance)
+
+        # every read refreshes the cache for the next cached one
+        if fresh and settings.SELLER_BALANCES_CACHE_SECONDS:
+            cache.set_many(
+                {SELLER_BALANCE_CACHE_KEY.format(seller_id): entry for seller_id, entry in fresh.items()},
+                timeout=settings.SELLER_BALANCES_CACHE_SECONDS
+            )
+        balances.update(fresh)
+        return balances
+
+    @staticmethod
+    def get_balances_at(seller_ids: Iterable[int], at: datetime) -> dict:
+        # balance_after of the last ledger row at or before `at`, one query per shard;
+        # the correlated subquery is an index seek on (seller, created_at) per seller
+        last_row = CreditTransaction.objects.filter(
+            seller_id=OuterRef('pk'),
+            created_at__lte=at
+        ).order_by('-created_at', '-id').values('balance_after')[:1]
+
+        by_shard = {}
+        for seller_id in seller_ids:
+            by_shard.setdefault(seller_db_for_read(seller_id), []).append(seller_id)
+
+        balances = {}
+        for db, shard_seller_ids in by_shard.items():
+            rows = Seller.objects.using(db).filter(
+                id__in=shard_seller_ids
+            ).annotate(
+                balance_at=Subquery(last_row)
+            ).values_list('id', 'balance_at')
+
+            # sellers without ledger rows before `at` had nothing credited yet
+            for seller_id, balance in rows:
+                balances[seller_id] = balance if balance is not None else Decimal('0.00')
+        return balances
+
+    @staticmethod
+    def get_balance_at(seller_id: int, at: datetime) -> Decimal:
+        balances = CreditService.get_balances_at([seller_id], at)
+        if seller_id not in balances:
+            raise SellerNotFoundError(f"Seller with ID {seller_id} not found")
+        return balances[seller_id]
+
     @staticmethod
     def verify_accounting_integrity(seller_id: int) -> dict:
         # verify balance matches sum of transactions
+        db = seller_db_for_read(seller_id)
         try:
-            seller = Seller.objects.get(id=seller_id)
+            seller = Seller.objects.using(db).get(id=seller_id)
         except Seller.DoesNotExist:
             raise SellerNotFoundError(f"Seller with ID {seller_id} not found")
         
-        transactions = CreditTransaction.objects.filter(seller_id=seller_id)
-
-        # sum all transactions
-        calculated_balance = sum(
-            Decimal(str(t.amount)) for t in transactions
+        # sum all transactions in the database: an exact integer SUM over minor units
+        totals = CreditTransaction.objects.using(db).filter(seller_id=seller_id).aggregate(
+            calculated_balance=Sum('amount'),
+            transaction_count=Count('id')
         )
+        calculated_balance = totals['calculated_balance'] or Decimal('0.00')
 
-        current_balance = Decimal(str(seller.balance))
-        is_match = abs(current_balance - calculated_balance) < Decimal('0.01')  # rounding tolerance
+        current_balance = seller.balance
+        is_match = current_balance == calculated_balance
 
         return {
             "seller_id": seller_id,
             "current_balance": current_balance,
             "calculated_balance": calculated_balance,
             "is_match": is_match,
-            "transaction_count": transactions.count()
+            "transaction_count": totals['transaction_count']
         }
-    
\ No newline at end of file
+    
+
+    @staticmethod
+    def find_accounting_mismatches(db: str) -> list:
+        # every seller on one shard whose balance differs from its ledger sum, in one query
+        ledger_total = CreditTransaction.objects.filter(
+            seller_id=OuterRef('pk')
+        ).order_by().values('seller_id').annotate(total=Sum('amount')).values('total')
+
+        return list(
+            Seller.objects.using(db).annotate(
+                calculated_balance=Coalesce(Subquery(ledger_total), Value(0, output_field=MoneyField()))
+            ).exclude(
+                balance=F('calculated_balance')
+            ).order_by('id').values('id', 'balance', 'calculated_balance')
+        )
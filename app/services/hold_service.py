@@ -0,0 +1,158 @@
+from django.conf import settings
+from django.db.models import Subquery
+from django.utils import timezone
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+import logging
+
+from app.models import Seller, RechargeSale, BalanceHold, BalanceHoldStatus
+from app.db_routing import seller_shards, shard_for_id
+from app.services.balance_events import notify_balance_changed
+from app.services.credit_service import SellerNotFoundError, CreditServiceError, InsufficientBalanceError
+from app.services.charge_service import ChargeService, PhoneNumberNotFoundError, PhoneNumberInactiveError
+from app.services.locks import BalanceTransaction
+from app.services.phone_directory import PhoneDirectory
+from app.services.spending_limits import SpendingLimits
+from app.services.retry import retry_on_conflict
+
+logger = logging.getLogger(__name__)
+
+
+class HoldNotFoundError(CreditServiceError):
+    pass
+
+
+class InvalidHoldStateError(CreditServiceError):
+    pass
+
+
+class HoldExpiredError(InvalidHoldStateError):
+    pass
+
+
+class HoldService:
+    # two-phase charge: reserve -> (provider call, no locks held) -> confirm or release.
+    # every state change is its own short transaction around the seller row lock
+
+    @staticmethod
+    @retry_on_conflict
+    def reserve(seller_id: int, phone_number_id: int, amount: Decimal, ttl_seconds: Optional[int] = None) -> BalanceHold:
+        db = shard_for_id(seller_id)
+        phone = PhoneDirectory.by_id(phone_number_id, db)
+        if phone is None:
+            raise PhoneNumberNotFoundError(f"Phone number with ID {phone_number_id} not found")
+
+        if not phone.is_active:
+            raise PhoneNumberInactiveError(f"Phone number {phone.msisdn} is not active")
+
+        ttl = ttl_seconds if ttl_seconds is not None else settings.BALANCE_HOLD_TTL_SECONDS
+
+        with BalanceTransaction(db) as locks:
+            try:
+                seller = locks.lock_seller(seller_id)
+            except Seller.DoesNotExist:
+                raise SellerNotFoundError(f"Seller with ID {seller_id} not found")
+
+            if seller.available_balance < amount:
+                raise InsufficientBalanceError(
+                    f"Insufficient balance. Available: {seller.available_balance}, Required: {amount}"
+                )
+            # counted when reserved, so a hold cannot be confirmed past the limit
+            SpendingLimits.consume(seller, phone.id, amount)
+
+            seller.held_balance += amount
+            seller.save(update_fields=['held_balance'])
+            notify_balance_changed(seller)
+
+            hold = BalanceHold.objects.using(db).create(
+                seller=seller,
+                phone_number_id=phone.id,
+                amount=amount,
+                expires_at=timezone.now() + timedelta(seconds=ttl)
+            )
+
+        return hold
+
+    @staticmethod
+    @retry_on_conflict
+    def confirm(hold_id: int) -> RechargeSale:
+        with BalanceTransaction(shard_for_id(hold_id)) as locks:
+            seller, hold = HoldService._lock_open_hold(locks, hold_id)
+
+            if hold.expires_at <= timezone.now():
+                HoldService._resolve(seller, hold, BalanceHoldStatus.EXPIRED)
+                expired = True
+            else:
+                seller.held_balance -= hold.amount
+                recharge_sale = ChargeService.record_sale(seller, hold.phone_number_id, hold.amount)
+
+                hold.status = BalanceHoldStatus.CONFIRMED
+                hold.recharge_sale = recharge_sale
+                hold.resolved_at = timezone.now()
+                hold.save(update_fields=['status', 'recharge_sale', 'resolved_at'])
+                expired = False
+
+        # raised after commit so the expiry itself is kept
+        if expired:
+            raise HoldExpiredError(f"Balance hold {hold_id} expired at {hold.expires_at}")
+
+        logger.info(f"Balance hold {hold.id} confirmed as recharge sale {recharge_sale.id}")
+        return recharge_sale
+
+    @staticmethod
+    @retry_on_conflict
+    def release(hold_id: int) -> BalanceHold:
+        with BalanceTransaction(shard_for_id(hold_id)) as locks:
+            seller, hold = HoldService._lock_open_hold(locks, hold_id)
+            HoldService._resolve(seller, hold, BalanceHoldStatus.RELEASED)
+        return hold
+
+    @staticmethod
+    def release_expired(now: Optional[datetime] = None, batch_size: int = 500) -> int:
+        # sweeper: give back balance held by holds past their expiry
+        now = now or timezone.now()
+        hold_ids = []
+        for db in seller_shards():
+            hold_ids += BalanceHold.objects.using(db).filter(
+                status=BalanceHoldStatus.HELD,
+                expires_at__lte=now
+            ).order_by('expires_at').values_list('id', flat=True)[:batch_size]
+
+        # one transaction per hold, each retried on its own: a lock conflict does not end the pass
+        return sum(HoldService._expire(hold_id) for hold_id in hold_ids)
+
+    @staticmethod
+    @retry_on_conflict
+    def _expire(hold_id: int) -> bool:
+        with BalanceTransaction(shard_for_id(hold_id)) as locks:
+            try:
+                seller, hold = HoldService._lock_open_hold(locks, hold_id)
+            except InvalidHoldStateError:
+                # confirmed or released since it was listed
+                return False
+            HoldService._resolve(seller, hold, BalanceHoldStatus.EXPIRED)
+        return True
+
+    @staticmethod
+    def _lock_open_hold(locks: BalanceTransaction, hold_id: int):
+        # the hold's seller first, then the hold (see app.services.locks)
+        try:
+            seller = locks.lock_seller(Subquery(BalanceHold.objects.filter(id=hold_id).values('seller_id')))
+        except Seller.DoesNotExist:
+            raise HoldNotFoundError(f"Balance hold with ID {hold_id} not found")
+        hold = locks.lock(BalanceHold.objects.select_related('phone_number'), id=hold_id)
+        if hold.status != BalanceHoldStatus.HELD:
+            raise InvalidHoldStateError(f"Balance hold {hold_id} is already {hold.status}")
+        return seller, hold
+
+    @staticmethod
+    def _resolve(seller: Seller, hold: BalanceHold, status: str):
+        seller.held_balance -= hold.amount
+        seller.save(update_fields=['held_balance'])
+        notify_balance_changed(seller)
+
+        hold.status = status
+        hold.resolved_at = timezone.now()
+        hold.save(update_fields=['status', 'resolved_at'])
+        SpendingLimits.give_back(seller, hold.phone_number_id, hold.amount, timezone.localdate(hold.created_at))
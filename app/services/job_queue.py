@@ -0,0 +1,118 @@
+import logging
+import random
+import traceback
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from app.models import Job, JobStatus
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# the queue is not sharded: every job row lives on the default database
+JOB_DB = DEFAULT_DB_ALIAS
+
+
+class JobService:
+    @staticmethod
+    def enqueue(task: str, payload: Optional[dict] = None, priority: int = 0,
+                run_at: Optional[datetime] = None, max_attempts: int = 3) -> Job:
+        # task is the dotted path of a callable taking the payload as keyword arguments
+        return Job.objects.using(JOB_DB).create(
+            task=task,
+            payload=payload or {},
+            priority=priority,
+            run_at=run_at or timezone.now(),
+            max_attempts=max_attempts
+        )
+
+    @staticmethod
+    def enqueue_on_commit(task: str, payload: Optional[dict] = None, priority: int = 0,
+                          run_at: Optional[datetime] = None, max_attempts: int = 3,
+                          using: str = DEFAULT_DB_ALIAS):
+        # enqueue once the caller's transaction on `using` commits; nothing is queued on rollback.
+        # robust: a failed enqueue is logged instead of failing a request that already committed
+        transaction.on_commit(
+            lambda: JobService.enqueue(task, payload, priority=priority, run_at=run_at, max_attempts=max_attempts),
+            using=using,
+            robust=True
+        )
+
+    @staticmethod
+    def claim(worker_id: str, batch_size: int = 10, lease_seconds: Optional[float] = None) -> list:
+        # take up to batch_size due jobs, highest priority first, oldest run_at within a priority.
+        # running jobs whose lease ran out (crashed worker) are due again
+        close_old_connections()
+        now = timezone.now()
+        lease = settings.JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        due = Q(status=JobStatus.QUEUED, run_at__lte=now) | Q(
+            status=JobStatus.RUNNING, locked_at__lte=now - timedelta(seconds=lease)
+        )
+
+        with transaction.atomic(using=JOB_DB):
+            candidates = Job.objects.using(JOB_DB).filter(due).order_by('-priority', 'run_at', 'id')
+            if connections[JOB_DB].features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return []
+            # on SQLite the write lock taken at BEGIN serializes claims; elsewhere skip_locked
+            # keeps workers apart. (locked_by, locked_at) is the claim token either way
+            Job.objects.using(JOB_DB).filter(due, id__in=ids).update(
+                status=JobStatus.RUNNING, locked_by=worker_id, locked_at=now
+            )
+
+        return list(
+            Job.objects.using(JOB_DB).filter(
+                id__in=ids, status=JobStatus.RUNNING, locked_by=worker_id, locked_at=now
+            ).order_by('-priority', 'run_at', 'id')
+        )
+
+    @staticmethod
+    def run(job: Job, backoff_base: float = 5.0, backoff_max: float = 600.0) -> bool:
+        # run one claimed job; failures go back to the queue with backoff until max_attempts
+        attempts = job.attempts + 1
+        try:
+            func = import_string(job.task)
+            func(**job.payload)
+        except Exception as e:
+            logger.warning(f"Job {job.id} ({job.task}) failed on attempt {attempts}: {e}")
+            error = traceback.format_exc()
+            if attempts < job.max_attempts:
+                delay = min(backoff_max, backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+                JobService._finish(job, JobStatus.QUEUED, attempts, error, run_at=timezone.now() + timedelta(seconds=delay))
+                metrics.increment('jobs.retried')
+            else:
+                JobService._finish(job, JobStatus.FAILED, attempts, error)
+                metrics.increment('jobs.failed')
+            return False
+
+        JobService._finish(job, JobStatus.DONE, attempts)
+        metrics.increment('jobs.done')
+        return True
+
+    @staticmethod
+    def release(jobs: list):
+        # hand claimed jobs that were not started back to the queue (worker shutting down)
+        for job in jobs:
+            JobService._finish(job, JobStatus.QUEUED, job.attempts, job.last_error)
+
+    @staticmethod
+    def _finish(job: Job, status: str, attempts: int, error: str = '', run_at: Optional[datetime] = None):
+        # only the worker still holding the claim writes the outcome
+        updates = {'status': status, 'attempts': attempts, 'last_error': error, 'locked_by': '', 'locked_at': None}
+        if run_at is not None:
+            updates['run_at'] = run_at
+        if status in (JobStatus.DONE, JobStatus.FAILED):
+            updates['finished_at'] = timezone.now()
+        updated = Job.objects.using(JOB_DB).filter(
+            id=job.id, status=JobStatus.RUNNING, locked_by=job.locked_by, locked_at=job.locked_at
+        ).update(**updates)
+        if not updated:
+            logger.warning(f"Job {job.id} lost its claim before finishing (lease expired?)")
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from app.models import CreditTransaction
+
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 5000
+
+CHANGE_FIELDS = (
+    'id', 'seller_id', 'sequence', 'transaction_type', 'amount',
+    'reference_id', 'balance_after', 'created_at'
+)
+
+
+class LedgerService:
+
+    @staticmethod
+    def get_changes(since: int = 0, limit: int = DEFAULT_CHANGES_LIMIT, shard: str = DEFAULT_DB_ALIAS) -> dict:
+        # ledger rows with id > since across all sellers of one shard, oldest first (primary key
+        # range scan). guarantee: a consumer that follows next_since sees every committed row once.
+        # ids are handed out at INSERT but become visible at COMMIT, so on PostgreSQL a row with a
+        # lower id can commit after higher ones were returned; the page therefore stops at the
+        # first row written after the visibility horizon (see _visibility_horizon), and rows past
+        # it are returned by a later call. SQLite commits one writer at a time, in id order
+        limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+        rows = list(
+            CreditTransaction.objects.using(shard).filter(id__gt=since).order_by('id').values(*CHANGE_FIELDS)[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        horizon = LedgerService._visibility_horizon(shard)
+        if horizon is not None:
+            for index, row in enumerate(rows):
+                if row['created_at'] >= horizon:
+                    # not settled yet: the consumer polls again later rather than at once
+                    rows, has_more = rows[:index], False
+                    break
+
+        return {
+            'changes': rows,
+            'next_since': rows[-1]['id'] if rows else since,
+            'has_more': has_more
+        }
+
+    @staticmethod
+    def _visibility_horizon(shard: str) -> Optional[datetime]:
+        # rows created at or after this may still have uncommitted rows with lower ids next to
+        # them: the start of the oldest transaction that is writing on the shard, or now, less
+        # LEDGER_FEED_SETTLE_SECONDS (time between taking an id and the INSERT, clock skew
+        # between app servers). None where commits follow id order
+        connection = connections[shard]
+        if connection.vendor == 'sqlite':
+            return None
+        horizon = timezone.now()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # backend_xid: the transaction has written something
+                cursor.execute(
+                    "SELECT min(xact_start) FROM pg_stat_activity "
+                    "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid() AND datname = current_database()"
+                )
+                oldest = cursor.fetchone()[0]
+            if oldest is not None:
+                horizon = min(horizon, oldest)
+        return horizon - timedelta(seconds=settings.LEDGER_FEED_SETTLE_SECONDS)
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from app.models import Seller
+from app.services import metrics
+
+# every balance mutation runs in a BalanceTransaction, which takes its locks in this order:
+#   1. the transaction itself (on SQLite the database write lock, taken at BEGIN IMMEDIATE)
+#   2. one Seller row; never two sellers in one transaction
+#   3. rows that belong to that seller (CreditRequest, RechargeSale, BalanceHold)
+#   4. SpendingCounter rows (a phone's counter is shared between sellers), last and in one
+#      fixed order: the seller's counter, then the phone's. phone counters are on the default
+#      database; a transaction on another shard joins default's transaction for them (join())
+# a path that starts from a child row locks the child's seller through a subquery first. two
+# transactions therefore never wait on each other in opposite orders, so balance mutations
+# cannot deadlock on these rows.
+#
+# each acquisition is timed. waits and lock hold times are kept per seller (for finding hot
+# sellers, see lock_stats()) and summed under locks.* in the metrics counters
+
+
+class LockOrderError(RuntimeError):
+    pass
+
+
+# the BalanceTransaction open in this thread / task, if any
+_current = ContextVar('balance_transaction', default=None)
+
+
+def current_balance_transaction() -> Optional['BalanceTransaction']:
+    return _current.get()
+
+
+class BalanceTransaction:
+    # with BalanceTransaction(db) as locks:
+    #     seller = locks.lock_seller(seller_id)
+    #     hold = locks.lock(BalanceHold.objects, id=hold_id)
+
+    def __init__(self, using: str):
+        self.using = using
+        self.seller_id = None
+        self._atomic = transaction.atomic(using=using)
+        self._stack = ExitStack()
+        self._joined = set()
+        self._token = None
+        self._begin_wait = 0.0
+        self._wait = 0.0
+        self._locked_at = None
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._stack.enter_context(self._atomic)
+        self._begin_wait = time.perf_counter() - start
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current.reset(self._token)
+        try:
+            # joined transactions commit (or roll back) first, this one last
+            return self._stack.__exit__(exc_type, exc_value, traceback)
+        finally:
+            # held until COMMIT / ROLLBACK returned
+            if self._locked_at is not None:
+                _record(self.seller_id, self._wait, time.perf_counter() - self._locked_at)
+
+    def join(self, using: str):
+        # write rows of another database in this transaction. its transaction opens here, after
+        # this one's locks, and commits just before this one: a failing final COMMIT can leave
+        # the joined writes committed, never the other way round
+        if using != self.using and using not in self._joined:
+            self._joined.add(using)
+            start = time.perf_counter()
+            self._stack.enter_context(transaction.atomic(using=using))
+            self._wait += time.perf_counter() - start
+
+    def lock_seller(self, seller_id) -> Seller:
+        # seller_id may be an expression, e.g. Subquery(CreditRequest...values('seller_id')),
+        # to find and lock a child row's seller in one statement. Seller.DoesNotExist propagates
+        if self._locked_at is not None:
+            raise LockOrderError(f"Seller {self.seller_id} is already locked in this transaction")
+        start = time.perf_counter()
+        seller = Seller.objects.using(self.using).select_for_update().get(id=seller_id)
+        self._locked_at = time.perf_counter()
+        self.seller_id = seller.id
+        self._wait = self._begin_wait + (self._locked_at - start)
+        return seller
+
+    def lock(self, queryset, **lookup):
+        # a row of the locked seller; DoesNotExist propagates
+        if self._locked_at is None:
+            raise LockOrderError(f"Lock the seller before {queryset.model.__name__} rows")
+        # only the row itself, not the rows a select_related() joins in (phone numbers are shared)
+        of = ('self',) if connections[self.using].features.has_select_for_update_of else ()
+        start = time.perf_counter()
+        row = queryset.using(self.using).select_for_update(of=of).get(**lookup)
+        self._wait += time.perf_counter() - start
+        return row
+
+
+class SellerLockStats:
+    __slots__ = ('transactions', 'wait_seconds', 'max_wait_seconds', 'held_seconds')
+
+    def __init__(self):
+        self.transactions = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.held_seconds = 0.0
+
+
+_stats = OrderedDict()  # seller id -> SellerLockStats, least recently locked first
+_stats_lock = threading.Lock()
+
+
+def _record(seller_id: int, wait: float, held: float):
+    with _stats_lock:
+        stats = _stats.get(seller_id)
+        if stats is None:
+            stats = _stats[seller_id] = SellerLockStats()
+            while len(_stats) > settings.LOCK_STATS_MAX_SELLERS:
+                _stats.popitem(last=False)
+        else:
+            _stats.move_to_end(seller_id)
+        stats.transactions += 1
+        stats.wait_seconds += wait
+        stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+        stats.held_seconds += held
+
+    metrics.increment('locks.transactions')
+    metrics.increment('locks.wait_seconds', wait)
+    metrics.increment('locks.held_seconds', held)
+    if wait >= settings.LOCK_WAIT_SLOW_SECONDS:
+        metrics.increment('locks.slow_waits')
+
+
+def lock_stats(limit: int = 20) -> list:
+    # this process's sellers with the most time spent waiting for their locks
+    with _stats_lock:
+        rows = [
+            {
+                'seller_id': seller_id,
+                'transactions': stats.transactions,
+                'wait_seconds': round(stats.wait_seconds, 6),
+                'max_wait_seconds': round(stats.max_wait_seconds, 6),
+                'mean_wait_seconds': round(stats.wait_seconds / stats.transactions, 6),
+                'held_seconds': round(stats.held_seconds, 6),
+            }
+            for seller_id, stats in _stats.items()
+        ]
+    rows.sort(key=lambda row: row['wait_seconds'], reverse=True)
+    return rows[:limit]
+
+
+def reset_lock_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,23 @@
+import threading
+from collections import Counter
+
+# process-local counters for monitoring; GET /api/metrics/ reports the serving worker's values
+
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from app.models import PhoneNumber
+
+
+class PhoneEntry(NamedTuple):
+    id: int
+    msisdn: int
+    is_active: bool
+
+
+class PhoneDirectory:
+    # process-local cache of phone numbers by id and by msisdn, so a charge does not query
+    # the phone table. saves and deletes in this process drop the entry; changes made by
+    # other processes show up after PHONE_DIRECTORY_TTL_SECONDS. unknown numbers are not cached
+
+    _entries = OrderedDict()  # id -> (PhoneEntry, expires)
+    _ids = {}  # msisdn -> id
+    _lock = threading.Lock()
+
+    @staticmethod
+    def by_id(phone_number_id: int, db: str = DEFAULT_DB_ALIAS) -> Optional[PhoneEntry]:
+        entry = PhoneDirectory._get(phone_number_id)
+        if entry is None:
+            entry = PhoneDirectory._load(db, id=phone_number_id)
+        return entry
+
+    @staticmethod
+    def by_msisdn(msisdn: int, db: str = DEFAULT_DB_ALIAS) -> Optional[PhoneEntry]:
+        with PhoneDirectory._lock:
+            phone_number_id = PhoneDirectory._ids.get(msisdn)
+        entry = PhoneDirectory._get(phone_number_id) if phone_number_id is not None else None
+        if entry is None:
+            entry = PhoneDirectory._load(db, msisdn=msisdn)
+        return entry
+
+    @staticmethod
+    def invalidate(phone_number_ids):
+        with PhoneDirectory._lock:
+            for phone_number_id in phone_number_ids:
+                cached = PhoneDirectory._entries.pop(phone_number_id, None)
+                if cached is not None:
+                    PhoneDirectory._ids.pop(cached[0].msisdn, None)
+
+    @staticmethod
+    def clear():
+        with PhoneDirectory._lock:
+            PhoneDirectory._entries.clear()
+            PhoneDirectory._ids.clear()
+
+    @staticmethod
+    def _get(phone_number_id: int) -> Optional[PhoneEntry]:
+        with PhoneDirectory._lock:
+            cached = PhoneDirectory._entries.get(phone_number_id)
+            if cached is None:
+                return None
+            entry, expires = cached
+            if expires < time.monotonic():
+                del PhoneDirectory._entries[phone_number_id]
+                PhoneDirectory._ids.pop(entry.msisdn, None)
+                return None
+            PhoneDirectory._entries.move_to_end(phone_number_id)
+            return entry
+
+    @staticmethod
+    def _load(db: str, **lookup) -> Optional[PhoneEntry]:
+        # one probe of the primary key or the msisdn unique index
+        row = PhoneNumber.objects.using(db).filter(**lookup).values_list('id', 'msisdn', 'is_active').first()
+        if row is None:
+            return None
+        entry = PhoneEntry(*row)
+        with PhoneDirectory._lock:
+            PhoneDirectory._entries[entry.id] = (entry, time.monotonic() + settings.PHONE_DIRECTORY_TTL_SECONDS)
+            PhoneDirectory._entries.move_to_end(entry.id)
+            PhoneDirectory._ids[entry.msisdn] = entry.id
+            while len(PhoneDirectory._entries) > settings.PHONE_DIRECTORY_MAX_ENTRIES:
+                _, (evicted, _) = PhoneDirectory._entries.popitem(last=False)
+                PhoneDirectory._ids.pop(evicted.msisdn, None)
+        return entry
+
+
+@receiver(post_save, sender=PhoneNumber)
+@receiver(post_delete, sender=PhoneNumber)
+def invalidate_phone_entry(sender, instance, **kwargs):
+    PhoneDirectory.invalidate([instance.id])
+
+
+@receiver(post_migrate)
+def clear_phone_directory(sender, **kwargs):
+    # flush (and the test runner) empty the tables without per-row signals
+    PhoneDirectory.clear()
@@ -0,0 +1,138 @@
+import csv
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from app.db_routing import seller_shards
+from app.fields import normalize_msisdn
+from app.models import PhoneNumber
+from app.services.phone_directory import PhoneDirectory
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+
+@dataclass
+class PhoneImportResult:
+    rows: int = 0
+    inserted: int = 0
+    existing: int = 0
+    toggled: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    # first few unparseable rows, for the report
+    invalid_samples: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'rows': self.rows, 'inserted': self.inserted, 'existing': self.existing,
+            'toggled': self.toggled, 'duplicates': self.duplicates, 'invalid': self.invalid,
+            'invalid_samples': self.invalid_samples,
+            'seconds': round(self.seconds, 3), 'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class PhoneImportService:
+    @staticmethod
+    def import_lines(lines: Iterable[str], batch_size: int = 5000, active: Optional[bool] = None,
+                     progress=None) -> PhoneImportResult:
+        # lines of a CSV (number[,active]) or a plain list of numbers, consumed chunk by chunk so
+        # memory stays flat whatever the file size. new numbers are inserted, known ones are left
+        # alone unless the row (or `active`, which overrides every row) sets is_active
+        result = PhoneImportResult()
+        start = time.monotonic()
+        chunk = {}
+
+        for row in csv.reader(lines):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            result.rows += 1
+            try:
+                msisdn = normalize_msisdn(row[0])
+                row_active = PhoneImportService._parse_active(row[1]) if len(row) > 1 and row[1].strip() else None
+            except ValueError:
+                if result.rows == 1:
+                    # header line
+                    result.rows -= 1
+                    continue
+                result.invalid += 1
+                if len(result.invalid_samples) < 10:
+                    result.invalid_samples.append(','.join(row))
+                continue
+
+            if msisdn in chunk:
+                result.duplicates += 1
+            chunk[msisdn] = (row[0].strip(), active if active is not None else row_active)
+            if len(chunk) >= batch_size:
+                PhoneImportService._write_chunk(chunk, result)
+                chunk = {}
+                if progress:
+                    result.seconds = time.monotonic() - start
+                    progress(result)
+
+        if chunk:
+            PhoneImportService._write_chunk(chunk, result)
+        result.seconds = time.monotonic() - start
+        return result
+
+    @staticmethod
+    def _parse_active(value: str) -> bool:
+        value = value.strip().lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise ValueError(f"{value!r} is not an active flag")
+
+    @staticmethod
+    def _write_chunk(chunk: dict, result: PhoneImportResult):
+        phones = PhoneNumber.objects.using(DEFAULT_DB_ALIAS)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            # one probe of the msisdn index per number
+            existing = dict(phones.filter(msisdn__in=list(chunk)).values_list('msisdn', 'is_active'))
+            new = [
+                PhoneNumber(phone_number=raw[:20], msisdn=msisdn, is_active=True if row_active is None else row_active)
+                for msisdn, (raw, row_active) in chunk.items() if msisdn not in existing
+            ]
+            # bulk_create skips save(): msisdn is set above. a number inserted concurrently is skipped
+            phones.bulk_create(new, batch_size=1000, ignore_conflicts=True)
+
+            toggled = []
+            for value in (True, False):
+                numbers = [
+                    msisdn for msisdn, (_, row_active) in chunk.items()
+                    if row_active is value and msisdn in existing and existing[msisdn] is not value
+                ]
+                if numbers:
+                    toggled += list(phones.filter(msisdn__in=numbers).values_list('id', flat=True))
+                    phones.filter(msisdn__in=numbers).update(is_active=value)
+
+        result.inserted += len(new)
+        result.existing += len(existing)
+        result.toggled += len(toggled)
+        PhoneDirectory.invalidate(toggled)
+        if new or toggled:
+            PhoneImportService._replicate(list(chunk))
+
+    @staticmethod
+    def _replicate(msisdns: list):
+        # bulk writes skip the post_save replication: copy the chunk's rows to the other shards
+        shards = [db for db in seller_shards() if db != DEFAULT_DB_ALIAS]
+        if not shards:
+            return
+        rows = list(PhoneNumber.objects.using(DEFAULT_DB_ALIAS).filter(msisdn__in=msisdns))
+        for db in shards:
+            PhoneNumber.objects.using(db).bulk_create(
+                rows, batch_size=1000, update_conflicts=True,
+                unique_fields=['id'], update_fields=['phone_number', 'msisdn', 'is_active']
+            )
@@ -0,0 +1,67 @@
+import functools
+import logging
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# serialization_failure, deadlock_detected, lock_not_available
+TRANSIENT_SQLSTATES = {'40001', '40P01', '55P03'}
+TRANSIENT_SQLITE_MESSAGES = ('database is locked', 'database table is locked', 'database schema is locked')
+
+
+def is_transient_db_error(exc: BaseException) -> bool:
+    # lock and serialization conflicts that succeed when the whole transaction runs again
+    while exc is not None:
+        if getattr(exc, 'pgcode', None) in TRANSIENT_SQLSTATES or getattr(exc, 'sqlstate', None) in TRANSIENT_SQLSTATES:
+            return True
+        if isinstance(exc, (DatabaseError, sqlite3.Error)) and any(message in str(exc) for message in TRANSIENT_SQLITE_MESSAGES):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def retry_on_conflict(func=None, *, budget_seconds=None, base_delay=0.005, max_delay=0.25):
+    # re-run a service method that owns its transaction when it hits a transient conflict,
+    # with full-jitter exponential backoff until budget_seconds are used up.
+    # inside an outer transaction the conflict is re-raised: only the outermost block can retry
+    if func is None:
+        return functools.partial(retry_on_conflict, budget_seconds=budget_seconds, base_delay=base_delay, max_delay=max_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        budget = settings.DB_RETRY_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+        start = time.monotonic()
+        retries = 0
+        while True:
+            attempt_start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_transient_db_error(e) or any(conn.in_atomic_block for conn in connections.all(initialized_only=True)):
+                    raise
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** retries))
+                if time.monotonic() + delay - start > budget:
+                    metrics.increment('db_retry.gave_up')
+                    metrics.increment('db_retry.seconds_lost', time.monotonic() - start)
+                    logger.warning(f"{func.__qualname__} gave up after {retries} retries: {e}")
+                    raise
+                retries += 1
+                metrics.increment('db_retry.retries')
+                time.sleep(delay)
+                continue
+
+            if retries:
+                # failed attempts and backoff sleeps, not the attempt that succeeded
+                metrics.increment('db_retry.seconds_lost', attempt_start - start)
+                metrics.increment('db_retry.recovered')
+                logger.info(f"{func.__qualname__} succeeded after {retries} retries")
+            return result
+
+    return wrapper
@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from app.db_routing import seller_shards
+from app.fields import MoneyField
+from app.models import Seller, SpendingCounter, SpendingCounterKind
+from app.services.credit_service import CreditServiceError
+from app.services.locks import current_balance_transaction
+
+SELLER_DAILY_LIMIT_EXCEEDED = 'seller_daily_limit_exceeded'
+PHONE_DAILY_LIMIT_EXCEEDED = 'phone_daily_limit_exceeded'
+
+# phone counters are shared by sellers on every shard, so they live on one database
+PHONE_COUNTER_DB = DEFAULT_DB_ALIAS
+
+
+class SpendingLimitExceededError(CreditServiceError):
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _setting_limit(value) -> Optional[Decimal]:
+    return Decimal(str(value)) if value not in (None, '') else None
+
+
+class SpendingLimits:
+    # daily caps on a seller's sales and on the top-ups a phone number receives, kept as one
+    # counter row per seller / phone and day. a charge bumps its counters with a conditional
+    # UPDATE (amount + charge <= limit) in the charge transaction, after the seller lock
+    # (app.services.locks), so it costs one statement per limit and never sums recharge_sales.
+    # seller counters are on the seller's shard, phone counters on PHONE_COUNTER_DB
+
+    @staticmethod
+    def limits_for(seller: Seller):
+        # -> (daily sales limit, daily phone limit); None is no limit. the phone counter is shared
+        # by every seller charging the number, so its limit is the same for all of them
+        sales_limit = seller.daily_sales_limit
+        if sales_limit is None:
+            sales_limit = _setting_limit(settings.SELLER_DAILY_SALES_LIMIT)
+        return sales_limit, _setting_limit(settings.PHONE_DAILY_TOPUP_LIMIT)
+
+    @staticmethod
+    def consume(seller: Seller, phone_number_id: int, amount: Decimal, day: Optional[date] = None):
+        # count a sale of `amount` to the phone against today's limits, or raise
+        # SpendingLimitExceededError; the caller rolls back the transaction on error
+        sales_limit, phone_limit = SpendingLimits.limits_for(seller)
+        if sales_limit is None and phone_limit is None:
+            return
+        day = day or timezone.localdate()
+        db = seller._state.db
+        if sales_limit is not None and not SpendingLimits._add(db, SpendingCounterKind.SELLER, seller.id, day, amount, sales_limit):
+            raise SpendingLimitExceededError(
+                f"Daily sales limit of {sales_limit} reached for seller {seller.id}", SELLER_DAILY_LIMIT_EXCEEDED
+            )
+        if phone_limit is not None and not SpendingLimits._add(
+            SpendingLimits._phone_db(), SpendingCounterKind.PHONE, phone_number_id, day, amount, phone_limit
+        ):
+            raise SpendingLimitExceededError(
+                f"Daily top-up limit of {phone_limit} reached for phone number {phone_number_id}", PHONE_DAILY_LIMIT_EXCEEDED
+            )
+
+    @staticmethod
+    def give_back(seller: Seller, phone_number_id: int, amount: Decimal, day: date):
+        # undo consume() for a released hold or a refunded sale of that day
+        if SpendingLimits.limits_for(seller) == (None, None):
+            return
+        decrement = Value(amount, output_field=MoneyField())
+        zero = Value(Decimal('0.00'), output_field=MoneyField())
+        counters = (
+            (seller._state.db, SpendingCounterKind.SELLER, seller.id),
+            (SpendingLimits._phone_db(), SpendingCounterKind.PHONE, phone_number_id),
+        )
+        for db, kind, subject_id in counters:
+            # counters may have started after the sale (limit set mid-day): never below zero
+            SpendingCounter.objects.using(db).filter(
+                kind=kind, subject_id=subject_id, day=day
+            ).update(amount=Greatest(F('amount') - decrement, zero))
+
+    @staticmethod
+    def spent(db: str, kind: str, subject_id: int, day: Optional[date] = None) -> Decimal:
+        day = day or timezone.localdate()
+        amount = SpendingCounter.objects.using(db).filter(
+            kind=kind, subject_id=subject_id, day=day
+        ).values_list('amount', flat=True).first()
+        return amount if amount is not None else Decimal('0.00')
+
+    @staticmethod
+    def purge_expired(retention_days: Optional[int] = None) -> int:
+        # delete counters of days that can no longer be charged against
+        days = settings.SPENDING_COUNTER_RETENTION_DAYS if retention_days is None else retention_days
+        before = timezone.localdate() - timedelta(days=days)
+        deleted = 0
+        for db in seller_shards():
+            deleted += SpendingCounter.objects.using(db).filter(day__lt=before).delete()[0]
+        return deleted
+
+    @staticmethod
+    def _phone_db() -> str:
+        # a charge on another shard writes the phone counter in its BalanceTransaction too
+        locks = current_balance_transaction()
+        if locks is not None:
+            locks.join(PHONE_COUNTER_DB)
+        return PHONE_COUNTER_DB
+
+    @staticmethod
+    def _add(db: str, kind: str, subject_id: int, day: date, amount: Decimal, limit: Decimal) -> bool:
+        if amount > limit:
+            return False
+        counters = SpendingCounter.objects.using(db).filter(kind=kind, subject_id=subject_id, day=day)
+        # MoneyField turns the Decimal into the column's minor units
+        increment = Value(amount, output_field=MoneyField())
+        if counters.filter(amount__lte=limit - amount).update(amount=F('amount') + increment):
+            return True
+
+        # first charge of the day, or over the limit
+        _, created = SpendingCounter.objects.using(db).get_or_create(
+            kind=kind, subject_id=subject_id, day=day, defaults={'amount': amount}
+        )
+        if created:
+            return True
+        # another transaction created the row first
+        return counters.filter(amount__lte=limit - amount).update(amount=F('amount') + increment) > 0
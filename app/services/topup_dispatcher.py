@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import random
+import uuid
+from collections import Counter
+from datetime import timedelta
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.db_routing import seller_shards, shard_for_id
+from app.models import RechargeSale, RechargeSaleStatus, TopUpDispatch, TopUpDispatchStatus
+from app.services.charge_service import ChargeService
+from app.services.topup_providers import TopUpRequest, TopUpResult, load_providers
+
+logger = logging.getLogger(__name__)
+
+
+class TopUpDispatcher:
+    # drains the TopUpDispatch outbox: claims due rows, sends them to their provider with
+    # bounded concurrency and batching, and writes the outcome back to RechargeSale
+
+    def __init__(self, providers: Optional[dict] = None, claim_batch: int = 200, poll_interval: float = 0.5,
+                 max_attempts: Optional[int] = None, backoff_base: float = 1.0, backoff_max: float = 300.0,
+                 lease_seconds: float = 120.0):
+        self.providers = providers if providers is not None else load_providers()
+        self.claim_batch = claim_batch
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts or settings.TOPUP_MAX_ATTEMPTS
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # in-flight rows older than this are assumed lost (crashed dispatcher) and claimed again
+        self.lease_seconds = lease_seconds
+        self.stats = Counter()
+        self._semaphores = {}
+        self._in_flight = 0
+
+    async def run(self, stop: Optional[asyncio.Event] = None, until_idle: bool = False):
+        tasks = set()
+        while not (stop and stop.is_set()):
+            claimed = []
+            capacity = self.claim_batch - self._in_flight
+            if capacity > 0:
+                claimed = await sync_to_async(self.claim)(capacity)
+                tasks.update(self._spawn(claimed))
+
+            if tasks:
+                _, tasks = await asyncio.wait(tasks, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            elif until_idle:
+                break
+            elif not claimed:
+                await asyncio.sleep(self.poll_interval)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def claim(self, limit: int) -> list:
+        close_old_connections()
+        claimed = []
+        for db in seller_shards():
+            if len(claimed) >= limit:
+                break
+            claimed += self._claim_shard(db, limit - len(claimed))
+        return claimed
+
+    def _claim_shard(self, db: str, limit: int) -> list:
+        now = timezone.now()
+        due = Q(status=TopUpDispatchStatus.PENDING, next_attempt_at__lte=now) | Q(
+            status=TopUpDispatchStatus.IN_FLIGHT, claimed_at__lte=now - timedelta(seconds=self.lease_seconds)
+        )
+
+        with transaction.atomic(using=db):
+            candidates = TopUpDispatch.objects.using(db).filter(due).order_by('next_attempt_at')
+            if connections[db].features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            ids = list(candidates.values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            # rows another dispatcher took in between keep their token
+            token = uuid.uuid4()
+            TopUpDispatch.objects.using(db).filter(due, id__in=ids).update(
+                status=TopUpDispatchStatus.IN_FLIGHT, claimed_at=now, claim_token=token
+            )
+
+        return list(
+            TopUpDispatch.objects.using(db).filter(
+                id__in=ids, status=TopUpDispatchStatus.IN_FLIGHT, claim_token=token
+            ).values(
+                'id', 'provider', 'attempts', 'claim_token', 'recharge_sale_id',
+                'recharge_sale__amount', 'recharge_sale__phone_number__msisdn'
+            )
+        )
+
+    def _spawn(self, rows):
+        by_provider = {}
+        for row in rows:
+            by_provider.setdefault(row['provider'], []).append(row)
+
+        for name, provider_rows in by_provider.items():
+            provider = self.providers.get(name)
+            batch_size = provider.max_batch_size if provider else len(provider_rows)
+            for start in range(0, len(provider_rows), batch_size):
+                batch = provider_rows[start:start + batch_size]
+                self._in_flight += len(batch)
+                yield asyncio.ensure_future(self._send(name, provider, batch))
+
+    async def _send(self, name, provider, rows):
+        try:
+            if provider is None:
+                results = [
+                    TopUpResult(row['recharge_sale_id'], ok=False, error=f"unknown provider {name}", retryable=False)
+                    for row in rows
+                ]
+            else:
+                requests = [
+                    TopUpRequest(
+                        sale_id=row['recharge_sale_id'],
+                        msisdn=row['recharge_sale__phone_number__msisdn'],
+                        amount=row['recharge_sale__amount']
+                    )
+                    for row in rows
+                ]
+                if name not in self._semaphores:
+                    self._semaphores[name] = asyncio.Semaphore(provider.max_concurrency)
+                async with self._semaphores[name]:
+                    try:
+                        results = await provider.send(requests)
+                    except Exception as e:
+                        logger.warning(f"Top-up batch to {name} failed: {e}")
+                        results = [TopUpResult(row['recharge_sale_id'], ok=False, error=str(e)) for row in rows]
+
+            await sync_to_async(self.apply_results)(rows, results)
+        finally:
+            self._in_flight -= len(rows)
+
+    def apply_results(self, rows, results):
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(shard_for_id(row['id']), []).append(row)
+        for db, shard_rows in by_shard.items():
+            self._apply_shard_results(db, shard_rows, results)
+
+    def _apply_shard_results(self, db, rows, results):
+        by_sale = {result.sale_id: result for result in results}
+        now = timezone.now()
+        completed, retried, failed = [], [], []
+
+        for row in rows:
+            result = by_sale.get(row['recharge_sale_id']) or TopUpResult(
+                row['recharge_sale_id'], ok=False, error='no result from provider'
+            )
+            attempts = row['attempts'] + 1
+            dispatch = TopUpDispatch(
+                id=row['id'], attempts=attempts, provider_reference=result.reference,
+                last_error=result.error, updated_at=now, next_attempt_at=now, claim_token=None
+            )
+            if result.ok:
+                dispatch.status = TopUpDispatchStatus.DONE
+                completed.append(dispatch)
+            elif result.retryable and attempts < self.max_attempts:
+                dispatch.status = TopUpDispatchStatus.PENDING
+                dispatch.next_attempt_at = now + timedelta(seconds=self._backoff(attempts))
+                retried.append(dispatch)
+            else:
+                dispatch.status = TopUpDispatchStatus.FAILED
+                failed.append((row['recharge_sale_id'], dispatch))
+
+        fields = ['status', 'attempts', 'provider_reference', 'last_error', 'next_attempt_at', 'updated_at', 'claim_token']
+        tokens = {row['id']: row['claim_token'] for row in rows}
+        with transaction.atomic(using=db):
+            # a row whose lease ran out may have been claimed again and resolved by another
+            # dispatcher: write back only rows still in flight under this claim
+            owned = self._owned(db, tokens)
+            completed = [dispatch for dispatch in completed if dispatch.id in owned]
+            retried = [dispatch for dispatch in retried if dispatch.id in owned]
+            if completed:
+                RechargeSale.objects.using(db).filter(
+                    dispatch__id__in=[dispatch.id for dispatch in completed],
+                    status=RechargeSaleStatus.PENDING
+                ).update(status=RechargeSaleStatus.COMPLETED)
+            TopUpDispatch.objects.using(db).bulk_update(completed + retried, fields)
+            # failures are marked first, so no other dispatcher takes the row while it is refunded
+            failed = [(sale_id, dispatch) for sale_id, dispatch in failed if dispatch.id in owned]
+            TopUpDispatch.objects.using(db).bulk_update([dispatch for _, dispatch in failed], fields)
+
+        for sale_id, dispatch in failed:
+            try:
+                ChargeService.refund_sale(sale_id, reason=dispatch.last_error)
+            except Exception as e:
+                logger.error(f"Failed to refund recharge sale {sale_id}: {str(e)}", exc_info=True)
+                TopUpDispatch.objects.using(db).filter(id=dispatch.id, status=TopUpDispatchStatus.FAILED).update(
+                    status=TopUpDispatchStatus.PENDING, next_attempt_at=now + timedelta(seconds=self.backoff_max)
+                )
+
+        self.stats['completed'] += len(completed)
+        self.stats['retried'] += len(retried)
+        self.stats['failed'] += len(failed)
+        self.stats['stale'] += len(rows) - len(owned)
+
+    @staticmethod
+    def _owned(db, tokens) -> set:
+        # ids of rows still in flight under the token they were claimed with; locked until commit
+        rows = TopUpDispatch.objects.using(db).filter(id__in=list(tokens), status=TopUpDispatchStatus.IN_FLIGHT)
+        if connections[db].features.has_select_for_update:
+            rows = rows.select_for_update()
+        return {
+            dispatch_id for dispatch_id, token in rows.values_list('id', 'claim_token')
+            if token == tokens[dispatch_id]
+        }
+
+    def _backoff(self, attempts: int) -> float:
+        # exponential with full jitter in [50%, 100%] so retries of one failed batch spread out
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
@@ -0,0 +1,84 @@
+import asyncio
+import random
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@dataclass
+class TopUpRequest:
+    sale_id: int
+    # normalized E.164 number without the '+', e.g. 989120000001
+    msisdn: int
+    amount: Decimal
+
+
+@dataclass
+class TopUpResult:
+    sale_id: int
+    ok: bool
+    reference: str = ''
+    error: str = ''
+    # False when retrying cannot help (invalid number, rejected by operator)
+    retryable: bool = True
+
+
+class BaseTopUpProvider:
+    # operator top-up API; the dispatcher calls send() from its event loop
+
+    # requests in flight at once against this provider
+    max_concurrency = 10
+    # requests per send() call; 1 for providers without a batch endpoint
+    max_batch_size = 1
+
+    def __init__(self, max_concurrency=None, max_batch_size=None):
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if max_batch_size is not None:
+            self.max_batch_size = max_batch_size
+
+    async def send(self, requests: List[TopUpRequest]) -> List[TopUpResult]:
+        # one result per request; raising fails the whole batch as retryable
+        raise NotImplementedError
+
+
+class StubTopUpProvider(BaseTopUpProvider):
+    # offline provider for development and benchmarks: sleeps instead of calling an operator
+    max_concurrency = 50
+    max_batch_size = 20
+
+    def __init__(self, latency_ms=50.0, jitter_ms=20.0, failure_rate=0.0, permanent_failure_rate=0.0, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.failure_rate = failure_rate
+        self.permanent_failure_rate = permanent_failure_rate
+        self.random = random.Random(seed)
+
+    async def send(self, requests: List[TopUpRequest]) -> List[TopUpResult]:
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        results = []
+        for request in requests:
+            roll = self.random.random()
+            if roll < self.permanent_failure_rate:
+                results.append(TopUpResult(request.sale_id, ok=False, error='rejected by operator', retryable=False))
+            elif roll < self.permanent_failure_rate + self.failure_rate:
+                results.append(TopUpResult(request.sale_id, ok=False, error='operator timeout'))
+            else:
+                results.append(TopUpResult(request.sale_id, ok=True, reference=uuid.uuid4().hex))
+        return results
+
+
+def load_providers(config=None) -> dict:
+    # {name: provider instance} from settings.TOPUP_PROVIDERS
+    config = config if config is not None else settings.TOPUP_PROVIDERS
+    providers = {}
+    for name, provider_config in config.items():
+        provider_class = import_string(provider_config['BACKEND'])
+        providers[name] = provider_class(**provider_config.get('OPTIONS', {}))
+    return providers
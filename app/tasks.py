@@ -0,0 +1,32 @@
+# job functions run by `manage.py worker`; enqueue them by dotted path through
+# app.services.job_queue.JobService, with JSON-serializable keyword arguments
+import logging
+
+from app.db_routing import seller_shards
+from app.services.credit_service import CreditService
+from app.services.hold_service import HoldService
+from app.services.spending_limits import SpendingLimits
+
+logger = logging.getLogger(__name__)
+
+
+def verify_seller_ledger(seller_id: int):
+    result = CreditService.verify_accounting_integrity(seller_id)
+    if not result['is_match']:
+        logger.error(
+            f"Seller {seller_id} balance {result['current_balance']} != ledger {result['calculated_balance']}"
+        )
+
+
+def reconcile_ledger(shard: str = None):
+    for db in ([shard] if shard else seller_shards()):
+        for row in CreditService.find_accounting_mismatches(db):
+            logger.error(f"{db}: seller {row['id']} balance {row['balance']} != ledger {row['calculated_balance']}")
+
+
+def release_expired_holds(batch_size: int = 500):
+    HoldService.release_expired(batch_size=batch_size)
+
+
+def purge_spending_counters(days: int = None):
+    SpendingLimits.purge_expired(days)
@@ -3,17 +3,35 @@ from .views import (
     CreateCreditRequestView,
     ApproveCreditRequestView,
     ChargePhoneView,
+    CreateBalanceHoldView,
+    ConfirmBalanceHoldView,
+    ReleaseBalanceHoldView,
     SellerBalanceView,
+    SellerBalancesView,
     TransactionHistoryView,
-    VerifyAccountingView
+    VerifyAccountingView,
+    LedgerChangesView,
+    MetricsView,
+    PhoneImportView,
+    PhoneRechargesView,
+    seller_balance_stream
 )
 
 urlpatterns = [
     path('sellers/<int:seller_id>/credit-request/', CreateCreditRequestView.as_view(), name='create-credit-request'),
     path('admin/credit-requests/<int:request_id>/approve/', ApproveCreditRequestView.as_view(), name='approve-credit-request'),
     path('sellers/<int:seller_id>/charge/', ChargePhoneView.as_view(), name='charge-phone'),
+    path('sellers/<int:seller_id>/holds/', CreateBalanceHoldView.as_view(), name='create-balance-hold'),
+    path('holds/<int:hold_id>/confirm/', ConfirmBalanceHoldView.as_view(), name='confirm-balance-hold'),
+    path('holds/<int:hold_id>/release/', ReleaseBalanceHoldView.as_view(), name='release-balance-hold'),
     path('sellers/<int:seller_id>/balance/', SellerBalanceView.as_view(), name='seller-balance'),
+    path('sellers/<int:seller_id>/balance/stream/', seller_balance_stream, name='seller-balance-stream'),
+    path('sellers/balances/', SellerBalancesView.as_view(), name='seller-balances'),
     path('sellers/<int:seller_id>/transactions/', TransactionHistoryView.as_view(), name='transaction-history'),
     path('sellers/<int:seller_id>/verify-accounting/', VerifyAccountingView.as_view(), name='verify-accounting'),
+    path('ledger/changes/', LedgerChangesView.as_view(), name='ledger-changes'),
+    path('phones/<str:number>/recharges/', PhoneRechargesView.as_view(), name='phone-recharges'),
+    path('admin/phones/import/', PhoneImportView.as_view(), name='import-phones'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
@@ -1,9 +1,19 @@
+import asyncio
+import io
+import json
+import zlib
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, quote_etag
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.exceptions import APIException, NotFound, ValidationError, Throttled
 
 
+from app.db_routing import reads_from_replica, seller_db_for_read, shard_for_id
 from app.models import Seller, CreditTransaction
 from app.serializers import (
     CreditRequestCreateSerializer,
@@ -12,7 +22,18 @@ from app.serializers import (
     RechargeSaleSerializer,
     BalanceSerializer,
     TransactionHistorySerializer,
-    CreditTransactionSerializer
+    BalanceAtQuerySerializer,
+    BalancesAtQuerySerializer,
+    SellerBalancesQuerySerializer,
+    SellerBalancesRequestSerializer,
+    HistoricalBalanceSerializer,
+    LedgerChangesQuerySerializer,
+    LedgerChangesSerializer,
+    BalanceHoldCreateSerializer,
+    BalanceHoldSerializer,
+    PhoneImportRequestSerializer,
+    PhoneRechargesQuerySerializer,
+    PhoneRechargesSerializer
 )
 from app.services.credit_service import (
     CreditService,
@@ -20,14 +41,38 @@ from app.services.credit_service import (
     CreditRequestNotFoundError,
     InvalidCreditRequestError
 )
+from app.services.ledger_service import LedgerService
+from app.services.phone_import import PhoneImportService
+from app.services.phone_directory import PhoneDirectory
+from app.fields import normalize_msisdn
+from app.services.admission import AdmissionRejected, get_admission_backend
+from app.services import metrics
+from app.services.locks import lock_stats
+from app.services.spending_limits import SpendingLimitExceededError
+from app.services.hold_service import (
+    HoldService,
+    HoldNotFoundError,
+    InvalidHoldStateError
+)
+from app.services.balance_events import get_backend as get_balance_events_backend
 from app.services.charge_service import (
     ChargeService,
     PhoneNumberNotFoundError,
     PhoneNumberInactiveError,
+    InvalidPhoneNumberError,
     InsufficientBalanceError
 )
 
 
+class DailyLimitExceeded(APIException):
+    # a 400 like other refused charges, with the limit that was hit in 'code'
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'daily_limit_exceeded'
+
+    def __init__(self, error: SpendingLimitExceededError):
+        super().__init__({'detail': str(error), 'code': error.code})
+
+
 class CreateCreditRequestView(APIView):
     # create new credit request for seller
     def post(self, request, seller_id):
@@ -69,25 +114,111 @@ class ApproveCreditRequestView(APIView):
             )
 
 
-class ChargePhoneView(APIView):
+class SellerAdmissionMixin:
+    # per-seller rate limit and in-flight cap, checked before the view touches the database
+    # so a flooding seller is turned away without queueing on its own row lock
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.admission = None
+        backend = get_admission_backend()
+        if backend is None:
+            return
+
+        seller_id = kwargs['seller_id']
+        try:
+            ticket = backend.acquire(seller_id)
+        except AdmissionRejected as e:
+            metrics.increment(f'admission.rejected.{e.reason}')
+            raise Throttled(wait=e.retry_after, detail=f"Too many charges for seller {seller_id}.")
+        metrics.increment('admission.admitted')
+        self.admission = (backend, seller_id, ticket)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # runs for every outcome of the handler, errors included
+        admission = getattr(self, 'admission', None)
+        if admission is not None:
+            backend, seller_id, ticket = admission
+            backend.release(seller_id, ticket)
+            self.admission = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ChargePhoneView(SellerAdmissionMixin, APIView):
     # process phone recharge sale and deduct from seller balance
     def post(self, request, seller_id):
         serializer = RechargeChargeRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         try:
-            recharge_sale = ChargeService.charge_phone(
+            if 'phone_number' in serializer.validated_data:
+                recharge_sale = ChargeService.charge_phone_number(
+                    seller_id=seller_id,
+                    phone_number=serializer.validated_data['phone_number'],
+                    amount=serializer.validated_data['amount']
+                )
+            else:
+                recharge_sale = ChargeService.charge_phone(
+                    seller_id=seller_id,
+                    phone_number_id=serializer.validated_data['phone_number_id'],
+                    amount=serializer.validated_data['amount']
+                )
+            return Response(
+                RechargeSaleSerializer(recharge_sale).data,
+                status=status.HTTP_201_CREATED
+            )
+        except (SellerNotFoundError, PhoneNumberNotFoundError) as e:
+            raise NotFound(str(e))
+        except (InvalidPhoneNumberError, PhoneNumberInactiveError, InsufficientBalanceError) as e:
+            raise ValidationError(str(e))
+        except SpendingLimitExceededError as e:
+            raise DailyLimitExceeded(e)
+        except Exception as e:
+            return Response(
+                {'detail': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class CreateBalanceHoldView(SellerAdmissionMixin, APIView):
+    # reserve an amount against the seller's available balance before calling the provider
+    def post(self, request, seller_id):
+        serializer = BalanceHoldCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            hold = HoldService.reserve(
                 seller_id=seller_id,
                 phone_number_id=serializer.validated_data['phone_number_id'],
-                amount=serializer.validated_data['amount']
+                amount=serializer.validated_data['amount'],
+                ttl_seconds=serializer.validated_data.get('ttl_seconds')
             )
+            return Response(BalanceHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+        except (SellerNotFoundError, PhoneNumberNotFoundError) as e:
+            raise NotFound(str(e))
+        except (PhoneNumberInactiveError, InsufficientBalanceError) as e:
+            raise ValidationError(str(e))
+        except SpendingLimitExceededError as e:
+            raise DailyLimitExceeded(e)
+        except Exception as e:
+            return Response(
+                {'detail': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ConfirmBalanceHoldView(APIView):
+    # turn a hold into a recharge sale and its ledger row
+    def post(self, request, hold_id):
+        try:
+            recharge_sale = HoldService.confirm(hold_id)
             return Response(
                 RechargeSaleSerializer(recharge_sale).data,
                 status=status.HTTP_201_CREATED
             )
-        except (SellerNotFoundError, PhoneNumberNotFoundError) as e:
+        except HoldNotFoundError as e:
             raise NotFound(str(e))
-        except (PhoneNumberInactiveError, InsufficientBalanceError) as e:
+        except InvalidHoldStateError as e:
             raise ValidationError(str(e))
         except Exception as e:
             return Response(
@@ -96,45 +227,161 @@ class ChargePhoneView(APIView):
             )
 
 
+class ReleaseBalanceHoldView(APIView):
+    # give the held amount back to the seller's available balance
+    def post(self, request, hold_id):
+        try:
+            hold = HoldService.release(hold_id)
+            return Response(BalanceHoldSerializer(hold).data)
+        except HoldNotFoundError as e:
+            raise NotFound(str(e))
+        except InvalidHoldStateError as e:
+            raise ValidationError(str(e))
+        except Exception as e:
+            return Response(
+                {'detail': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+def _seller_etag(seller_id, version, *extra):
+    # weak: the body is the same data whichever renderer the client negotiated
+    return 'W/' + quote_etag('-'.join(str(part) for part in (seller_id, version, *extra)))
+
+
+def _not_modified(request, etag):
+    # 304 when the client already holds this version; If-None-Match only, it is exact for these views
+    client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in client_etags or any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in client_etags):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+    return None
+
+
 class SellerBalanceView(APIView):
-    # get current balance for seller
+    # get current balance for seller, or the balance at a point in time with ?at=<timestamp>
+    @reads_from_replica
     def get(self, request, seller_id):
-        balance = CreditService.get_seller_balance(seller_id)
-        if balance is None:
+        if 'at' in request.query_params:
+            query = BalanceAtQuerySerializer(data=request.query_params)
+            query.is_valid(raise_exception=True)
+            at = query.validated_data['at']
+            try:
+                balance = CreditService.get_balance_at(seller_id, at)
+            except SellerNotFoundError as e:
+                raise NotFound(str(e))
+            return Response(HistoricalBalanceSerializer({
+                'seller_id': seller_id,
+                'at': at,
+                'balance': balance
+            }).data)
+
+        seller = Seller.objects.using(seller_db_for_read(seller_id)).filter(id=seller_id).values('name', 'balance', 'held_balance', 'ledger_seq').first()
+        if seller is None:
             raise NotFound(f"Seller with ID {seller_id} not found")
-        
-        seller = Seller.objects.get(id=seller_id)
-        return Response(BalanceSerializer({
+
+        # every balance change bumps ledger_seq; holds only move held_balance; the name can be edited
+        etag = _seller_etag(seller_id, seller['ledger_seq'], seller['held_balance'], zlib.crc32(seller['name'].encode()))
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(BalanceSerializer({
             'seller_id': seller_id,
-            'current_balance': balance,
-            'seller_name': seller.name
+            'current_balance': seller['balance'],
+            'held_balance': seller['held_balance'],
+            'available_balance': seller['balance'] - seller['held_balance'],
+            'seller_name': seller['name']
         }).data)
+        response['ETag'] = etag
+        return response
+
+
+class SellerBalancesView(APIView):
+    # balances of many sellers in one request, for dashboards: GET ?ids=1,2,3, or POST
+    # {"ids": [...]} for long lists. "cached" accepts balances up to SELLER_BALANCES_CACHE_SECONDS
+    # old. GET ?ids=1,2,3&at=<timestamp> gives the balances at that point in time instead
+    @reads_from_replica
+    def get(self, request):
+        if 'at' in request.query_params:
+            query = BalancesAtQuerySerializer(data=request.query_params)
+            query.is_valid(raise_exception=True)
+            at = query.validated_data['at']
+
+            balances = CreditService.get_balances_at(query.validated_data['ids'], at)
+            return Response(HistoricalBalanceSerializer([
+                {'seller_id': seller_id, 'at': at, 'balance': balance}
+                for seller_id, balance in balances.items()
+            ], many=True).data)
+
+        query = SellerBalancesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return self._balances(query.validated_data)
+
+    @reads_from_replica
+    def post(self, request):
+        body = SellerBalancesRequestSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        return self._balances(body.validated_data)
+
+    @staticmethod
+    def _balances(validated_data):
+        seller_ids = validated_data['ids']
+        balances = CreditService.get_balances(seller_ids, use_cache=validated_data['cached'])
+        rows = []
+        # requested order; unknown sellers are left out
+        for seller_id in seller_ids:
+            if seller_id not in balances:
+                continue
+            name, balance, held_balance = balances[seller_id]
+            rows.append({
+                'seller_id': seller_id,
+                'current_balance': balance,
+                'held_balance': held_balance,
+                'available_balance': balance - held_balance,
+                'seller_name': name
+            })
+        return Response(BalanceSerializer(rows, many=True).data)
 
 
 class TransactionHistoryView(APIView):
     # get all credit transactions for seller
+    @reads_from_replica
     def get(self, request, seller_id):
+        db = seller_db_for_read(seller_id)
         try:
-            seller = Seller.objects.get(id=seller_id)
+            seller = Seller.objects.using(db).get(id=seller_id)
         except Seller.DoesNotExist:
             raise NotFound(f"Seller with ID {seller_id} not found")
-        
-        transactions = CreditTransaction.objects.filter(
+
+        # ledger_seq counts the seller's ledger rows: same number, same history and balance
+        etag = _seller_etag(seller_id, seller.ledger_seq)
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        transactions = list(CreditTransaction.objects.using(db).filter(
             seller_id=seller_id
-        ).order_by('created_at')
-        
-        transaction_data = CreditTransactionSerializer(transactions, many=True).data
+        ).order_by('created_at'))
         
-        return Response(TransactionHistorySerializer({
+        # rows go in as instances: serializing them first and nesting the result ran every
+        # field's to_representation twice
+        response = Response(TransactionHistorySerializer({
             'seller_id': seller_id,
             'current_balance': seller.balance,
-            'transactions': transaction_data,
-            'total_count': len(transaction_data)
+            'transactions': transactions,
+            'total_count': len(transactions)
         }).data)
+        response['ETag'] = etag
+        if transactions:
+            response['Last-Modified'] = http_date(max(t.created_at for t in transactions).timestamp())
+        return response
 
 
 class VerifyAccountingView(APIView):
     # verify accounting integrity by comparing balance with transaction sum
+    @reads_from_replica
     def get(self, request, seller_id):
         try:
             result = CreditService.verify_accounting_integrity(seller_id)
@@ -147,3 +394,134 @@ class VerifyAccountingView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+
+class LedgerChangesView(APIView):
+    # incremental feed of new ledger rows across all sellers of a shard: ?since=<last seen id>&limit=&shard=;
+    # rows that may still commit out of id order are held back (LedgerService.get_changes)
+    def get(self, request):
+        query = LedgerChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        changes = LedgerService.get_changes(
+            since=query.validated_data['since'],
+            limit=query.validated_data['limit'],
+            shard=query.validated_data['shard']
+        )
+        return Response(LedgerChangesSerializer(changes).data)
+
+
+class PhoneRechargesView(APIView):
+    # recharges to one phone number, newest first: ?cursor=<next_cursor>&limit=&seller_id=
+    def get(self, request, number):
+        query = PhoneRechargesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        try:
+            phone = PhoneDirectory.by_msisdn(normalize_msisdn(number))
+        except ValueError as e:
+            # malformed input is a 400 here as in the charge body; a well-formed unknown number is a 404
+            raise ValidationError(str(e))
+        if phone is None:
+            raise NotFound(f"Phone number {number} not found")
+
+        page = ChargeService.get_phone_recharges(
+            phone.id,
+            limit=query.validated_data['limit'],
+            cursor=query.validated_data.get('cursor'),
+            seller_id=query.validated_data.get('seller_id')
+        )
+        return Response(PhoneRechargesSerializer({
+            'phone_number_id': phone.id,
+            'msisdn': phone.msisdn,
+            **page
+        }).data)
+
+
+class PhoneImportView(APIView):
+    # bulk load of phone numbers from an uploaded file (multipart field "file"), read chunk by chunk
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        serializer = PhoneImportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = serializer.validated_data['file']
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8', errors='replace', newline='')
+        try:
+            result = PhoneImportService.import_lines(
+                lines,
+                batch_size=serializer.validated_data['batch_size'],
+                active=serializer.validated_data['active']
+            )
+        finally:
+            # the wrapper would otherwise close the upload's file under Django's feet
+            lines.detach()
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
+
+def _sse_event(payload):
+    # no id: line. holds change the balance without a ledger row, so ledger_seq does not name
+    # an event, and a reconnecting client gets a fresh snapshot anyway
+    return f"event: balance\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _balance_event_stream(subscription, initial):
+    try:
+        yield _sse_event(initial)
+        while True:
+            try:
+                payload = await asyncio.wait_for(
+                    subscription.get(),
+                    timeout=settings.BALANCE_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield _sse_event(payload)
+    finally:
+        subscription.close()
+
+
+async def seller_balance_stream(request, seller_id):
+    # server-sent events with the seller balance after every committed change.
+    # plain async view (DRF views are sync only), served by the ASGI app
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    # subscribe before reading the snapshot so no update falls in between
+    subscription = get_balance_events_backend().subscribe(seller_id)
+    seller = await Seller.objects.using(shard_for_id(seller_id)).filter(id=seller_id).values(
+        'id', 'balance', 'held_balance', 'ledger_seq'
+    ).afirst()
+    if seller is None:
+        subscription.close()
+        return JsonResponse({'detail': f"Seller with ID {seller_id} not found"}, status=404)
+
+    initial = {
+        'seller_id': seller['id'],
+        'current_balance': str(seller['balance']),
+        'held_balance': str(seller['held_balance']),
+        'available_balance': str(seller['balance'] - seller['held_balance']),
+        'ledger_seq': seller['ledger_seq']
+    }
+    response = StreamingHttpResponse(
+        _balance_event_stream(subscription, initial),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class MetricsView(APIView):
+    # counters of the worker that serves the request
+    def get(self, request):
+        backend = get_admission_backend()
+        return Response({
+            'counters': metrics.snapshot(),
+            'admission_in_flight': backend.in_flight() if backend is not None else 0,
+            # sellers whose balance locks this worker waited on longest
+            'lock_waits': lock_stats()
+        })
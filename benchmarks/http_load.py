@@ -0,0 +1,349 @@
+"""
+End-to-end HTTP load against a live server, open loop.
+
+    python -m benchmarks.http_load [--mix mixed] [--rate 200] [--duration 30] [--workers 4]
+    python -m benchmarks.http_load --url http://host:8000 --seller-ids 1,2 --phone-ids 1,2,3 --fund 1000000
+
+Without --url a ``manage.py serve`` server is started on a scratch SQLite database seeded
+with ``create_sample_data`` (admission control off unless --admission). Requests are sent
+on a fixed schedule (--rate per second, constant or Poisson arrivals) whether or not earlier
+ones have returned, so a slow server shows up as latency instead of a lower send rate;
+latency is measured from each request's scheduled start. --mix is one of the named mixes
+or weights such as ``charge=70,balance=20,history=10`` over the operations
+
+    charge    POST /api/sellers/<id>/charge/
+    credit    POST /api/sellers/<id>/credit-request/
+    approve   POST /api/admin/credit-requests/<id>/approve/  (a credit request this run created)
+    balance   GET  /api/sellers/<id>/balance/
+    history   GET  /api/sellers/<id>/transactions/
+
+Reports latency percentiles per operation, status codes per operation and throughput
+and latency per --interval seconds.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from benchmarks.worker_scaling import ROOT, _wait_until_ready
+
+MIXES = {
+    'mixed': {'charge': 50, 'credit': 10, 'approve': 10, 'balance': 20, 'history': 10},
+    'checkout': {'charge': 80, 'balance': 15, 'history': 5},
+    'dashboard': {'balance': 60, 'history': 35, 'charge': 5},
+    'credit': {'credit': 50, 'approve': 50},
+}
+LOCAL_FUNDING = '100000000.00'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def parse_mix(value):
+    if value in MIXES:
+        return MIXES[value]
+    weights = {}
+    for part in value.split(','):
+        op, _, weight = part.partition('=')
+        if op not in MIXES['mixed']:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}")
+        weights[op] = float(weight or 1)
+    return weights
+
+
+class ConnectionPool:
+    # minimal HTTP/1.1 keep-alive client: at most `size` connections, requests queue for a free one
+
+    def __init__(self, host, port, size, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: application/json\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode('latin-1')
+        async with self._slots:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else await asyncio.open_connection(self.host, self.port)
+            try:
+                status, data, keep_alive = await asyncio.wait_for(self._exchange(conn, head + body), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn[1].close()
+                if not reused:
+                    raise
+                # the server dropped an idle keep-alive connection before reading the request
+                conn = await asyncio.open_connection(self.host, self.port)
+                status, data, keep_alive = await asyncio.wait_for(self._exchange(conn, head + body), self.timeout)
+            except BaseException:
+                conn[1].close()
+                raise
+            if keep_alive:
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+            return status, data
+
+    @staticmethod
+    async def _exchange(conn, request):
+        reader, writer = conn
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                data += (await reader.readexactly(size + 2))[:-2]
+            data = bytes(data)
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        elif status in (204, 304) or status < 200:
+            data = b''
+        else:
+            data = await reader.read()
+            keep_alive = False
+        return status, data, keep_alive
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class LoadRun:
+    def __init__(self, pool, mix, seller_ids, phone_ids, seed):
+        self.pool = pool
+        self.ops, self.weights = zip(*mix.items())
+        self.seller_ids = seller_ids
+        self.phone_ids = phone_ids
+        self.random = random.Random(seed)
+        # credit requests created by this run, waiting for an approve
+        self.pending = collections.deque()
+        self.approve_fallbacks = 0
+        # (scheduled offset, op, status or error name, latency)
+        self.samples = []
+        self.dropped = 0
+
+    def build(self, op):
+        seller_id = self.random.choice(self.seller_ids)
+        if op == 'approve':
+            if self.pending:
+                return 'approve', 'POST', f'/api/admin/credit-requests/{self.pending.popleft()}/approve/', {}
+            # nothing to approve yet: create the request it would have approved
+            self.approve_fallbacks += 1
+            op = 'credit'
+        if op == 'charge':
+            amount = f'{self.random.randint(1, 50) * 1000}.00'
+            return op, 'POST', f'/api/sellers/{seller_id}/charge/', {
+                'phone_number_id': self.random.choice(self.phone_ids), 'amount': amount
+            }
+        if op == 'credit':
+            # distinct amounts: a pending request of the same amount would be returned instead
+            amount = f'{self.random.randint(10000, 999999)}.{self.random.randint(0, 99):02d}'
+            return op, 'POST', f'/api/sellers/{seller_id}/credit-request/', {'amount': amount}
+        if op == 'balance':
+            return op, 'GET', f'/api/sellers/{seller_id}/balance/', None
+        return op, 'GET', f'/api/sellers/{seller_id}/transactions/', None
+
+    async def send(self, offset, scheduled, op, method, path, payload):
+        try:
+            status, data = await self.pool.request(method, path, payload)
+        except asyncio.TimeoutError:
+            status = 'timeout'
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            status = type(exc).__name__
+        else:
+            if op == 'credit' and status == 201:
+                self.pending.append(json.loads(data)['id'])
+        self.samples.append((offset, op, status, time.perf_counter() - scheduled))
+
+    async def run(self, rate, duration, arrivals, max_in_flight):
+        in_flight = set()
+        start = time.perf_counter()
+        offset = 0.0
+        while offset < duration:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            op, method, path, payload = self.build(self.random.choices(self.ops, self.weights)[0])
+            if len(in_flight) >= max_in_flight:
+                # the server fell this far behind: count the request instead of queueing without bound
+                self.dropped += 1
+            else:
+                task = asyncio.create_task(self.send(offset, start + offset, op, method, path, payload))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            offset += self.random.expovariate(rate) if arrivals == 'poisson' else 1 / rate
+        if in_flight:
+            await asyncio.wait(in_flight)
+        return time.perf_counter() - start
+
+
+async def fund(pool, seller_ids, amount):
+    # a credit request and its approval per seller, through the API
+    for seller_id in seller_ids:
+        status, data = await pool.request('POST', f'/api/sellers/{seller_id}/credit-request/', {'amount': amount})
+        if status != 201:
+            raise RuntimeError(f"funding seller {seller_id}: {status} {data[:200]!r}")
+        request_id = json.loads(data)['id']
+        status, data = await pool.request('POST', f'/api/admin/credit-requests/{request_id}/approve/', {})
+        if status != 200:
+            raise RuntimeError(f"approving funding of seller {seller_id}: {status} {data[:200]!r}")
+
+
+def report(run, elapsed, args):
+    samples = run.samples
+    ok = [s for s in samples if isinstance(s[2], int) and s[2] < 400]
+    print(f"target {args.rate:.0f} req/s ({args.arrivals}) for {args.duration:.0f}s: "
+          f"{len(samples)} completed in {elapsed:.1f}s, {len(samples) / elapsed:.0f} req/s, "
+          f"{len(ok)} 2xx/3xx, {run.dropped} dropped at {args.max_in_flight} in flight")
+    if run.approve_fallbacks:
+        print(f"{run.approve_fallbacks} approves sent as credit requests (nothing pending yet)")
+    if not samples:
+        return
+
+    print(f"\n{'operation':<10}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'max ms':>10}")
+    by_op = collections.defaultdict(list)
+    for _, op, _, latency in samples:
+        by_op[op].append(latency * 1000)
+    by_op['all'] = [latency * 1000 for *_, latency in samples]
+    for op, latencies in by_op.items():
+        print(f"{op:<10}{len(latencies):>8}" + ''.join(
+            f"{percentile(latencies, pct):>10.1f}" for pct in (50, 90, 99, 99.9)
+        ) + f"{max(latencies):>10.1f}")
+
+    print(f"\n{'operation':<10}status codes")
+    statuses = collections.defaultdict(collections.Counter)
+    for _, op, status, _ in samples:
+        statuses[op][status] += 1
+    for op, counts in statuses.items():
+        print(f"{op:<10}" + '  '.join(f"{status}: {count}" for status, count in sorted(counts.items(), key=str)))
+
+    print(f"\n{'second':>8}{'req/s':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    buckets = collections.defaultdict(list)
+    for offset, _, status, latency in samples:
+        buckets[int(offset // args.interval)].append((status, latency * 1000))
+    for bucket in sorted(buckets):
+        rows = buckets[bucket]
+        latencies = [latency for _, latency in rows]
+        errors = sum(1 for status, _ in rows if not isinstance(status, int) or status >= 400)
+        print(f"{bucket * args.interval:>8.0f}{len(rows) / args.interval:>8.0f}{errors:>8}"
+              f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            'elapsed': elapsed, 'dropped': run.dropped, 'approve_fallbacks': run.approve_fallbacks,
+            'samples': [[offset, op, status, latency] for offset, op, status, latency in samples],
+        }))
+
+
+async def load(base_url, args):
+    parts = urlsplit(base_url)
+    pool = ConnectionPool(parts.hostname, parts.port or 80, args.connections, args.timeout)
+    try:
+        if args.fund:
+            await fund(pool, args.seller_ids, args.fund)
+        run = LoadRun(pool, parse_mix(args.mix), args.seller_ids, args.phone_ids, args.seed)
+        elapsed = await run.run(args.rate, args.duration, args.arrivals, args.max_in_flight)
+    finally:
+        pool.close()
+    report(run, elapsed, args)
+
+
+def _sample_ids(env):
+    script = (
+        "import json; from app.models import Seller, PhoneNumber; "
+        "print(json.dumps([list(Seller.objects.values_list('id', flat=True)), "
+        "list(PhoneNumber.objects.filter(is_active=True).values_list('id', flat=True))]))"
+    )
+    output = subprocess.run([sys.executable, 'manage.py', 'shell', '-c', script], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', default='mixed', help=f"one of {', '.join(MIXES)} or op=weight,... (default: mixed)")
+    parser.add_argument('--rate', type=float, default=200.0, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--arrivals', choices=['constant', 'poisson'], default='poisson')
+    parser.add_argument('--connections', type=int, default=64, help='concurrent connections')
+    parser.add_argument('--max-in-flight', type=int, default=2000, help='drop requests beyond this many outstanding')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds per request')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds per throughput row')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write every sample to this file')
+    parser.add_argument('--url', help='load an already running server instead')
+    parser.add_argument('--seller-ids', type=lambda v: [int(i) for i in v.split(',')], help='with --url')
+    parser.add_argument('--phone-ids', type=lambda v: [int(i) for i in v.split(',')], help='with --url')
+    parser.add_argument('--fund', help='credit every seller with this amount before the run')
+    parser.add_argument('--workers', type=int, default=4, help='server workers without --url')
+    parser.add_argument('--threads', type=int, default=1, help='threads per server worker without --url')
+    parser.add_argument('--asgi', action='store_true', help='serve with uvicorn workers without --url')
+    parser.add_argument('--admission', action='store_true', help='keep admission control on without --url')
+    parser.add_argument('--port', type=int, default=8798)
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    if args.url:
+        if not (args.seller_ids and args.phone_ids):
+            parser.error('--url needs --seller-ids and --phone-ids')
+        _wait_until_ready(f"{args.url.rstrip('/')}/api/sellers/{args.seller_ids[0]}/balance/")
+        asyncio.run(load(args.url, args))
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, SQLITE_PATH=str(Path(scratch) / 'bench.sqlite3'), DEBUG='False')
+        if not args.admission:
+            env.update(SELLER_CHARGE_RATE='0', SELLER_MAX_IN_FLIGHT_CHARGES='0')
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=ROOT, env=env, check=True)
+        subprocess.run([sys.executable, 'manage.py', 'create_sample_data'], cwd=ROOT, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        args.seller_ids, args.phone_ids = _sample_ids(env)
+        args.fund = args.fund or LOCAL_FUNDING
+
+        command = [sys.executable, 'manage.py', 'serve', '--bind', f'127.0.0.1:{args.port}',
+                   '--workers', str(args.workers), '--threads', str(args.threads)]
+        server = subprocess.Popen(command + (['--asgi'] if args.asgi else []), cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base_url = f'http://127.0.0.1:{args.port}'
+            _wait_until_ready(f'{base_url}/api/sellers/{args.seller_ids[0]}/balance/')
+            asyncio.run(load(base_url, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
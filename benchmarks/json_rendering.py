@@ -0,0 +1,104 @@
+"""
+Serializing and rendering a large transaction history payload.
+
+    python -m benchmarks.json_rendering [--rows 10000]
+
+Builds a --rows ledger for one seller on a scratch SQLite database and times the
+TransactionHistoryView body in three steps:
+  * serializing the rows with DRF's DecimalField / DateTimeField versus
+    MoneyDecimalField / FastDateTimeField,
+  * rendering the serialized data with DRF's JSONRenderer versus FastJSONRenderer,
+  * the whole GET through the test client.
+The two renderers must produce identical bytes.
+"""
+import argparse
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.scratch import setup_scratch_django
+
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='ledger rows in the history')
+    args = parser.parse_args()
+
+    setup_scratch_django()
+
+    from django.utils import timezone
+    from rest_framework import serializers
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+    from app import renderers
+    from app.models import Seller, CreditTransaction, TransactionType
+    from app.renderers import FastJSONRenderer
+    from app.serializers import CreditTransactionSerializer, TransactionHistorySerializer
+
+    seller = Seller.objects.create(name="Bench Seller", balance=Decimal('0.00'))
+    start = timezone.now()
+    CreditTransaction.objects.bulk_create(
+        [
+            CreditTransaction(
+                seller=seller, amount=Decimal(f'{(i % 9973) + 1}.{i % 100:02d}'),
+                transaction_type=TransactionType.CREDIT_INCREASE, reference_id=i,
+                balance_after=Decimal('0.00'), sequence=i + 1, created_at=start + timedelta(milliseconds=i)
+            )
+            for i in range(args.rows)
+        ],
+        batch_size=5000
+    )
+    seller.ledger_seq = args.rows
+    seller.save()
+    transactions = list(CreditTransaction.objects.filter(seller_id=seller.id).order_by('created_at'))
+
+    class DRFTransactionSerializer(serializers.ModelSerializer):
+        # the fields DRF picks for these columns without FastModelSerializer
+        seller_id = serializers.IntegerField(read_only=True)
+        transaction_type = serializers.CharField()
+        amount = serializers.DecimalField(max_digits=15, decimal_places=2)
+        balance_after = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+        class Meta:
+            model = CreditTransaction
+            fields = CreditTransactionSerializer.Meta.fields
+
+    print(f"Transaction history of {args.rows} rows")
+    print(f"{'step':<40}{'time':>12}")
+    baseline, old_rows = timed(lambda: DRFTransactionSerializer(transactions, many=True).data)
+    current, new_rows = timed(lambda: CreditTransactionSerializer(transactions, many=True).data)
+    assert old_rows == new_rows, "serializers disagree"
+    print(f"{'serialize, DRF fields':<40}{baseline * 1000:>9.1f} ms")
+    print(f"{'serialize, fast fields':<40}{current * 1000:>9.1f} ms")
+
+    data = TransactionHistorySerializer({
+        'seller_id': seller.id, 'current_balance': seller.balance,
+        'transactions': transactions, 'total_count': len(transactions)
+    }).data
+    stdlib, expected = timed(lambda: JSONRenderer().render(data))
+    fast, body = timed(lambda: FastJSONRenderer().render(data))
+    assert body == expected, "renderers disagree"
+    backend = 'orjson' if renderers.orjson is not None else 'stdlib fallback'
+    print(f"{'render, JSONRenderer':<40}{stdlib * 1000:>9.1f} ms")
+    print(f"{f'render, FastJSONRenderer ({backend})':<40}{fast * 1000:>9.1f} ms")
+    print(f"payload {len(body) / 1024:.0f} KiB")
+
+    client = APIClient()
+    url = f'/api/sellers/{seller.id}/transactions/'
+    elapsed, response = timed(lambda: client.get(url, HTTP_ACCEPT='application/json'))
+    assert response.status_code == 200
+    print(f"{'GET transactions/ end to end':<40}{elapsed * 1000:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
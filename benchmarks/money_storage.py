@@ -0,0 +1,112 @@
+"""
+Integer minor-unit money columns versus Decimal handling.
+
+    python -m benchmarks.money_storage [--rows 200000] [--charges 2000]
+
+Compares, on a scratch SQLite database:
+  * summing a seller's ledger row by row with Decimal (the old verify_accounting_integrity),
+  * SUM over the BIGINT minor-unit column (the current one),
+  * SUM over the same amounts in a DECIMAL column (stored as REAL by SQLite),
+and measures ChargeService.charge_phone throughput plus the per-call cost of the
+Decimal(str(...)) conversions the charge path used to do.
+"""
+import argparse
+import time
+import timeit
+from decimal import Decimal
+
+from benchmarks.scratch import setup_scratch_django
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='ledger rows to aggregate')
+    parser.add_argument('--charges', type=int, default=2000, help='charges for the throughput run')
+    args = parser.parse_args()
+
+    setup_scratch_django()
+
+    from django.db import connection
+    from django.db.models import Sum
+    from app.fields import from_minor_units
+    from app.models import Seller, PhoneNumber, CreditTransaction, TransactionType
+    from app.services.charge_service import ChargeService
+
+    seller = Seller.objects.create(name="Bench Seller", balance=Decimal('0.00'))
+    amounts = [Decimal(f'{(i % 9973) + 1}.{i % 100:02d}') for i in range(args.rows)]
+    CreditTransaction.objects.bulk_create(
+        [
+            CreditTransaction(
+                seller=seller, amount=amount, transaction_type=TransactionType.CREDIT_INCREASE,
+                balance_after=Decimal('0.00'), sequence=i + 1
+            )
+            for i, amount in enumerate(amounts)
+        ],
+        batch_size=5000
+    )
+    exact = sum(amounts)
+    seller.ledger_seq = args.rows
+    seller.save()
+
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE legacy_amounts (seller_id bigint, amount decimal(15, 2))")
+        cursor.execute(
+            "INSERT INTO legacy_amounts SELECT seller_id, amount / 100.0 FROM credit_transactions"
+        )
+        cursor.execute("CREATE INDEX legacy_amounts_seller ON legacy_amounts (seller_id)")
+
+    def per_row_decimal():
+        return sum(Decimal(str(t.amount)) for t in CreditTransaction.objects.filter(seller_id=seller.id))
+
+    def integer_sum():
+        return CreditTransaction.objects.filter(seller_id=seller.id).aggregate(total=Sum('amount'))['total']
+
+    def integer_column_sum():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT SUM(amount) FROM credit_transactions WHERE seller_id = %s", [seller.id])
+            return from_minor_units(cursor.fetchone()[0])
+
+    def decimal_column_sum():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT SUM(amount) FROM legacy_amounts WHERE seller_id = %s", [seller.id])
+            return cursor.fetchone()[0]
+
+    print(f"Aggregating {args.rows} ledger rows (exact total {exact})")
+    print(f"{'method':<36}{'time':>12}  result")
+    for label, func in (
+        ('per-row Decimal in Python', per_row_decimal),
+        ('SUM over DECIMAL column', decimal_column_sum),
+        ('SUM over BIGINT minor units', integer_column_sum),
+        ('SUM over BIGINT via the ORM', integer_sum),
+    ):
+        elapsed, result = timed(func)
+        flag = '' if Decimal(str(result)) == exact else '  (inexact)'
+        print(f"{label:<36}{elapsed * 1000:>9.1f} ms  {result}{flag}")
+
+    seller.balance = Decimal('100000000.00')
+    seller.save()
+    phone = PhoneNumber.objects.create(phone_number="09120000000", is_active=True)
+    start = time.perf_counter()
+    for _ in range(args.charges):
+        ChargeService.charge_phone(seller.id, phone.id, Decimal('10.00'))
+    elapsed = time.perf_counter() - start
+    print(f"\ncharge_phone: {args.charges / elapsed:.0f} charges/s ({elapsed / args.charges * 1e6:.0f} us each)")
+
+    balance, amount = Decimal('99999990.00'), Decimal('10.00')
+    old = timeit.timeit(lambda: (Decimal(str(balance)), Decimal(str(amount))), number=200000) / 200000
+    new = timeit.timeit(lambda: (balance, amount if isinstance(amount, Decimal) else Decimal(str(amount))), number=200000) / 200000
+    print(f"hot-path conversions: Decimal(str()) x2 {old * 1e9:.0f} ns, now {new * 1e9:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""Scratch SQLite database for in-process benchmarks."""
+import os
+import tempfile
+from pathlib import Path
+
+
+def setup_scratch_django(settings_module='recharge_system.settings'):
+    # point Django at a fresh, migrated SQLite file; must run before anything imports app models
+    scratch = tempfile.mkdtemp(prefix='recharge-bench-')
+    os.environ['SQLITE_PATH'] = str(Path(scratch) / 'bench.sqlite3')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    os.environ.setdefault('DEBUG', 'False')
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return scratch
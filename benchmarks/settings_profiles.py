@@ -0,0 +1,115 @@
+"""
+Compare the default and API-only (recharge_system.settings_api) settings profiles.
+
+    python -m benchmarks.settings_profiles [--requests 5000] [--starts 10]
+
+Cold start is measured in a fresh interpreter per run: django.setup(), building
+the handler's middleware chain and importing the URLconf. Per-request overhead
+goes through the full WSGI handler with a charge request that stops at
+serializer validation, so no database work is included.
+"""
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    'default': 'recharge_system.settings',
+    'api': 'recharge_system.settings_api',
+}
+
+
+def _cold_start():
+    start = time.perf_counter()
+    import django
+    django.setup()
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.urls import get_resolver
+    WSGIHandler()
+    get_resolver().url_patterns
+    return time.perf_counter() - start
+
+
+def _request_overhead(count):
+    import logging
+    from wsgiref.util import setup_testing_defaults
+
+    import django
+    django.setup()
+    from django.core.handlers.wsgi import WSGIHandler
+
+    logging.disable(logging.WARNING)
+    handler = WSGIHandler()
+    body = b'{"phone_number_id": 1}'
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    def call():
+        environ = {}
+        setup_testing_defaults(environ)
+        environ.update({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/api/sellers/1/charge/',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        })
+        response = handler(environ, start_response)
+        b''.join(response)
+        response.close()
+
+    for _ in range(min(200, count)):
+        call()
+
+    start = time.perf_counter()
+    for _ in range(count):
+        call()
+    return (time.perf_counter() - start) / count
+
+
+def _run_child(profile, *args):
+    # admission control would turn most of the repeated charges into 429s
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE=PROFILES[profile], SELLER_CHARGE_RATE='0', SELLER_MAX_IN_FLIGHT_CHARGES='0'
+    )
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.settings_profiles', '--child', *args],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='requests per profile')
+    parser.add_argument('--starts', type=int, default=10, help='cold starts per profile')
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode = args.child[0]
+        if mode == 'cold-start':
+            print(_cold_start())
+        else:
+            print(_request_overhead(int(args.child[1])))
+        return
+
+    print(f"{'profile':<10}{'cold start (median)':>22}{'per request':>16}{'requests/s':>14}")
+    for profile in PROFILES:
+        starts = [_run_child(profile, 'cold-start') for _ in range(args.starts)]
+        per_request = _run_child(profile, 'requests', str(args.requests))
+        print(
+            f"{profile:<10}{statistics.median(starts) * 1000:>19.1f} ms"
+            f"{per_request * 1e6:>13.1f} us{1 / per_request:>14.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Throughput scaling of ``manage.py serve`` as workers are added.
+
+    python -m benchmarks.worker_scaling [--workers 1,2,4] [--duration 10] [--clients 32]
+    python -m benchmarks.worker_scaling --url http://host:8000 --seller-id 1
+
+Without --url every worker count gets its own server on a scratch SQLite
+database seeded with ``create_sample_data``. With --url the given server is
+measured once. The load is closed-loop: every client sends its next request as
+soon as the previous one returns.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _wait_until_ready(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up within {timeout:.0f}s")
+
+
+def run_load(url, duration, clients):
+    counts = [0] * clients
+    errors = [0] * clients
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(url, timeout=10).read()
+                counts[index] += 1
+            except (urllib.error.URLError, ConnectionError):
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    return sum(counts) / elapsed, sum(errors)
+
+
+def _start_server(workers, port, env):
+    return subprocess.Popen(
+        [sys.executable, 'manage.py', 'serve', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='comma separated worker counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per run')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client threads')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--url', help='measure an already running server instead')
+    parser.add_argument('--seller-id', type=int, default=1)
+    args = parser.parse_args()
+
+    path = f'/api/sellers/{args.seller_id}/balance/'
+
+    if args.url:
+        url = args.url.rstrip('/') + path
+        _wait_until_ready(url)
+        throughput, errors = run_load(url, args.duration, args.clients)
+        print(f"{args.url}: {throughput:.0f} req/s, {errors} errors")
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, SQLITE_PATH=str(Path(scratch) / 'bench.sqlite3'), DEBUG='False')
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=ROOT, env=env, check=True)
+        subprocess.run([sys.executable, 'manage.py', 'create_sample_data'], cwd=ROOT, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+
+        url = f'http://127.0.0.1:{args.port}{path}'
+        baseline = None
+        print(f"{'workers':>8}{'req/s':>10}{'scaling':>10}{'errors':>8}")
+        for workers in [int(w) for w in args.workers.split(',')]:
+            server = _start_server(workers, args.port, env)
+            try:
+                _wait_until_ready(url)
+                throughput, errors = run_load(url, args.duration, args.clients)
+            finally:
+                server.terminate()
+                server.wait()
+            baseline = baseline or throughput
+            print(f"{workers:>8}{throughput:>10.0f}{throughput / baseline:>9.2f}x{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "app.db_routing.PrimaryPinMiddleware",
 ]
 
 ROOT_URLCONF = "recharge_system.urls"
@@ -66,6 +67,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "recharge_system.wsgi.application"
 
+# `manage.py test`: points AUDIT_LOG_DIR at a temporary directory for the run
+TEST_RUNNER = "tests.runner.TestRunner"
+
 
 DATABASES = {
     "default": {
@@ -79,10 +83,47 @@ DATABASES = {
 } if os.environ.get("DB_HOST") else {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": {
+            # take the write lock at BEGIN: a deferred transaction that reads and then writes
+            # fails with "database is locked" immediately instead of waiting for the lock
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
+# Optional read replica for the lag-tolerant read paths (balance, history,
+# verification). DB_REPLICA_HOST on PostgreSQL; SQLITE_REPLICA_PATH for a local
+# SQLite copy kept in sync with app.db_routing.sync_sqlite_replica().
+if os.environ.get("DB_HOST") and os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ["DB_REPLICA_HOST"],
+        "PORT": os.environ.get("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+elif not os.environ.get("DB_HOST") and os.environ.get("SQLITE_REPLICA_PATH"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["SQLITE_REPLICA_PATH"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Seller sharding: sellers and their credit requests, ledger, sales, holds and
+# dispatches live on one of SELLER_SHARDS; phone numbers are copied to every shard.
+# DB_SHARDS adds shards: comma-separated hosts on PostgreSQL, SQLite file paths
+# otherwise. Prepare new shards with `python manage.py init_shards`.
+SELLER_SHARDS = ["default"]
+for _index, _location in enumerate(filter(None, os.environ.get("DB_SHARDS", "").split(",")), start=1):
+    DATABASES[f"shard_{_index}"] = {
+        **DATABASES["default"],
+        ("HOST" if os.environ.get("DB_HOST") else "NAME"): _location.strip(),
+    }
+    SELLER_SHARDS.append(f"shard_{_index}")
+
+DATABASE_ROUTERS = ["app.db_routing.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,7 +160,122 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+# `collectstatic` target. runserver serves static files itself (DEBUG); `manage.py serve`
+# (gunicorn) does not, so either put a proxy in front that serves STATIC_ROOT at STATIC_URL
+# or set SERVE_STATIC_FILES=True to have Django serve them (fine for the admin's assets)
+STATIC_ROOT = os.environ.get("STATIC_ROOT", str(BASE_DIR / "staticfiles"))
+SERVE_STATIC_FILES = os.environ.get("SERVE_STATIC_FILES", "False") == "True"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# DRF defaults with the orjson-backed JSON renderer/parser (stdlib json when orjson
+# is not installed); the output is byte-for-byte what DRF's JSONRenderer writes.
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "app.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "app.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+# Live balance updates (GET /api/sellers/<id>/balance/stream/, needs the ASGI app).
+# LocalBalanceEventBackend serves a single process; use
+# app.services.balance_events.PostgresNotifyBackend to fan out across workers.
+BALANCE_EVENTS_BACKEND = os.environ.get('BALANCE_EVENTS_BACKEND', 'app.services.balance_events.LocalBalanceEventBackend')
+BALANCE_STREAM_HEARTBEAT_SECONDS = int(os.environ.get('BALANCE_STREAM_HEARTBEAT_SECONDS', '15'))
+
+# Two-phase charges: open balance holds expire after this many seconds
+# (released by `python manage.py release_expired_holds`).
+BALANCE_HOLD_TTL_SECONDS = int(os.environ.get('BALANCE_HOLD_TTL_SECONDS', '300'))
+
+# Top-up provider dispatch. When enabled, sales are written as "pending" with an
+# outbox row and `python manage.py dispatch_topups` sends them to the provider,
+# marking them completed, or failed and refunded.
+TOPUP_DISPATCH_ENABLED = os.environ.get('TOPUP_DISPATCH_ENABLED', 'False') == 'True'
+TOPUP_DEFAULT_PROVIDER = os.environ.get('TOPUP_DEFAULT_PROVIDER', 'stub')
+TOPUP_PROVIDERS = {
+    'stub': {
+        'BACKEND': 'app.services.topup_providers.StubTopUpProvider',
+        'OPTIONS': {
+            'latency_ms': float(os.environ.get('TOPUP_STUB_LATENCY_MS', '50')),
+            'failure_rate': float(os.environ.get('TOPUP_STUB_FAILURE_RATE', '0')),
+        },
+    },
+}
+TOPUP_MAX_ATTEMPTS = int(os.environ.get('TOPUP_MAX_ATTEMPTS', '5'))
+
+# Per-seller admission control on the charge endpoints: a token bucket of
+# SELLER_CHARGE_BURST charges refilled at SELLER_CHARGE_RATE per second, and at most
+# SELLER_MAX_IN_FLIGHT_CHARGES charges being processed at once. Rejections are 429
+# with Retry-After. 0 disables a limit; rate and in-flight cap are off unless set (the
+# docker-compose deployment turns them on). LocalAdmissionBackend keeps the state per
+# process; app.services.admission.SQLiteAdmissionBackend shares it between workers.
+SELLER_ADMISSION_BACKEND = os.environ.get('SELLER_ADMISSION_BACKEND', 'app.services.admission.LocalAdmissionBackend')
+SELLER_ADMISSION_SQLITE_PATH = os.environ.get('SELLER_ADMISSION_SQLITE_PATH', str(BASE_DIR / 'admission.sqlite3'))
+SELLER_CHARGE_RATE = float(os.environ.get('SELLER_CHARGE_RATE', '0'))
+SELLER_CHARGE_BURST = int(os.environ.get('SELLER_CHARGE_BURST', '40'))
+SELLER_MAX_IN_FLIGHT_CHARGES = int(os.environ.get('SELLER_MAX_IN_FLIGHT_CHARGES', '0'))
+
+# Service methods that own their transaction re-run it on lock/serialization
+# conflicts (SQLite "database is locked", PostgreSQL 40001/40P01/55P03) with
+# jittered backoff for up to this many seconds.
+DB_RETRY_BUDGET_SECONDS = float(os.environ.get('DB_RETRY_BUDGET_SECONDS', '10'))
+
+# Background jobs (app.services.job_queue, run by `python manage.py worker`):
+# a running job whose worker has not finished it within this many seconds is
+# assumed lost and handed to another worker.
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '300'))
+
+# Phone numbers are stored and looked up as E.164 integers; national numbers
+# ("0912...") get this country code. Resolved numbers are cached per process
+# (app.services.phone_directory) for PHONE_DIRECTORY_TTL_SECONDS, so a number
+# deactivated in another process can still be charged for that long.
+PHONE_DEFAULT_COUNTRY_CODE = os.environ.get('PHONE_DEFAULT_COUNTRY_CODE', '98')
+PHONE_DIRECTORY_TTL_SECONDS = float(os.environ.get('PHONE_DIRECTORY_TTL_SECONDS', '30'))
+PHONE_DIRECTORY_MAX_ENTRIES = int(os.environ.get('PHONE_DIRECTORY_MAX_ENTRIES', '100000'))
+
+# Audit trail (app.services.audit_log): charges, approvals and rejections as JSON lines in
+# AUDIT_LOG_DIR, one file per worker process, a new file past AUDIT_LOG_MAX_BYTES. With
+# AUDIT_LOG_MAX_FILES > 0 each process keeps only its newest that many files; the default 0
+# keeps everything and leaves retention to logrotate or an ops job. Events wait in a bounded in-memory queue of
+# AUDIT_LOG_QUEUE_SIZE for a background writer; a full queue drops them (audit.dropped).
+AUDIT_LOG_DIR = os.environ.get('AUDIT_LOG_DIR', str(BASE_DIR / 'audit'))
+AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', '100000'))
+AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', '1000'))
+AUDIT_LOG_FLUSH_SECONDS = float(os.environ.get('AUDIT_LOG_FLUSH_SECONDS', '0.5'))
+AUDIT_LOG_FSYNC_SECONDS = float(os.environ.get('AUDIT_LOG_FSYNC_SECONDS', '1'))
+AUDIT_LOG_MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', str(64 * 1024 * 1024)))
+AUDIT_LOG_MAX_FILES = int(os.environ.get('AUDIT_LOG_MAX_FILES', '0'))
+
+# GET/POST /api/sellers/balances/ with cached=true may answer from the cache (CACHES,
+# per-process memory unless configured) with balances up to this many seconds old.
+# 0 turns the cache off.
+SELLER_BALANCES_CACHE_SECONDS = int(os.environ.get('SELLER_BALANCES_CACHE_SECONDS', '5'))
+
+# Balance mutations take their locks through app.services.locks.BalanceTransaction, which
+# times every acquisition. Per-seller totals are kept for the LOCK_STATS_MAX_SELLERS most
+# recently locked sellers (top waiters in GET /api/metrics/); waits of at least
+# LOCK_WAIT_SLOW_SECONDS are also counted as locks.slow_waits.
+LOCK_STATS_MAX_SELLERS = int(os.environ.get('LOCK_STATS_MAX_SELLERS', '10000'))
+LOCK_WAIT_SLOW_SECONDS = float(os.environ.get('LOCK_WAIT_SLOW_SECONDS', '0.05'))
+
+# Daily spending limits (app.services.spending_limits): total sales per seller and total
+# top-ups per phone number per day (TIME_ZONE days), as decimal strings; unset means no
+# limit. Seller.daily_sales_limit overrides the sales limit per seller; the phone limit is
+# the same whoever charges the number. Seller totals are kept on the seller's shard, phone
+# totals on the default database for every shard. Counter rows older than
+# SPENDING_COUNTER_RETENTION_DAYS are deleted by `python manage.py purge_spending_counters`.
+SELLER_DAILY_SALES_LIMIT = os.environ.get('SELLER_DAILY_SALES_LIMIT') or None
+PHONE_DAILY_TOPUP_LIMIT = os.environ.get('PHONE_DAILY_TOPUP_LIMIT') or None
+SPENDING_COUNTER_RETENTION_DAYS = int(os.environ.get('SPENDING_COUNTER_RETENTION_DAYS', '7'))
+
+# GET /api/ledger/changes/ holds back ledger rows written less than this many seconds before
+# the oldest open write transaction (PostgreSQL) so that rows committing out of id order are
+# not skipped; see app.services.ledger_service. Not used on SQLite.
+LEDGER_FEED_SETTLE_SECONDS = float(os.environ.get('LEDGER_FEED_SETTLE_SECONDS', '1'))
@@ -0,0 +1,41 @@
+"""
+API-only settings profile for recharge_system.
+
+Serves just the DRF endpoints from app/urls.py with a trimmed middleware stack:
+no admin, sessions, messages, auth or CSRF. Select it with
+
+    DJANGO_SETTINGS_MODULE=recharge_system.settings_api
+
+The admin keeps running from the default profile (recharge_system.settings)
+as a separate process. Compare the two with
+``python -m benchmarks.settings_profiles``.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "app",
+    "corsheaders",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "app.db_routing.PrimaryPinMiddleware",
+]
+
+ROOT_URLCONF = "recharge_system.urls_api"
+
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
+
+# no django.contrib.auth: requests stay anonymous without touching the user model
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": ["app.renderers.FastJSONRenderer"],
+    "DEFAULT_PARSER_CLASSES": ["app.renderers.FastJSONParser"],
+    "DEFAULT_AUTHENTICATION_CLASSES": [],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+    "UNAUTHENTICATED_USER": None,
+}
@@ -1,13 +1,15 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from django.views.static import serve
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('app.urls')),
 ]
 
-
-
-
-
-
+if settings.SERVE_STATIC_FILES:
+    # collected files (`collectstatic`), for servers without a static file proxy in front
+    urlpatterns += [
+        re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
+    ]
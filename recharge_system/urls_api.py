@@ -0,0 +1,6 @@
+from django.urls import path, include
+
+# API-only URLconf for recharge_system.settings_api (no admin)
+urlpatterns = [
+    path('api/', include('app.urls')),
+]
@@ -0,0 +1,124 @@
+import difflib
+import json
+import os
+import re
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+# committed baseline: exact query count and normalized SQL per budget, median milliseconds per timing.
+# PERF_UPDATE_BASELINE=1 rewrites the entries a run touches; PERF_TIMINGS=1 also checks timings.
+# the SQL is recorded on BASELINE_VENDOR; other databases (PostgreSQL) write the same statements
+# differently and only open / close transactions implicitly, so there only the number of
+# statements other than transaction control is held to the budget
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+BASELINE_VENDOR = 'sqlite'
+TIMING_TOLERANCE = float(os.environ.get('PERF_TIMING_TOLERANCE', '0.5'))
+
+_SQL_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '?'),
+    (re.compile(r'IN \((\?(, )?)+\)'), 'IN (...)'),
+    (re.compile(r'VALUES (\((\?(, )?)+\)(, )?)+'), 'VALUES (...)'),
+]
+_TRANSACTION_CONTROL = re.compile(r'^(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b')
+
+
+def normalize_sql(sql: str) -> str:
+    # same statement shape whatever the ids, amounts and timestamps
+    for pattern, replacement in _SQL_LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _statement_count(statements) -> int:
+    return sum(1 for sql in statements if not _TRANSACTION_CONTROL.match(sql))
+
+
+def _load():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {'queries': {}, 'timings_ms': {}}
+
+
+def _updating():
+    return os.environ.get('PERF_UPDATE_BASELINE') == '1'
+
+
+class PerfBudgetMixin:
+    # for TransactionTestCase subclasses: query_budget() and timing() compare against baseline.json
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._baseline = _load()
+
+    @classmethod
+    def tearDownClass(cls):
+        if _updating():
+            current = _load()
+            for section in ('queries', 'timings_ms'):
+                current.setdefault(section, {}).update(cls._baseline[section])
+                current[section] = dict(sorted(current[section].items()))
+            BASELINE_PATH.write_text(json.dumps(current, indent=2) + '\n')
+        super().tearDownClass()
+
+    @contextmanager
+    def query_budget(self, name, using='default'):
+        with CaptureQueriesContext(connections[using]) as captured:
+            yield
+        statements = [normalize_sql(query['sql']) for query in captured.captured_queries]
+        vendor = connections[using].vendor
+        if _updating():
+            if vendor != BASELINE_VENDOR:
+                self.fail(f"Query budgets are recorded on {BASELINE_VENDOR}, not {vendor}")
+            self._baseline['queries'][name] = {'count': len(statements), 'sql': statements}
+            return
+
+        expected = self._baseline['queries'].get(name)
+        if expected is None:
+            self.fail(f"No query budget for {name!r}; run with PERF_UPDATE_BASELINE=1 and commit baseline.json")
+        if vendor != BASELINE_VENDOR:
+            count, budget = _statement_count(statements), _statement_count(expected['sql'])
+            if count != budget:
+                self.fail(
+                    f"Query budget for {name!r} on {vendor}: {count} statements, baseline {budget}\n"
+                    + '\n'.join(statements)
+                )
+            return
+        if len(statements) != expected['count'] or statements != expected['sql']:
+            diff = '\n'.join(difflib.unified_diff(
+                expected['sql'], statements, fromfile=f'{name} (baseline)', tofile=f'{name} (now)', lineterm=''
+            ))
+            self.fail(
+                f"Query budget for {name!r}: {len(statements)} queries, baseline {expected['count']}\n{diff}"
+            )
+
+    def timing(self, name, func, repeat=5, number=1):
+        # median of `repeat` runs of `number` calls, in ms per call; only checked with PERF_TIMINGS=1
+        if not (_updating() or os.environ.get('PERF_TIMINGS') == '1'):
+            return
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) * 1000 / number)
+        median = statistics.median(samples)
+        if _updating():
+            self._baseline['timings_ms'][name] = round(median, 3)
+            return
+
+        expected = self._baseline['timings_ms'].get(name)
+        if expected is None:
+            self.fail(f"No timing baseline for {name!r}; run with PERF_UPDATE_BASELINE=1 and commit baseline.json")
+        limit = expected * (1 + TIMING_TOLERANCE)
+        if median > limit:
+            self.fail(
+                f"{name}: {median:.2f} ms per call, baseline {expected:.2f} ms "
+                f"(+{(median / expected - 1) * 100:.0f}%, tolerance {TIMING_TOLERANCE * 100:.0f}%)"
+            )
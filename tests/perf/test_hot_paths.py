@@ -0,0 +1,126 @@
+import os
+import django
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, CreditRequest, CreditTransaction, TransactionType
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService
+from app.services.hold_service import HoldService
+from app.services.phone_directory import PhoneDirectory
+from tests.perf.budgets import PerfBudgetMixin
+
+# fixed data sizes: budgets and timings are only comparable at the same size
+HISTORY_ROWS = 500
+CHARGES = 100
+DASHBOARD_SELLERS = 200
+
+
+# admission control is per process and would reject the timed loops
+@override_settings(SELLER_CHARGE_RATE=0, SELLER_MAX_IN_FLIGHT_CHARGES=0)
+class HotPathBudgetTestCase(PerfBudgetMixin, TransactionTestCase):
+
+    def setUp(self):
+        PhoneDirectory.clear()
+        self.seller = Seller.objects.create(name="Perf Seller", balance=Decimal('1000000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000010", is_active=True)
+        self.client = APIClient()
+        # resolve the phone once: budgets are for the warm path every later request takes
+        PhoneDirectory.by_id(self.phone.id)
+
+    def add_history(self, rows=HISTORY_ROWS):
+        seq = self.seller.ledger_seq
+        CreditTransaction.objects.bulk_create([
+            CreditTransaction(
+                seller=self.seller, amount=Decimal('1.00'), transaction_type=TransactionType.CREDIT_INCREASE,
+                balance_after=self.seller.balance, sequence=seq + i + 1
+            )
+            for i in range(rows)
+        ])
+        Seller.objects.filter(id=self.seller.id).update(ledger_seq=seq + rows)
+
+    def test_service_budgets(self):
+        with self.query_budget('ChargeService.charge_phone'):
+            ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('10.00'))
+
+        with self.query_budget('ChargeService.charge_phone_number'):
+            ChargeService.charge_phone_number(self.seller.id, '09120000010', Decimal('10.00'))
+
+        with self.query_budget('CreditService.create_credit_request'):
+            request = CreditService.create_credit_request(self.seller.id, Decimal('50.00'))
+
+        with self.query_budget('CreditService.approve_credit_request'):
+            CreditService.approve_credit_request(request.id)
+
+        with self.query_budget('HoldService.reserve'):
+            hold = HoldService.reserve(self.seller.id, self.phone.id, Decimal('5.00'))
+
+        with self.query_budget('HoldService.confirm'):
+            HoldService.confirm(hold.id)
+
+        with self.query_budget('CreditService.verify_accounting_integrity'):
+            CreditService.verify_accounting_integrity(self.seller.id)
+
+        with self.query_budget('ChargeService.get_phone_recharges'):
+            ChargeService.get_phone_recharges(self.phone.id, limit=50)
+
+    def test_endpoint_budgets(self):
+        self.add_history()
+        base = f'/api/sellers/{self.seller.id}'
+
+        with self.query_budget('POST charge'):
+            response = self.client.post(f'{base}/charge/', {'phone_number_id': self.phone.id, 'amount': '10.00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        with self.query_budget('POST credit-request'):
+            response = self.client.post(f'{base}/credit-request/', {'amount': '70.00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        with self.query_budget('POST approve'):
+            response = self.client.post(f"/api/admin/credit-requests/{response.data['id']}/approve/", {}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        with self.query_budget('GET balance'):
+            self.assertEqual(self.client.get(f'{base}/balance/').status_code, 200)
+
+        # one query for the seller and one for the rows, whatever the history length (no N+1)
+        with self.query_budget(f'GET transactions ({HISTORY_ROWS} rows)'):
+            response = self.client.get(f'{base}/transactions/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.query_budget('GET transactions 304'):
+            self.assertEqual(self.client.get(f'{base}/transactions/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        sellers = Seller.objects.bulk_create([
+            Seller(name=f"Sub-seller {i}", balance=Decimal('10.00')) for i in range(DASHBOARD_SELLERS)
+        ])
+        with self.query_budget(f'POST sellers balances ({DASHBOARD_SELLERS} sellers)'):
+            response = self.client.post('/api/sellers/balances/', {'ids': [s.id for s in sellers]}, format='json')
+        self.assertEqual(len(response.data), DASHBOARD_SELLERS)
+
+        with self.query_budget('GET ledger changes'):
+            self.assertEqual(self.client.get('/api/ledger/changes/', {'limit': 100}).status_code, 200)
+
+        with self.query_budget('GET phone recharges'):
+            self.assertEqual(self.client.get('/api/phones/09120000010/recharges/').status_code, 200)
+
+    def test_timings(self):
+        self.add_history()
+        self.timing(
+            'ChargeService.charge_phone',
+            lambda: ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('1.00')),
+            number=CHARGES // 5
+        )
+
+        requests = iter(CreditRequest.objects.bulk_create([
+            CreditRequest(seller=self.seller, amount=Decimal('1.00')) for _ in range(100)
+        ]))
+        self.timing('CreditService.approve_credit_request', lambda: CreditService.approve_credit_request(next(requests).id), number=10)
+
+        history_url = f'/api/sellers/{self.seller.id}/transactions/'
+        self.timing(f'GET transactions ({HISTORY_ROWS} rows)', lambda: self.client.get(history_url))
+        self.timing('GET balance', lambda: self.client.get(f'/api/sellers/{self.seller.id}/balance/'), number=20)
@@ -0,0 +1,23 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from app.services import audit_log
+
+
+class TestRunner(DiscoverRunner):
+    # every charge and approval writes audit events: keep them out of the checkout
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.audit_log_dir = tempfile.mkdtemp(prefix='audit-')
+        self.saved_audit_log_dir = settings.AUDIT_LOG_DIR
+        settings.AUDIT_LOG_DIR = self.audit_log_dir
+
+    def teardown_test_environment(self, **kwargs):
+        audit_log.reopen()
+        settings.AUDIT_LOG_DIR = self.saved_audit_log_dir
+        shutil.rmtree(self.audit_log_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,82 @@
+import os
+import django
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from app.admin import EstimatedCountPaginator
+from app.models import Seller, PhoneNumber, CreditTransaction, RechargeSale
+from app.services.charge_service import ChargeService
+
+
+class LargeTableAdminTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Admin Seller", balance=Decimal('100000.00'))
+        self.phones = [
+            PhoneNumber.objects.create(phone_number=f"0912000000{i}", is_active=True)
+            for i in range(5)
+        ]
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+
+    def charge(self, count):
+        for i in range(count):
+            ChargeService.charge_phone(self.seller.id, self.phones[i % len(self.phones)].id, Decimal('1.00'))
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for url in ('/admin/app/credittransaction/', '/admin/app/rechargesale/'):
+            self.charge(3)
+            small = self.changelist_queries(url)
+            self.charge(30)
+            self.assertEqual(self.changelist_queries(url), small, url)
+
+    def test_numeric_search_uses_exact_lookups(self):
+        self.charge(2)
+        sale = RechargeSale.objects.order_by('id').first()
+        response = self.client.get('/admin/app/rechargesale/', {'q': str(sale.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(sale, response.context['cl'].result_list)
+
+        # foreign keys render as autocomplete widgets, not a <select> of every row
+        response = self.client.get(f'/admin/app/rechargesale/{sale.id}/change/')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_search_finds_sales_by_phone_number(self):
+        self.charge(3)
+        phone = self.phones[1]
+        expected = set(RechargeSale.objects.filter(phone_number=phone))
+        for term in (phone.phone_number, '+98 912 000 0001', str(phone.msisdn)):
+            response = self.client.get('/admin/app/rechargesale/', {'q': term})
+            self.assertEqual(set(response.context['cl'].result_list), expected, term)
+
+        sale = RechargeSale.objects.order_by('id').first()
+        response = self.client.get('/admin/app/rechargesale/', {'q': str(sale.id)})
+        self.assertEqual(list(response.context['cl'].result_list), [sale])
+        # past the id range: neither an id nor a phone number
+        response = self.client.get('/admin/app/rechargesale/', {'q': '9' * 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_paginator_estimates_unfiltered_counts(self):
+        self.charge(5)
+        queryset = CreditTransaction.objects.order_by('-id')
+
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.count_limit = 3
+        self.assertEqual(paginator.count, CreditTransaction.objects.order_by('-id').first().id)
+
+        filtered = EstimatedCountPaginator(queryset.filter(seller=self.seller), 2)
+        filtered.count_limit = 3
+        self.assertEqual(filtered.count, 3)
@@ -0,0 +1,79 @@
+import os
+import django
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, RechargeSale
+from app.services import metrics
+from app.services.admission import AdmissionRejected, LocalAdmissionBackend, SQLiteAdmissionBackend
+
+
+class AdmissionControlTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = Seller.objects.create(name="Flooding Seller", balance=Decimal('1000.00'))
+        self.other = Seller.objects.create(name="Quiet Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000003", is_active=True)
+        metrics.reset()
+
+    def charge(self, seller):
+        return self.client.post(
+            f'/api/sellers/{seller.id}/charge/', {'phone_number_id': self.phone.id, 'amount': '1.00'}, format='json'
+        )
+
+    def test_rate_limit_returns_429(self):
+        backend = LocalAdmissionBackend(rate=0.5, burst=3, max_in_flight=0)
+        with mock.patch('app.views.get_admission_backend', return_value=backend):
+            codes = [self.charge(self.seller).status_code for _ in range(5)]
+            rejected = self.charge(self.seller)
+            # other sellers have their own bucket
+            self.assertEqual(self.charge(self.other).status_code, 201)
+
+        self.assertEqual(codes, [201, 201, 201, 429, 429])
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(int(rejected['Retry-After']), 2)
+        self.assertEqual(RechargeSale.objects.filter(seller=self.seller).count(), 3)
+        self.assertEqual(metrics.snapshot()['admission.rejected.rate'], 3)
+
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.data['counters']['admission.admitted'], 4)
+
+    def test_in_flight_cap_and_release_on_error(self):
+        backend = LocalAdmissionBackend(rate=0, burst=0, max_in_flight=1)
+        held = backend.acquire(self.seller.id)
+        with mock.patch('app.views.get_admission_backend', return_value=backend):
+            self.assertEqual(self.charge(self.seller).status_code, 429)
+            backend.release(self.seller.id, held)
+
+            # failed charges hand their slot back too
+            missing = self.client.post(
+                f'/api/sellers/{self.seller.id}/charge/', {'phone_number_id': 999999, 'amount': '1.00'}, format='json'
+            )
+            self.assertEqual(missing.status_code, 404)
+            self.assertEqual(self.charge(self.seller).status_code, 201)
+        self.assertEqual(backend.in_flight(), 0)
+
+    def test_sqlite_backend_is_shared(self):
+        path = Path(tempfile.mkdtemp()) / 'admission.sqlite3'
+        first = SQLiteAdmissionBackend(path=path, rate=1, burst=2, max_in_flight=2)
+        second = SQLiteAdmissionBackend(path=path, rate=1, burst=2, max_in_flight=2)
+
+        ticket = first.acquire(1)
+        second.acquire(1)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            second.acquire(1)
+        self.assertEqual(rejected.exception.reason, 'concurrency')
+
+        first.release(1, ticket)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            first.acquire(1)
+        self.assertEqual(rejected.exception.reason, 'rate')
+        self.assertEqual(second.in_flight(), 1)
@@ -0,0 +1,100 @@
+import os
+import django
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from app.models import Seller, PhoneNumber
+from app.services import audit_log, metrics
+from app.services.audit_log import RejectionEvent
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService, InsufficientBalanceError, InvalidCreditRequestError
+from app.services.phone_directory import PhoneDirectory
+
+
+class AuditLogTestCase(TransactionTestCase):
+
+    def setUp(self):
+        PhoneDirectory.clear()
+        metrics.reset()
+        self.directory = tempfile.mkdtemp(prefix='audit-test-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(AUDIT_LOG_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # earlier tests' events go to the old file; ours start a new one here
+        audit_log.reopen()
+        self.addCleanup(audit_log.reopen)
+
+        self.seller = Seller.objects.create(name="Audited Seller", balance=Decimal('100.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000020", is_active=True)
+
+    def events(self):
+        audit_log.flush()
+        lines = []
+        for path in sorted(Path(self.directory).glob('audit-*.jsonl')):
+            lines += [json.loads(line) for line in path.read_text().splitlines()]
+        return lines
+
+    def test_charge_approval_and_rejections_are_written_as_json_lines(self):
+        sale = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('30.00'))
+        with self.assertRaises(InsufficientBalanceError):
+            ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('500.00'))
+        request = CreditService.create_credit_request(self.seller.id, Decimal('40.00'))
+        CreditService.approve_credit_request(request.id)
+        with self.assertRaises(InvalidCreditRequestError):
+            CreditService.approve_credit_request(request.id)
+
+        charge, rejected_charge, approval, rejected_approval = self.events()
+        self.assertEqual(
+            {key: charge[key] for key in ('event', 'sale_id', 'seller_id', 'phone_number_id', 'amount', 'balance_after', 'status')},
+            {'event': 'charge', 'sale_id': sale.id, 'seller_id': self.seller.id, 'phone_number_id': self.phone.id,
+             'amount': '30.00', 'balance_after': '70.00', 'status': 'completed'}
+        )
+        self.assertIn('ts', charge)
+        self.assertEqual((rejected_charge['event'], rejected_charge['operation'], rejected_charge['reason']),
+                         ('rejection', 'charge', 'InsufficientBalanceError'))
+        self.assertEqual((approval['event'], approval['request_id'], approval['balance_after']),
+                         ('approval', request.id, '110.00'))
+        self.assertEqual((rejected_approval['operation'], rejected_approval['subject_id'], rejected_approval['reason']),
+                         ('approve', request.id, 'InvalidCreditRequestError'))
+
+    def test_rolled_back_charge_is_not_audited(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('10.00'))
+                raise RuntimeError("outer transaction fails")
+
+        self.assertEqual(self.events(), [])
+
+    @override_settings(AUDIT_LOG_QUEUE_SIZE=3)
+    def test_full_queue_drops_and_counts_events(self):
+        before = audit_log.dropped()
+        # holding the writer lock keeps the writer thread from draining the queue meanwhile
+        with audit_log._write_lock:
+            for index in range(5):
+                audit_log.emit(RejectionEvent('charge', self.seller.id, index, None, 'Test', ''))
+
+        self.assertEqual(audit_log.dropped() - before, 2)
+        self.assertEqual(metrics.snapshot()['audit.dropped'], 2)
+        self.assertEqual([event['subject_id'] for event in self.events()], [0, 1, 2])
+
+    @override_settings(AUDIT_LOG_MAX_BYTES=1, AUDIT_LOG_MAX_FILES=2)
+    def test_files_rotate_by_size_and_old_ones_are_pruned(self):
+        # another worker's file, older than ours: never ours to delete
+        other = Path(self.directory) / f'audit-20000101T000000000000-{os.getpid() + 1}-000001.jsonl'
+        other.write_text('')
+        for index in range(4):
+            audit_log.emit(RejectionEvent('charge', self.seller.id, index, None, 'Test', ''))
+            audit_log.flush()
+
+        files = sorted(Path(self.directory).glob(f'audit-*-{os.getpid()}-*.jsonl'))
+        self.assertEqual([json.loads(path.read_text())['subject_id'] for path in files], [2, 3])
+        self.assertTrue(other.exists())
@@ -0,0 +1,93 @@
+import os
+import django
+import asyncio
+import threading
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from asgiref.sync import sync_to_async
+from django.test import TransactionTestCase
+from app.models import Seller, PhoneNumber
+from app.services.balance_events import LocalBalanceEventBackend, get_backend
+from app.services.charge_service import ChargeService
+from app.views import _balance_event_stream
+
+
+class LocalBackendTestCase(TransactionTestCase):
+
+    async def test_publish_from_worker_thread(self):
+        backend = LocalBalanceEventBackend()
+        subscription = backend.subscribe(1)
+        other = backend.subscribe(2)
+
+        thread = threading.Thread(target=backend.publish, args=(1, {'seller_id': 1, 'current_balance': '5.00'}))
+        thread.start()
+        thread.join()
+
+        payload = await asyncio.wait_for(subscription.get(), timeout=1)
+        self.assertEqual(payload['current_balance'], '5.00')
+        self.assertTrue(other.queue.empty())
+
+        subscription.close()
+        other.close()
+        self.assertEqual(backend.subscriber_count(), 0)
+
+    async def test_slow_subscriber_gets_latest_balance(self):
+        backend = LocalBalanceEventBackend()
+        subscription = backend.subscribe(1)
+        for balance in ('3.00', '2.00', '1.00'):
+            backend.publish(1, {'seller_id': 1, 'current_balance': balance})
+        await asyncio.sleep(0)
+
+        payload = await asyncio.wait_for(subscription.get(), timeout=1)
+        self.assertEqual(payload['current_balance'], '1.00')
+        self.assertTrue(subscription.queue.empty())
+        subscription.close()
+
+
+class BalanceStreamTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Stream Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000001", is_active=True)
+
+    async def test_charge_publishes_after_commit(self):
+        subscription = get_backend().subscribe(self.seller.id)
+        try:
+            await sync_to_async(ChargeService.charge_phone)(self.seller.id, self.phone.id, Decimal('100.00'))
+            payload = await asyncio.wait_for(subscription.get(), timeout=1)
+        finally:
+            subscription.close()
+
+        self.assertEqual(payload['current_balance'], '900.00')
+        self.assertEqual(payload['ledger_seq'], 2)
+
+    async def test_stream_starts_with_current_balance(self):
+        response = await self.async_client.get(f'/api/sellers/{self.seller.id}/balance/stream/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        first = await stream.__anext__()
+        await stream.aclose()
+
+        text = first.decode() if isinstance(first, bytes) else first
+        self.assertIn('event: balance', text)
+        self.assertIn('"current_balance": "1000.00"', text)
+
+    async def test_closing_stream_unsubscribes(self):
+        backend = LocalBalanceEventBackend()
+        subscription = backend.subscribe(self.seller.id)
+        stream = _balance_event_stream(subscription, {'seller_id': self.seller.id, 'current_balance': '1.00', 'ledger_seq': 1})
+
+        event = await stream.__anext__()
+        self.assertTrue(event.startswith('event: balance\n'))
+        self.assertNotIn('id:', event)
+        await stream.aclose()
+        self.assertEqual(backend.subscriber_count(), 0)
+
+    async def test_stream_unknown_seller(self):
+        response = await self.async_client.get('/api/sellers/999999/balance/stream/')
+        self.assertEqual(response.status_code, 404)
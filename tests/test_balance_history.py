@@ -0,0 +1,63 @@
+import os
+import django
+from decimal import Decimal
+from datetime import timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, CreditTransaction
+from app.services.credit_service import CreditService, SellerNotFoundError
+from app.services.charge_service import ChargeService
+
+
+class PointInTimeBalanceTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="History Seller", balance=Decimal('1000.00'))
+        self.other = Seller.objects.create(name="Other Seller", balance=Decimal('0.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000001", is_active=True)
+        self.client = APIClient()
+
+    def test_balance_at_follows_ledger(self):
+        before_sale = timezone.now()
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('100.00'))
+        after_sale = timezone.now()
+
+        self.assertEqual(CreditService.get_balance_at(self.seller.id, before_sale), Decimal('1000.00'))
+        self.assertEqual(CreditService.get_balance_at(self.seller.id, after_sale), Decimal('900.00'))
+
+        first = CreditTransaction.objects.filter(seller=self.seller).order_by('created_at').first()
+        self.assertEqual(
+            CreditService.get_balance_at(self.seller.id, first.created_at - timedelta(seconds=1)),
+            Decimal('0.00')
+        )
+
+    def test_balance_at_unknown_seller(self):
+        with self.assertRaises(SellerNotFoundError):
+            CreditService.get_balance_at(999999, timezone.now())
+
+    def test_batch_lookup_is_single_query(self):
+        at = timezone.now()
+        with self.assertNumQueries(1):
+            balances = CreditService.get_balances_at([self.seller.id, self.other.id, 999999], at)
+        self.assertEqual(balances, {self.seller.id: Decimal('1000.00'), self.other.id: Decimal('0.00')})
+
+    def test_balance_endpoints(self):
+        at = timezone.now().isoformat()
+        response = self.client.get(f'/api/sellers/{self.seller.id}/balance/', {'at': at})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], '1000.00')
+
+        response = self.client.get('/api/sellers/balances/', {'at': at, 'ids': f'{self.seller.id},{self.other.id}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row['seller_id']: row['balance'] for row in response.data},
+            {self.seller.id: '1000.00', self.other.id: '0.00'}
+        )
+
+        response = self.client.get(f'/api/sellers/{self.seller.id}/balance/', {'at': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
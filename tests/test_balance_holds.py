@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import django
+from decimal import Decimal
+from datetime import timedelta
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import OperationalError
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, BalanceHold, BalanceHoldStatus, CreditTransaction
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService, InsufficientBalanceError
+from app.services.hold_service import HoldService, HoldExpiredError, InvalidHoldStateError
+
+
+class BalanceHoldTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Hold Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000001", is_active=True)
+
+    def test_reserve_confirm(self):
+        hold = HoldService.reserve(self.seller.id, self.phone.id, Decimal('300.00'))
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.held_balance, Decimal('300.00'))
+        self.assertEqual(self.seller.available_balance, Decimal('700.00'))
+
+        # held money is not available to direct charges
+        with self.assertRaises(InsufficientBalanceError):
+            ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('800.00'))
+
+        sale = HoldService.confirm(hold.id)
+        self.seller.refresh_from_db()
+        self.assertEqual(sale.amount, Decimal('300.00'))
+        self.assertEqual(self.seller.balance, Decimal('700.00'))
+        self.assertEqual(self.seller.held_balance, Decimal('0.00'))
+        self.assertEqual(BalanceHold.objects.get(id=hold.id).recharge_sale_id, sale.id)
+        self.assertTrue(CreditService.verify_accounting_integrity(self.seller.id)['is_match'])
+
+        with self.assertRaises(InvalidHoldStateError):
+            HoldService.release(hold.id)
+
+    def test_release_and_expiry(self):
+        released = HoldService.reserve(self.seller.id, self.phone.id, Decimal('100.00'))
+        stale = HoldService.reserve(self.seller.id, self.phone.id, Decimal('200.00'), ttl_seconds=60)
+
+        HoldService.release(released.id)
+        self.assertEqual(HoldService.release_expired(now=timezone.now() + timedelta(seconds=61)), 1)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.held_balance, Decimal('0.00'))
+        self.assertEqual(self.seller.balance, Decimal('1000.00'))
+        self.assertEqual(BalanceHold.objects.get(id=stale.id).status, BalanceHoldStatus.EXPIRED)
+        self.assertEqual(CreditTransaction.objects.filter(seller=self.seller).count(), 1)
+
+    def test_expiry_sweep_retries_lock_conflicts(self):
+        holds = [HoldService.reserve(self.seller.id, self.phone.id, Decimal('100.00'), ttl_seconds=60) for _ in range(2)]
+        resolve = HoldService._resolve
+        conflicts = []
+
+        def locked_once(seller, hold, status):
+            if not conflicts:
+                conflicts.append(hold.id)
+                raise OperationalError('database is locked') from sqlite3.OperationalError('database is locked')
+            return resolve(seller, hold, status)
+
+        with mock.patch.object(HoldService, '_resolve', side_effect=locked_once):
+            self.assertEqual(HoldService.release_expired(now=timezone.now() + timedelta(seconds=61)), 2)
+
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(
+            set(BalanceHold.objects.filter(id__in=[hold.id for hold in holds]).values_list('status', flat=True)),
+            {BalanceHoldStatus.EXPIRED}
+        )
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.held_balance, Decimal('0.00'))
+
+    def test_confirm_after_expiry_releases(self):
+        hold = HoldService.reserve(self.seller.id, self.phone.id, Decimal('100.00'))
+        BalanceHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        with self.assertRaises(HoldExpiredError):
+            HoldService.confirm(hold.id)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.held_balance, Decimal('0.00'))
+
+    def test_hold_endpoints(self):
+        client = APIClient()
+        response = client.post(
+            f'/api/sellers/{self.seller.id}/holds/',
+            {'phone_number_id': self.phone.id, 'amount': '250.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        hold_id = response.data['id']
+
+        balance = client.get(f'/api/sellers/{self.seller.id}/balance/').data
+        self.assertEqual(balance['current_balance'], '1000.00')
+        self.assertEqual(balance['held_balance'], '250.00')
+        self.assertEqual(balance['available_balance'], '750.00')
+
+        response = client.post(f'/api/holds/{hold_id}/confirm/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['amount'], '250.00')
+
+        response = client.post(f'/api/holds/{hold_id}/release/')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,49 @@
+import os
+import django
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber
+from app.services.charge_service import ChargeService
+from app.services.hold_service import HoldService
+
+
+class ConditionalGetTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="ETag Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000003", is_active=True)
+        self.client = APIClient()
+
+    def test_history_not_modified_until_ledger_changes(self):
+        url = f'/api/sellers/{self.seller.id}/transactions/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        etag = first['ETag']
+
+        # one seller lookup, no transactions loaded
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('10.00'))
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data['total_count'], 2)
+
+    def test_balance_etag_follows_holds(self):
+        url = f'/api/sellers/{self.seller.id}/balance/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        HoldService.reserve(self.seller.id, self.phone.id, Decimal('10.00'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['held_balance'], '10.00')
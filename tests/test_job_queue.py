@@ -0,0 +1,101 @@
+import os
+import django
+from decimal import Decimal
+from datetime import timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+from app.models import Job, JobStatus, Seller, CreditRequest
+from app.services.credit_service import CreditService
+from app.services.job_queue import JobService
+
+CALLS = []
+
+
+def record(value):
+    CALLS.append(value)
+
+
+def explode():
+    raise RuntimeError("boom")
+
+
+class JobQueueTestCase(TransactionTestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_claims_by_priority_then_run_at_in_batches(self):
+        now = timezone.now()
+        low = JobService.enqueue('tests.test_job_queue.record', {'value': 'low'}, run_at=now - timedelta(minutes=5))
+        high = JobService.enqueue('tests.test_job_queue.record', {'value': 'high'}, priority=10)
+        older = JobService.enqueue('tests.test_job_queue.record', {'value': 'older'}, run_at=now - timedelta(minutes=10))
+
+        first = JobService.claim('w1', batch_size=2)
+        self.assertEqual([job.id for job in first], [high.id, older.id])
+        # claimed jobs are not handed to another worker
+        second = JobService.claim('w2', batch_size=10)
+        self.assertEqual([job.id for job in second], [low.id])
+        self.assertEqual(JobService.claim('w3'), [])
+
+        for job in first + second:
+            self.assertTrue(JobService.run(job))
+        self.assertEqual(CALLS, ['high', 'older', 'low'])
+        self.assertEqual(Job.objects.filter(status=JobStatus.DONE).count(), 3)
+
+    def test_scheduled_job_waits_for_run_at(self):
+        JobService.enqueue('tests.test_job_queue.record', {'value': 1}, run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(JobService.claim('w1'), [])
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = JobService.enqueue('tests.test_job_queue.explode', max_attempts=2)
+
+        [claimed] = JobService.claim('w1')
+        self.assertFalse(JobService.run(claimed, backoff_base=0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.QUEUED, 1))
+        self.assertIn('boom', job.last_error)
+
+        [claimed] = JobService.claim('w1')
+        self.assertFalse(JobService.run(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_expired_lease_is_claimed_again(self):
+        job = JobService.enqueue('tests.test_job_queue.record', {'value': 'again'})
+        [stale] = JobService.claim('crashed')
+        self.assertEqual(JobService.claim('w2', lease_seconds=60), [])
+
+        [claimed] = JobService.claim('w2', lease_seconds=0)
+        self.assertEqual(claimed.id, job.id)
+        self.assertTrue(JobService.run(claimed))
+        # the crashed worker's late outcome does not overwrite the new claim's
+        JobService.release([stale])
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.DONE)
+
+    def test_enqueue_on_commit_only_after_commit(self):
+        with transaction.atomic():
+            JobService.enqueue_on_commit('tests.test_job_queue.record', {'value': 'kept'})
+            self.assertEqual(Job.objects.count(), 0)
+        self.assertEqual(Job.objects.count(), 1)
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                JobService.enqueue_on_commit('tests.test_job_queue.record', {'value': 'dropped'})
+                raise RuntimeError("rollback")
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_approval_queues_ledger_check(self):
+        seller = Seller.objects.create(name="Job Seller", balance=Decimal('0.00'))
+        request = CreditRequest.objects.create(seller=seller, amount=Decimal('50.00'))
+        CreditService.approve_credit_request(request.id)
+
+        [job] = JobService.claim('w1')
+        self.assertEqual((job.task, job.payload), ('app.tasks.verify_seller_ledger', {'seller_id': seller.id}))
+        self.assertTrue(JobService.run(job))
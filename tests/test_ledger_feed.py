@@ -0,0 +1,81 @@
+import os
+import django
+from decimal import Decimal
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, CreditTransaction
+from app.services.credit_service import CreditService
+from app.services.charge_service import ChargeService
+from app.services.ledger_service import LedgerService
+
+
+class LedgerSequenceTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller1 = Seller.objects.create(name="Seller 1", balance=Decimal('1000.00'))
+        self.seller2 = Seller.objects.create(name="Seller 2", balance=Decimal('0.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000001", is_active=True)
+
+    def test_sequence_is_gap_free_per_seller(self):
+        for _ in range(3):
+            ChargeService.charge_phone(self.seller1.id, self.phone.id, Decimal('10.00'))
+        request = CreditService.create_credit_request(self.seller2.id, Decimal('500.00'))
+        CreditService.approve_credit_request(request.id)
+        ChargeService.charge_phone(self.seller2.id, self.phone.id, Decimal('10.00'))
+
+        for seller, expected in ((self.seller1, 4), (self.seller2, 2)):
+            sequences = list(
+                CreditTransaction.objects.filter(seller=seller).order_by('id').values_list('sequence', flat=True)
+            )
+            self.assertEqual(sequences, list(range(1, expected + 1)))
+            seller.refresh_from_db()
+            self.assertEqual(seller.ledger_seq, expected)
+
+    def test_change_feed_pages_forward(self):
+        for _ in range(4):
+            ChargeService.charge_phone(self.seller1.id, self.phone.id, Decimal('10.00'))
+
+        first = LedgerService.get_changes(since=0, limit=3)
+        self.assertEqual(len(first['changes']), 3)
+        self.assertTrue(first['has_more'])
+
+        rest = LedgerService.get_changes(since=first['next_since'], limit=3)
+        self.assertEqual(len(rest['changes']), 2)
+        self.assertFalse(rest['has_more'])
+
+        ids = [row['id'] for row in first['changes'] + rest['changes']]
+        self.assertEqual(ids, list(CreditTransaction.objects.order_by('id').values_list('id', flat=True)))
+
+        empty = LedgerService.get_changes(since=rest['next_since'])
+        self.assertEqual(empty['changes'], [])
+        self.assertEqual(empty['next_since'], rest['next_since'])
+
+    def test_change_feed_endpoint(self):
+        ChargeService.charge_phone(self.seller1.id, self.phone.id, Decimal('10.00'))
+
+        response = APIClient().get('/api/ledger/changes/', {'since': 0, 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['sequence'] for row in response.data['changes']], [1, 2])
+        self.assertEqual(response.data['changes'][1]['amount'], '-10.00')
+        self.assertFalse(response.data['has_more'])
+
+    def test_change_feed_stops_at_the_visibility_horizon(self):
+        for _ in range(3):
+            ChargeService.charge_phone(self.seller1.id, self.phone.id, Decimal('10.00'))
+        rows = list(CreditTransaction.objects.order_by('id'))
+        # as if a transaction that began before the third charge were still open
+        with mock.patch.object(LedgerService, '_visibility_horizon', return_value=rows[3].created_at):
+            held = LedgerService.get_changes(since=0, limit=2)
+            self.assertEqual([row['id'] for row in held['changes']], [row.id for row in rows[:2]])
+            self.assertTrue(held['has_more'])
+            held = LedgerService.get_changes(since=held['next_since'], limit=2)
+            self.assertEqual([row['id'] for row in held['changes']], [rows[2].id])
+            self.assertFalse(held['has_more'])
+
+        rest = LedgerService.get_changes(since=held['next_since'])
+        self.assertEqual([row['id'] for row in rest['changes']], [row.id for row in rows[3:]])
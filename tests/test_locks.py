@@ -0,0 +1,96 @@
+import os
+import django
+import threading
+import time
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, CreditRequest
+from app.services import metrics
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService, CreditRequestNotFoundError
+from app.services.hold_service import HoldService, HoldNotFoundError
+from app.services.locks import BalanceTransaction, LockOrderError, lock_stats, reset_lock_stats
+
+
+class BalanceLockTestCase(TransactionTestCase):
+
+    def setUp(self):
+        reset_lock_stats()
+        metrics.reset()
+        self.seller = Seller.objects.create(name="Locked Seller", balance=Decimal('1000.00'))
+        self.other = Seller.objects.create(name="Other Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000030", is_active=True)
+
+    def test_lock_order_is_enforced(self):
+        request = CreditRequest.objects.create(seller=self.seller, amount=Decimal('10.00'))
+        with self.assertRaises(LockOrderError):
+            with BalanceTransaction('default') as locks:
+                locks.lock(CreditRequest.objects, id=request.id)
+        with self.assertRaises(LockOrderError):
+            with BalanceTransaction('default') as locks:
+                locks.lock_seller(self.seller.id)
+                locks.lock_seller(self.other.id)
+
+    def test_child_rows_lock_their_seller_first(self):
+        request = CreditService.create_credit_request(self.other.id, Decimal('10.00'))
+        CreditService.approve_credit_request(request.id)
+        hold = HoldService.reserve(self.seller.id, self.phone.id, Decimal('5.00'))
+        HoldService.release(hold.id)
+
+        with self.assertRaises(CreditRequestNotFoundError):
+            CreditService.approve_credit_request(999999)
+        with self.assertRaises(HoldNotFoundError):
+            HoldService.release(999999)
+
+        transactions = {row['seller_id']: row['transactions'] for row in lock_stats()}
+        self.assertEqual(transactions, {self.other.id: 1, self.seller.id: 2})
+        self.assertEqual(metrics.snapshot()['locks.transactions'], 3)
+
+    def test_waits_are_timed_per_seller(self):
+        def slow_lock(execute, sql, params, many, context):
+            # stands in for a row lock held by another transaction
+            if sql.startswith('SELECT') and 'FROM "seller"' in sql:
+                time.sleep(0.1)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(slow_lock):
+            ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('1.00'))
+        ChargeService.charge_phone(self.other.id, self.phone.id, Decimal('1.00'))
+
+        slow, fast = lock_stats()
+        self.assertEqual((slow['seller_id'], fast['seller_id']), (self.seller.id, self.other.id))
+        self.assertGreaterEqual(slow['max_wait_seconds'], 0.1)
+        self.assertLess(fast['max_wait_seconds'], 0.1)
+        self.assertEqual(metrics.snapshot()['locks.slow_waits'], 1)
+
+        response = APIClient().get('/api/metrics/')
+        self.assertEqual([row['seller_id'] for row in response.data['lock_waits']], [self.seller.id, self.other.id])
+
+    def test_hold_time_covers_the_whole_transaction(self):
+        locked = threading.Event()
+
+        def hold_seller_lock():
+            try:
+                with BalanceTransaction('default') as locks:
+                    locks.lock_seller(self.seller.id)
+                    locked.set()
+                    time.sleep(0.3)
+            finally:
+                connections.close_all()
+
+        holder = threading.Thread(target=hold_seller_lock)
+        holder.start()
+        locked.wait(5)
+        # waits for the holder (SQLite: for its write lock; PostgreSQL: for the seller row)
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('1.00'))
+        holder.join()
+
+        stats = lock_stats()[0]
+        self.assertEqual((stats['seller_id'], stats['transactions']), (self.seller.id, 2))
+        self.assertGreaterEqual(stats['held_seconds'], 0.3)
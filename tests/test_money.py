@@ -0,0 +1,56 @@
+import os
+import django
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TransactionTestCase
+from app.fields import to_minor_units, from_minor_units
+from app.models import Seller, PhoneNumber, CreditTransaction
+from app.serializers import CreditTransactionSerializer
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService
+
+
+class MoneyFieldTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Money Seller", balance=Decimal('1000.10'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000001", is_active=True)
+
+    def test_minor_unit_conversion(self):
+        self.assertEqual(to_minor_units(Decimal('12.34')), 1234)
+        self.assertEqual(to_minor_units('0.01'), 1)
+        self.assertEqual(from_minor_units(1234), Decimal('12.34'))
+        self.assertEqual(str(from_minor_units(100000000)), '1000000.00')
+
+    def test_stored_as_integer_minor_units(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT balance FROM seller WHERE id = %s", [self.seller.id])
+            self.assertEqual(cursor.fetchone()[0], 100010)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.balance, Decimal('1000.10'))
+        self.assertTrue(Seller.objects.filter(balance__gte=Decimal('1000.10')).exists())
+        self.assertFalse(Seller.objects.filter(balance__gt=Decimal('1000.10')).exists())
+
+    def test_sums_are_exact(self):
+        for _ in range(10):
+            ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('0.10'))
+
+        total = CreditTransaction.objects.filter(seller=self.seller).aggregate(total=Sum('amount'))['total']
+        self.assertEqual(total, Decimal('999.10'))
+
+        result = CreditService.verify_accounting_integrity(self.seller.id)
+        self.assertTrue(result['is_match'])
+        self.assertEqual(result['transaction_count'], 11)
+
+    def test_api_shape_unchanged(self):
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('0.10'))
+        row = CreditTransaction.objects.filter(seller=self.seller).order_by('-id').first()
+        data = CreditTransactionSerializer(row).data
+        self.assertEqual(data['amount'], '-0.10')
+        self.assertEqual(data['balance_after'], '1000.00')
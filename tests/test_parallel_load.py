@@ -11,6 +11,7 @@ from django.test import TransactionTestCase
 from app.models import Seller, PhoneNumber
 from app.services.credit_service import CreditService
 from app.services.charge_service import ChargeService
+from app.services import metrics
 
 
 class ParallelLoadTest(TransactionTestCase):
@@ -55,8 +56,11 @@ class ParallelLoadTest(TransactionTestCase):
         print(f"  Final balance: {self.seller.balance}")
         print(f"  Accounting match: {result['is_match']}")
         print(f"  Transaction count: {result['transaction_count']}")
+        print(f"  Conflict retries: {metrics.snapshot().get('db_retry.retries', 0)}")
         
         self.assertTrue(result['is_match'], "Accounting integrity failed under thread load")
+        # lock conflicts are retried inside the service, none surface as failed charges
+        self.assertEqual(sum(results), len(results))
     
     def test_process_based_parallel_load(self):
        
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import django
+from io import StringIO
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from app.models import PhoneNumber
+from app.services.phone_import import PhoneImportService
+
+
+class PhoneImportTestCase(TransactionTestCase):
+
+    def test_import_dedupes_and_toggles(self):
+        PhoneNumber.objects.create(phone_number="09120000001", is_active=True)
+        lines = [
+            "phone_number,active\n",
+            "09120000001,0\n",        # known: deactivated
+            "+98 912 000 0002\n",
+            "0912-000-0002\n",        # same number again
+            "9120000003,yes\n",
+            "not-a-number\n",
+            "\n",
+        ] + [f"0913{i:07d}\n" for i in range(25)]
+
+        result = PhoneImportService.import_lines(lines, batch_size=10)
+        self.assertEqual(
+            (result.rows, result.inserted, result.existing, result.toggled, result.duplicates, result.invalid),
+            (30, 27, 1, 1, 1, 1)
+        )
+        self.assertEqual(PhoneNumber.objects.count(), 28)
+        self.assertFalse(PhoneNumber.objects.get(msisdn=989120000001).is_active)
+
+        # again: nothing new, every listed number forced active
+        again = PhoneImportService.import_lines(lines, batch_size=10, active=True)
+        self.assertEqual((again.inserted, again.existing, again.toggled), (0, 28, 1))
+        self.assertEqual(PhoneNumber.objects.filter(is_active=True).count(), 28)
+
+    def test_command_and_upload(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("".join(f"0914{i:07d}\n" for i in range(100)))
+        try:
+            out = StringIO()
+            call_command('import_phones', f.name, '--batch-size', '30', stdout=out)
+        finally:
+            os.unlink(f.name)
+        self.assertIn('100 inserted', out.getvalue())
+
+        upload = SimpleUploadedFile('phones.csv', b"09140000000\n09150000000\n", content_type='text/csv')
+        response = APIClient().post('/api/admin/phones/import/', {'file': upload, 'active': 'false'}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['inserted'], response.data['toggled']), (1, 1))
+        self.assertEqual(PhoneNumber.objects.filter(is_active=False).count(), 2)
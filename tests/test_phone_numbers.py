@@ -0,0 +1,72 @@
+import os
+import django
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from app.fields import normalize_msisdn
+from app.models import Seller, PhoneNumber, RechargeSale
+from app.services.charge_service import ChargeService, InvalidPhoneNumberError, PhoneNumberInactiveError, PhoneNumberNotFoundError
+from app.services.phone_directory import PhoneDirectory
+
+
+class NormalizeMsisdnTestCase(SimpleTestCase):
+
+    def test_formats(self):
+        for value in ('09120000001', '+98 912 000 0001', '0098-912-000-0001', '9120000001', '989120000001', 989120000001):
+            self.assertEqual(normalize_msisdn(value), 989120000001)
+        self.assertEqual(normalize_msisdn('+44 20 7946 0958'), 442079460958)
+
+    def test_invalid(self):
+        for value in ('', '12', 'not a number', '+1234567890123456'):
+            with self.assertRaises(ValueError):
+                normalize_msisdn(value)
+
+
+class ChargeByNumberTestCase(TransactionTestCase):
+
+    def setUp(self):
+        PhoneDirectory.clear()
+        self.seller = Seller.objects.create(name="Number Seller", balance=Decimal('100.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="0912 000 0007", is_active=True)
+        self.client = APIClient()
+
+    def test_same_number_in_another_format_is_a_duplicate(self):
+        self.assertEqual(self.phone.msisdn, 989120000007)
+        with self.assertRaises(IntegrityError):
+            PhoneNumber.objects.create(phone_number="+989120000007")
+
+    def test_charge_by_number_over_api(self):
+        url = f'/api/sellers/{self.seller.id}/charge/'
+        response = self.client.post(url, {'phone_number': '+98 912 000 0007', 'amount': '10.00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['phone_number_id'], self.phone.id)
+
+        self.assertEqual(self.client.post(url, {'phone_number': '09129999999', 'amount': '1.00'}, format='json').status_code, 404)
+        self.assertEqual(self.client.post(url, {'phone_number': 'abc', 'amount': '1.00'}, format='json').status_code, 400)
+        with self.assertRaises(InvalidPhoneNumberError):
+            ChargeService.charge_phone_number(self.seller.id, 'abc', Decimal('1.00'))
+        both = {'phone_number': '09120000007', 'phone_number_id': self.phone.id, 'amount': '1.00'}
+        self.assertEqual(self.client.post(url, both, format='json').status_code, 400)
+
+    def test_cached_number_needs_no_phone_query(self):
+        ChargeService.charge_phone_number(self.seller.id, '09120000007', Decimal('1.00'))
+        # warm: BEGIN, seller lock, balance update, sale, ledger row, sale refresh, COMMIT
+        with self.assertNumQueries(7):
+            ChargeService.charge_phone_number(self.seller.id, '09120000007', Decimal('1.00'))
+        self.assertEqual(RechargeSale.objects.filter(phone_number=self.phone).count(), 2)
+
+    def test_deactivation_drops_cache_entry(self):
+        ChargeService.charge_phone_number(self.seller.id, '09120000007', Decimal('1.00'))
+        self.phone.is_active = False
+        self.phone.save()
+        with self.assertRaises(PhoneNumberInactiveError):
+            ChargeService.charge_phone_number(self.seller.id, '09120000007', Decimal('1.00'))
+        phone_id = self.phone.id
+        self.phone.delete()
+        with self.assertRaises(PhoneNumberNotFoundError):
+            ChargeService.charge_phone(self.seller.id, phone_id, Decimal('1.00'))
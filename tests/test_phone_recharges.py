@@ -0,0 +1,72 @@
+import os
+import django
+from decimal import Decimal
+from datetime import timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, RechargeSale
+
+
+class PhoneRechargesTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.sellers = [Seller.objects.create(name=f"Seller {i}") for i in range(2)]
+        self.phone = PhoneNumber.objects.create(phone_number="09120000008")
+        other = PhoneNumber.objects.create(phone_number="09120000009")
+        now = timezone.now()
+        sales = []
+        for i in range(11):
+            # pairs share a timestamp: the id breaks the tie
+            sales.append(RechargeSale(
+                seller=self.sellers[i % 2], phone_number=self.phone, amount=Decimal(f'{i + 1}.00')
+            ))
+            sales.append(RechargeSale(seller=self.sellers[0], phone_number=other, amount=Decimal('1.00')))
+        RechargeSale.objects.bulk_create(sales)
+        for index, sale in enumerate(RechargeSale.objects.filter(phone_number=self.phone).order_by('id')):
+            RechargeSale.objects.filter(id=sale.id).update(created_at=now - timedelta(seconds=index // 2))
+        self.client = APIClient()
+
+    def fetch_all(self, url, **params):
+        rows, cursor = [], None
+        while True:
+            query = {**params, 'limit': 3, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200)
+            rows += response.data['recharges']
+            cursor = response.data['next_cursor']
+            if not response.data['has_more']:
+                self.assertIsNone(cursor)
+                return rows
+
+    def test_keyset_pages_cover_every_recharge_newest_first(self):
+        rows = self.fetch_all('/api/phones/+989120000008/recharges/')
+        expected = list(
+            RechargeSale.objects.filter(phone_number=self.phone).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertEqual(set(rows[0]), {'id', 'seller_id', 'amount', 'status', 'created_at'})
+
+        seller_rows = self.fetch_all('/api/phones/09120000008/recharges/', seller_id=self.sellers[1].id)
+        self.assertEqual(len(seller_rows), 5)
+        self.assertTrue(all(row['seller_id'] == self.sellers[1].id for row in seller_rows))
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/phones/09129999999/recharges/').status_code, 404)
+        self.assertEqual(self.client.get('/api/phones/abc/recharges/').status_code, 400)
+        self.assertEqual(self.client.get('/api/phones/09120000008/recharges/', {'cursor': 'bogus'}).status_code, 400)
+
+    def test_page_uses_composite_index(self):
+        with connection.cursor() as cursor:
+            sql, params = RechargeSale.objects.filter(phone_number_id=self.phone.id).order_by(
+                '-created_at', '-id'
+            ).values('id')[:51].query.sql_with_params()
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('recharge_phone_created_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
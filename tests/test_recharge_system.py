@@ -155,6 +155,8 @@ class ParallelLoadTestCase(TransactionTestCase):
             ]
             results = [f.result() for f in futures]
         
+        self.assertEqual(results, [True] * 100)
+        
         # verify balance
         self.seller.refresh_from_db()
         expected_balance = Decimal('1000000.00') - (Decimal('100') * Decimal('1000.00'))
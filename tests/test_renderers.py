@@ -0,0 +1,56 @@
+import os
+import django
+from decimal import Decimal
+from datetime import datetime, timezone as dt_timezone
+from io import BytesIO
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from app import renderers
+from app.renderers import FastJSONParser, FastJSONRenderer
+from app.serializers import FastDateTimeField, MoneyDecimalField
+
+
+class FastJSONTestCase(SimpleTestCase):
+    payload = {
+        'amount': Decimal('12.50'),
+        'created_at': datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+        'name': 'فروشنده\u2028line\u2029',
+        'nested': [{'id': 1, 'ok': True, 'none': None}],
+        1: 'int key',
+    }
+
+    def test_same_bytes_as_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_stdlib_fallback(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+            self.assertEqual(FastJSONParser().parse(BytesIO(b'{"a": 1}')), {'a': 1})
+
+    def test_parser(self):
+        body = '{"amount": "5000.00", "phone_number_id": 1, "note": "سلام"}'.encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"amount": '))
+
+    def test_fields_match_drf(self):
+        money, decimal_field = MoneyDecimalField(), serializers.DecimalField(max_digits=15, decimal_places=2)
+        for value in (Decimal('0E-2'), Decimal('12.30'), Decimal('7'), Decimal('1.005'), 3):
+            self.assertEqual(money.to_representation(value), decimal_field.to_representation(value))
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'COERCE_DECIMAL_TO_STRING': False}):
+            self.assertEqual(MoneyDecimalField().to_representation(Decimal('12.30')), Decimal('12.30'))
+        self.assertEqual(MoneyDecimalField(coerce_to_string=False).to_representation(Decimal('12.30')), Decimal('12.30'))
+
+        fast, drf = FastDateTimeField(), serializers.DateTimeField()
+        value = self.payload['created_at']
+        self.assertEqual(fast.to_representation(value), drf.to_representation(value))
+        self.assertEqual(fast.to_representation(value), '2026-01-02T03:04:05.123456Z')
@@ -0,0 +1,83 @@
+import os
+import django
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from app.db_routing import REPLICA_DB_ALIAS, primary_pin_scope, replica_reads, sync_sqlite_replica
+from app.models import Seller, PhoneNumber
+from app.services.charge_service import ChargeService
+
+
+class ReplicaFallbackTestCase(TransactionTestCase):
+
+    def test_falls_back_to_primary_without_replica(self):
+        seller = Seller.objects.create(name="Primary Seller", balance=Decimal('1000.00'))
+        with replica_reads():
+            self.assertEqual(Seller.objects.all().db, 'default')
+        response = APIClient().get(f'/api/sellers/{seller.id}/balance/')
+        self.assertEqual(response.data['current_balance'], '1000.00')
+
+
+class ReplicaRoutingTestCase(TransactionTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # a second SQLite file standing in for a streaming replica; added after class setup
+        # because the test runner only knows the aliases in settings.DATABASES
+        path = Path(tempfile.mkdtemp()) / 'replica.sqlite3'
+        connections.settings[REPLICA_DB_ALIAS] = {**connections.settings['default'], 'NAME': str(path)}
+        cls.databases = {'default', REPLICA_DB_ALIAS}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = Seller.objects.create(name="Replica Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000004", is_active=True)
+        sync_sqlite_replica()
+
+    def test_read_paths_use_replica(self):
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('100.00'))
+
+        # replica has not caught up with the charge yet
+        response = self.client.get(f'/api/sellers/{self.seller.id}/balance/')
+        self.assertEqual(response.data['current_balance'], '1000.00')
+        with primary_pin_scope():
+            self.assertEqual(ChargeService.get_recharge_history(self.seller.id), [])
+        history = self.client.get(f'/api/sellers/{self.seller.id}/transactions/')
+        self.assertEqual(history.data['total_count'], 1)
+
+        sync_sqlite_replica()
+        response = self.client.get(f'/api/sellers/{self.seller.id}/balance/')
+        self.assertEqual(response.data['current_balance'], '900.00')
+        with primary_pin_scope():
+            self.assertEqual(len(ChargeService.get_recharge_history(self.seller.id)), 1)
+        verify = self.client.get(f'/api/sellers/{self.seller.id}/verify-accounting/')
+        self.assertTrue(verify.data['is_match'])
+
+        # reads outside the replica paths always see the primary
+        self.assertEqual(Seller.objects.all().db, 'default')
+
+    def test_sticky_to_primary_after_write(self):
+        with primary_pin_scope(), replica_reads():
+            self.assertEqual(Seller.objects.all().db, REPLICA_DB_ALIAS)
+            Seller.objects.filter(id=self.seller.id).update(name="Renamed")
+            self.assertEqual(Seller.objects.all().db, 'default')
+            self.assertEqual(Seller.objects.get(id=self.seller.id).name, "Renamed")
+
+        # the next request starts unpinned
+        with primary_pin_scope(), replica_reads():
+            self.assertEqual(Seller.objects.get(id=self.seller.id).name, "Replica Seller")
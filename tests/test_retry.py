@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import OperationalError, IntegrityError, transaction
+from django.test import TransactionTestCase
+from app.services import metrics
+from app.services.retry import is_transient_db_error, retry_on_conflict
+
+
+def locked_error():
+    try:
+        raise OperationalError('database is locked') from sqlite3.OperationalError('database is locked')
+    except OperationalError as e:
+        return e
+
+
+class PgError(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+def failing(times, result='done'):
+    # raises a lock conflict on the first `times` calls
+    calls = []
+
+    def func():
+        calls.append(1)
+        if times is None or len(calls) <= times:
+            raise locked_error()
+        return result
+    return func, calls
+
+
+class RetryOnConflictTestCase(TransactionTestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_transient_errors(self):
+        self.assertTrue(is_transient_db_error(locked_error()))
+        for pgcode in ('40001', '40P01', '55P03'):
+            with self.subTest(pgcode=pgcode):
+                error = OperationalError('conflict')
+                error.__cause__ = PgError(pgcode)
+                self.assertTrue(is_transient_db_error(error))
+        self.assertFalse(is_transient_db_error(IntegrityError('UNIQUE constraint failed')))
+        self.assertFalse(is_transient_db_error(ValueError('database is locked')))
+
+    def test_retries_until_success(self):
+        func, calls = failing(2)
+        wrapped = retry_on_conflict(func, base_delay=0.001)
+
+        self.assertEqual(wrapped(), 'done')
+        self.assertEqual(len(calls), 3)
+        counters = metrics.snapshot()
+        self.assertEqual(counters['db_retry.retries'], 2)
+        self.assertEqual(counters['db_retry.recovered'], 1)
+        self.assertGreater(counters['db_retry.seconds_lost'], 0)
+
+    def test_gives_up_after_budget(self):
+        func, calls = failing(None)
+        wrapped = retry_on_conflict(func, budget_seconds=0.05, base_delay=0.01, max_delay=0.01)
+
+        with self.assertRaises(OperationalError):
+            wrapped()
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(metrics.snapshot()['db_retry.gave_up'], 1)
+
+    def test_no_retry_inside_outer_transaction(self):
+        func, calls = failing(None)
+        wrapped = retry_on_conflict(func, base_delay=0.001)
+
+        with self.assertRaises(OperationalError), transaction.atomic():
+            wrapped()
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,73 @@
+import os
+import django
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from app.models import Seller
+from app.serializers import MAX_BATCH_SELLERS
+from app.services.credit_service import CreditService
+
+
+class SellerBalancesTestCase(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.sellers = [
+            Seller.objects.create(name=f"Sub-seller {i}", balance=Decimal(f'{i}00.00'), held_balance=Decimal('10.00'))
+            for i in range(1, 4)
+        ]
+        self.client = APIClient()
+
+    def test_many_sellers_in_one_query(self):
+        ids = [seller.id for seller in self.sellers]
+        with self.assertNumQueries(1):
+            balances = CreditService.get_balances(ids + [999999])
+        self.assertEqual(balances[ids[1]], ("Sub-seller 2", Decimal('200.00'), Decimal('10.00')))
+        self.assertNotIn(999999, balances)
+
+    def test_get_and_post_return_requested_order(self):
+        first, second, third = self.sellers
+        expected = [
+            {'seller_id': third.id, 'current_balance': '300.00', 'held_balance': '10.00',
+             'available_balance': '290.00', 'seller_name': "Sub-seller 3"},
+            {'seller_id': first.id, 'current_balance': '100.00', 'held_balance': '10.00',
+             'available_balance': '90.00', 'seller_name': "Sub-seller 1"},
+        ]
+
+        response = self.client.get('/api/sellers/balances/', {'ids': f'{third.id},999999,{first.id},{third.id}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+
+        response = self.client.post('/api/sellers/balances/', {'ids': [third.id, first.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+
+    def test_rejects_empty_and_oversized_lists(self):
+        self.assertEqual(self.client.post('/api/sellers/balances/', {'ids': []}, format='json').status_code, 400)
+        ids = list(range(1, MAX_BATCH_SELLERS + 2))
+        self.assertEqual(self.client.post('/api/sellers/balances/', {'ids': ids}, format='json').status_code, 400)
+        self.assertEqual(self.client.get('/api/sellers/balances/', {'ids': 'a,b'}).status_code, 400)
+
+    @override_settings(SELLER_BALANCES_CACHE_SECONDS=60)
+    def test_cached_reads_skip_the_database(self):
+        ids = [seller.id for seller in self.sellers]
+        CreditService.get_balances(ids[:2])
+        Seller.objects.filter(id=ids[0]).update(balance=Decimal('50.00'))
+
+        # the cached first two are served as they were read; only the third is queried
+        with self.assertNumQueries(1):
+            balances = CreditService.get_balances(ids, use_cache=True)
+        self.assertEqual(balances[ids[0]][1], Decimal('100.00'))
+        with self.assertNumQueries(0):
+            CreditService.get_balances(ids, use_cache=True)
+
+        # without cached, reads are current (and refresh the cache)
+        response = self.client.get('/api/sellers/balances/', {'ids': str(ids[0])})
+        self.assertEqual(response.json()[0]['current_balance'], '50.00')
+        response = self.client.get('/api/sellers/balances/', {'ids': str(ids[0]), 'cached': 'true'})
+        self.assertEqual(response.json()[0]['current_balance'], '50.00')
@@ -0,0 +1,33 @@
+import os
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import SimpleTestCase
+from app.management.commands.serve import Command, asgi_worker_class, gunicorn_application, gunicorn_config
+
+
+class ServeCommandTestCase(SimpleTestCase):
+
+    def build(self, *args):
+        options = vars(Command().create_parser('manage.py', 'serve').parse_args(list(args)))
+        app_path, config = gunicorn_config(options)
+        # loads every setting into gunicorn's own config, as `serve` does before running
+        return app_path, gunicorn_application(app_path, config).cfg
+
+    def test_wsgi_config(self):
+        app_path, cfg = self.build('--bind', '127.0.0.1:9000', '--workers', '3', '--threads', '4')
+        self.assertEqual(app_path, 'recharge_system.wsgi.application')
+        self.assertEqual(cfg.bind, ['127.0.0.1:9000'])
+        self.assertEqual((cfg.workers, cfg.threads, cfg.worker_class_str), (3, 4, 'gthread'))
+        self.assertTrue(cfg.preload_app)
+        self.assertEqual((cfg.max_requests, cfg.timeout), (10000, 30))
+
+    def test_asgi_config_resolves_the_uvicorn_worker(self):
+        app_path, cfg = self.build('--asgi', '--no-preload')
+        self.assertEqual(app_path, 'recharge_system.asgi.application')
+        self.assertEqual(cfg.worker_class_str, asgi_worker_class())
+        self.assertEqual(cfg.worker_class.__name__, 'UvicornWorker')
+        self.assertFalse(cfg.preload_app)
+        self.assertGreaterEqual(cfg.workers, 1)
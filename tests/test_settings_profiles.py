@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+ROOT = Path(__file__).resolve().parent.parent
+
+API_PROFILE_CHECK = """
+import django
+django.setup()
+from django.apps import apps
+from django.conf import settings
+from django.test import Client
+from django.urls import Resolver404, resolve
+
+assert not apps.is_installed('django.contrib.admin')
+assert not apps.is_installed('django.contrib.sessions')
+assert 'django.middleware.csrf.CsrfViewMiddleware' not in settings.MIDDLEWARE
+resolve('/api/sellers/1/balance/')
+try:
+    resolve('/admin/')
+    raise AssertionError('admin mounted in api profile')
+except Resolver404:
+    pass
+
+response = Client().post('/api/sellers/1/charge/', data='{}', content_type='application/json')
+assert response.status_code == 400, response.status_code
+print('ok')
+"""
+
+
+class ApiSettingsProfileTestCase(TestCase):
+
+    def test_api_profile_serves_api_without_admin(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='recharge_system.settings_api')
+        result = subprocess.run(
+            [sys.executable, '-c', API_PROFILE_CHECK],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'ok')
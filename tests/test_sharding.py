@@ -0,0 +1,169 @@
+import os
+import django
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from app.db_routing import SHARD_ID_SPAN, place_new_seller, shard_for_id
+from app.models import Seller, PhoneNumber, CreditTransaction, RechargeSale, SpendingCounter, SpendingCounterKind
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService, CreditServiceError
+from app.services.hold_service import HoldService
+from app.services.spending_limits import SpendingLimits, SpendingLimitExceededError, PHONE_DAILY_LIMIT_EXCEEDED
+
+SHARD = 'shard_1'
+
+
+@override_settings(SELLER_SHARDS=['default', SHARD])
+class ShardingTestCase(TransactionTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # second SQLite file as shard 1; added after class setup because the test runner
+        # only knows the aliases in settings.DATABASES
+        path = Path(tempfile.mkdtemp()) / 'shard_1.sqlite3'
+        connections.settings[SHARD] = {**connections.settings['default'], 'NAME': str(path)}
+        cls.databases = {'default', SHARD}
+        call_command('init_shards', verbosity=0, stdout=open(os.devnull, 'w'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[SHARD].close()
+        del connections[SHARD]
+        del connections.settings[SHARD]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.local = Seller.objects.create(name="Shard 0 Seller", balance=Decimal('1000.00'))
+        self.remote = Seller.objects.using(SHARD).create(name="Shard 1 Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000005", is_active=True)
+
+    def test_ids_name_their_shard(self):
+        self.assertLess(self.local.id, SHARD_ID_SPAN)
+        self.assertGreaterEqual(self.remote.id, SHARD_ID_SPAN)
+        self.assertEqual(shard_for_id(self.remote.id), SHARD)
+        # phone numbers are copied with the same id
+        self.assertTrue(PhoneNumber.objects.using(SHARD).filter(id=self.phone.id, phone_number="09120000005").exists())
+
+    def test_new_sellers_are_spread_over_the_shards(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        names = [f"Placed Seller {i}" for i in range(8)]
+        for name in names:
+            response = self.client.post('/admin/app/seller/add/', {
+                'name': name, 'balance': '10.00', 'held_balance': '0.00', 'ledger_seq': '0', '_continue': '1'
+            })
+            self.assertEqual(response.status_code, 302)
+            # the change page finds the seller on its shard
+            self.assertEqual(self.client.get(response['Location']).status_code, 200)
+
+        shards = {}
+        for db in ('default', SHARD):
+            for seller in Seller.objects.using(db).filter(name__in=names):
+                shards[seller.name] = db
+                self.assertEqual(shard_for_id(seller.id), db)
+                self.assertEqual(CreditTransaction.objects.using(db).filter(seller=seller).count(), 1)
+        self.assertEqual(shards, {name: place_new_seller(name) for name in names})
+        self.assertEqual(set(shards.values()), {'default', SHARD})
+
+        call_command('create_sample_data', stdout=open(os.devnull, 'w'))
+        self.assertTrue(Seller.objects.using(place_new_seller("Seller 1")).filter(name="Seller 1").exists())
+
+    def test_init_shards_copies_phone_numbers_in_chunks(self):
+        # bulk writes skip the replication signal, like rows written before the shard existed
+        PhoneNumber.objects.bulk_create([
+            PhoneNumber(phone_number=f"0912100000{i}", msisdn=989121000000 + i, is_active=True) for i in range(5)
+        ])
+        with mock.patch('app.management.commands.init_shards.PHONE_COPY_CHUNK', 2):
+            call_command('init_shards', verbosity=0, stdout=open(os.devnull, 'w'))
+
+        copied = PhoneNumber.objects.using(SHARD).values_list('id', 'msisdn')
+        self.assertEqual(sorted(copied), sorted(PhoneNumber.objects.values_list('id', 'msisdn')))
+
+    def test_seller_scoped_writes_stay_on_the_shard(self):
+        sale = ChargeService.charge_phone(self.remote.id, self.phone.id, Decimal('100.00'))
+        credit_request = CreditService.create_credit_request(self.remote.id, Decimal('500.00'))
+        CreditService.approve_credit_request(credit_request.id)
+        hold = HoldService.reserve(self.remote.id, self.phone.id, Decimal('50.00'))
+        confirmed = HoldService.confirm(hold.id)
+
+        for row_id in (sale.id, credit_request.id, hold.id, confirmed.id):
+            self.assertGreaterEqual(row_id, SHARD_ID_SPAN)
+        self.assertEqual(CreditTransaction.objects.using(SHARD).filter(seller_id=self.remote.id).count(), 4)
+        self.assertFalse(RechargeSale.objects.filter(seller_id=self.remote.id).exists())
+
+        response = self.client.get(f'/api/sellers/{self.remote.id}/balance/')
+        self.assertEqual(response.data['current_balance'], '1350.00')
+        balances = self.client.get('/api/sellers/balances/', {
+            'ids': f'{self.local.id},{self.remote.id}', 'at': '2100-01-01T00:00:00Z'
+        })
+        self.assertEqual(sorted(row['balance'] for row in balances.data), ['1000.00', '1350.00'])
+        feed = self.client.get('/api/ledger/changes/', {'shard': 1})
+        self.assertEqual(len(feed.data['changes']), 4)
+
+    def test_ledger_references_carry_shard_range_ids(self):
+        sale = ChargeService.charge_phone(self.remote.id, self.phone.id, Decimal('100.00'))
+        credit_request = CreditService.create_credit_request(self.remote.id, Decimal('500.00'))
+        CreditService.approve_credit_request(credit_request.id)
+
+        # 32-bit columns overflow at these ids on PostgreSQL
+        self.assertGreater(sale.id, 2 ** 31)
+        self.assertEqual(CreditTransaction._meta.get_field('reference_id').get_internal_type(), 'BigIntegerField')
+        references = CreditTransaction.objects.using(SHARD).order_by('sequence').values_list('reference_id', flat=True)
+        # the first row is the opening balance
+        self.assertEqual(list(references), [None, sale.id, credit_request.id])
+
+        feed = self.client.get('/api/ledger/changes/', {'shard': 1})
+        self.assertEqual([row['reference_id'] for row in feed.data['changes']], [None, sale.id, credit_request.id])
+        since = feed.data['next_since']
+        self.assertGreaterEqual(since, SHARD_ID_SPAN)
+        self.assertEqual(self.client.get('/api/ledger/changes/', {'shard': 1, 'since': since}).data['changes'], [])
+        self.assertEqual(self.client.get('/api/ledger/changes/', {'since': 2 ** 63}).status_code, 400)
+
+    @override_settings(PHONE_DAILY_TOPUP_LIMIT='50.00')
+    def test_phone_limit_counts_sellers_on_every_shard(self):
+        ChargeService.charge_phone(self.local.id, self.phone.id, Decimal('30.00'))
+        with self.assertRaises(SpendingLimitExceededError) as raised:
+            ChargeService.charge_phone(self.remote.id, self.phone.id, Decimal('30.00'))
+        self.assertEqual(raised.exception.code, PHONE_DAILY_LIMIT_EXCEEDED)
+
+        # the phone counter rolls back with the shard's charge
+        with mock.patch.object(ChargeService, 'record_sale', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(CreditServiceError), self.assertLogs('app.services.charge_service', 'ERROR'):
+                ChargeService.charge_phone(self.remote.id, self.phone.id, Decimal('20.00'))
+        self.assertEqual(SpendingLimits.spent('default', SpendingCounterKind.PHONE, self.phone.id), Decimal('30.00'))
+
+        ChargeService.charge_phone(self.remote.id, self.phone.id, Decimal('20.00'))
+        self.assertEqual(SpendingLimits.spent('default', SpendingCounterKind.PHONE, self.phone.id), Decimal('50.00'))
+        self.assertFalse(SpendingCounter.objects.using(SHARD).filter(kind=SpendingCounterKind.PHONE).exists())
+
+        # refunds and released holds give back to the same counter
+        other_phone = PhoneNumber.objects.create(phone_number="09120000006", is_active=True)
+        with override_settings(TOPUP_DISPATCH_ENABLED=True):
+            sale = ChargeService.charge_phone(self.remote.id, other_phone.id, Decimal('5.00'))
+        hold = HoldService.reserve(self.remote.id, other_phone.id, Decimal('45.00'))
+        self.assertEqual(SpendingLimits.spent('default', SpendingCounterKind.PHONE, other_phone.id), Decimal('50.00'))
+        ChargeService.refund_sale(sale.id)
+        HoldService.release(hold.id)
+        self.assertEqual(SpendingLimits.spent('default', SpendingCounterKind.PHONE, other_phone.id), Decimal('0.00'))
+
+    def test_reconciliation_per_shard(self):
+        ChargeService.charge_phone(self.remote.id, self.phone.id, Decimal('100.00'))
+        self.assertTrue(CreditService.verify_accounting_integrity(self.remote.id)['is_match'])
+        self.assertEqual(CreditService.find_accounting_mismatches(SHARD), [])
+
+        Seller.objects.using(SHARD).filter(id=self.remote.id).update(balance=Decimal('1.00'))
+        mismatches = CreditService.find_accounting_mismatches(SHARD)
+        self.assertEqual([row['id'] for row in mismatches], [self.remote.id])
+        self.assertEqual(mismatches[0]['calculated_balance'], Decimal('900.00'))
+        self.assertEqual(CreditService.find_accounting_mismatches('default'), [])
@@ -0,0 +1,129 @@
+import os
+import django
+from datetime import timedelta
+from decimal import Decimal
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.db import connection
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app.models import Seller, PhoneNumber, SpendingCounter, SpendingCounterKind
+from app.services.charge_service import ChargeService
+from app.services.hold_service import HoldService
+from app.services.phone_directory import PhoneDirectory
+from app.services.spending_limits import (
+    SpendingLimits,
+    SpendingLimitExceededError,
+    SELLER_DAILY_LIMIT_EXCEEDED,
+    PHONE_DAILY_LIMIT_EXCEEDED
+)
+
+
+class SpendingLimitTestCase(TransactionTestCase):
+
+    def setUp(self):
+        PhoneDirectory.clear()
+        self.client = APIClient()
+        self.seller = Seller.objects.create(name="Limited Seller", balance=Decimal('1000.00'))
+        self.other = Seller.objects.create(name="Other Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000040", is_active=True)
+        self.other_phone = PhoneNumber.objects.create(phone_number="09120000041", is_active=True)
+
+    def spent(self, kind, subject_id):
+        return SpendingLimits.spent('default', kind, subject_id)
+
+    @override_settings(SELLER_DAILY_SALES_LIMIT='100.00')
+    def test_seller_limit_refuses_the_charge_over_it(self):
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('60.00'))
+        ChargeService.charge_phone(self.seller.id, self.other_phone.id, Decimal('40.00'))
+
+        response = self.client.post(
+            f'/api/sellers/{self.seller.id}/charge/',
+            {'phone_number_id': self.phone.id, 'amount': '0.01'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['code'], SELLER_DAILY_LIMIT_EXCEEDED)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.balance, Decimal('900.00'))
+        self.assertEqual(self.spent(SpendingCounterKind.SELLER, self.seller.id), Decimal('100.00'))
+        # other sellers have their own counter
+        ChargeService.charge_phone(self.other.id, self.phone.id, Decimal('100.00'))
+
+    @override_settings(PHONE_DAILY_TOPUP_LIMIT='50.00')
+    def test_phone_limit_counts_every_seller(self):
+        # a seller's own sales limit does not change what the phone may receive
+        self.other.daily_sales_limit = Decimal('500.00')
+        self.other.save()
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('30.00'))
+        with self.assertRaises(SpendingLimitExceededError) as raised:
+            ChargeService.charge_phone(self.other.id, self.phone.id, Decimal('30.00'))
+        self.assertEqual(raised.exception.code, PHONE_DAILY_LIMIT_EXCEEDED)
+
+        ChargeService.charge_phone(self.other.id, self.phone.id, Decimal('20.00'))
+        ChargeService.charge_phone(self.other.id, self.other_phone.id, Decimal('50.00'))
+        self.assertEqual(self.spent(SpendingCounterKind.PHONE, self.phone.id), Decimal('50.00'))
+
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.balance, Decimal('930.00'))
+
+    @override_settings(SELLER_DAILY_SALES_LIMIT='10.00')
+    def test_seller_override_and_no_limit_costs_nothing(self):
+        self.seller.daily_sales_limit = Decimal('500.00')
+        self.seller.save()
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('200.00'))
+
+        with override_settings(SELLER_DAILY_SALES_LIMIT=None):
+            with CaptureQueriesContext(connection) as queries:
+                SpendingLimits.consume(self.other, self.phone.id, Decimal('5.00'))
+            self.assertEqual(len(queries), 0)
+
+    @override_settings(SELLER_DAILY_SALES_LIMIT='100.00')
+    def test_counted_charge_is_one_update(self):
+        SpendingLimits.consume(self.seller, self.phone.id, Decimal('1.00'))
+        with CaptureQueriesContext(connection) as queries:
+            SpendingLimits.consume(self.seller, self.phone.id, Decimal('1.00'))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE "spending_counters"'))
+
+    @override_settings(SELLER_DAILY_SALES_LIMIT='100.00', PHONE_DAILY_TOPUP_LIMIT='100.00')
+    def test_released_hold_gives_its_amount_back(self):
+        hold = HoldService.reserve(self.seller.id, self.phone.id, Decimal('80.00'))
+        with self.assertRaises(SpendingLimitExceededError):
+            ChargeService.charge_phone(self.seller.id, self.other_phone.id, Decimal('30.00'))
+
+        HoldService.release(hold.id)
+        self.assertEqual(self.spent(SpendingCounterKind.SELLER, self.seller.id), Decimal('0.00'))
+        self.assertEqual(self.spent(SpendingCounterKind.PHONE, self.phone.id), Decimal('0.00'))
+
+        hold = HoldService.reserve(self.seller.id, self.phone.id, Decimal('80.00'))
+        HoldService.confirm(hold.id)
+        self.assertEqual(self.spent(SpendingCounterKind.SELLER, self.seller.id), Decimal('80.00'))
+
+    @override_settings(SELLER_DAILY_SALES_LIMIT='100.00', PHONE_DAILY_TOPUP_LIMIT='100.00', TOPUP_DISPATCH_ENABLED=True)
+    def test_refunded_sale_gives_its_amount_back(self):
+        refunded = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('70.00'))
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('20.00'))
+
+        ChargeService.refund_sale(refunded.id, reason='rejected by operator')
+        self.assertEqual(self.spent(SpendingCounterKind.SELLER, self.seller.id), Decimal('20.00'))
+        self.assertEqual(self.spent(SpendingCounterKind.PHONE, self.phone.id), Decimal('20.00'))
+        ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('80.00'))
+
+    def test_purge_deletes_past_days(self):
+        today = timezone.localdate()
+        for days_ago in (0, 7, 8, 30):
+            SpendingCounter.objects.create(
+                kind=SpendingCounterKind.SELLER, subject_id=self.seller.id,
+                day=today - timedelta(days=days_ago), amount=Decimal('1.00')
+            )
+
+        call_command('purge_spending_counters', '--days', '7', stdout=open(os.devnull, 'w'))
+        days = sorted((today - day).days for day in SpendingCounter.objects.values_list('day', flat=True))
+        self.assertEqual(days, [0, 7])
@@ -0,0 +1,123 @@
+import os
+import asyncio
+import django
+from decimal import Decimal
+from datetime import timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recharge_system.settings')
+django.setup()
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from app.models import (
+    Seller, PhoneNumber, RechargeSale, RechargeSaleStatus, TopUpDispatch, TopUpDispatchStatus,
+    CreditTransaction, TransactionType
+)
+from app.services.charge_service import ChargeService
+from app.services.credit_service import CreditService
+from app.services.topup_dispatcher import TopUpDispatcher
+from app.services.topup_providers import BaseTopUpProvider, TopUpResult
+
+
+class ScriptedProvider(BaseTopUpProvider):
+    # answers each sale from a list of outcomes, one per attempt
+    max_batch_size = 10
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = outcomes
+        self.batches = []
+        self.numbers = set()
+
+    async def send(self, requests):
+        self.batches.append([request.sale_id for request in requests])
+        self.numbers.update(request.msisdn for request in requests)
+        results = []
+        for request in requests:
+            outcome = self.outcomes[request.sale_id].pop(0)
+            if outcome == 'ok':
+                results.append(TopUpResult(request.sale_id, ok=True, reference=f"ref-{request.sale_id}"))
+            else:
+                results.append(TopUpResult(request.sale_id, ok=False, error=outcome, retryable=outcome == 'timeout'))
+        return results
+
+
+@override_settings(TOPUP_DISPATCH_ENABLED=True)
+class TopUpDispatchTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Dispatch Seller", balance=Decimal('1000.00'))
+        self.phone = PhoneNumber.objects.create(phone_number="09120000002", is_active=True)
+
+    def drain(self, provider, **kwargs):
+        dispatcher = TopUpDispatcher(providers={'stub': provider}, poll_interval=0.01, backoff_base=0.0, **kwargs)
+        asyncio.run(dispatcher.run(until_idle=True))
+        return dispatcher
+
+    def test_charge_is_pending_until_dispatched(self):
+        sales = [ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('10.00')) for _ in range(15)]
+        self.assertTrue(all(sale.status == RechargeSaleStatus.PENDING for sale in sales))
+        self.assertEqual(TopUpDispatch.objects.filter(status=TopUpDispatchStatus.PENDING).count(), 15)
+
+        provider = ScriptedProvider({sale.id: ['ok'] for sale in sales})
+        dispatcher = self.drain(provider)
+
+        self.assertEqual(dispatcher.stats['completed'], 15)
+        self.assertEqual([len(batch) for batch in provider.batches], [10, 5])
+        self.assertEqual(provider.numbers, {989120000002})
+        self.assertEqual(RechargeSale.objects.filter(status=RechargeSaleStatus.COMPLETED).count(), 15)
+        dispatch = TopUpDispatch.objects.get(recharge_sale=sales[0])
+        self.assertEqual(dispatch.status, TopUpDispatchStatus.DONE)
+        self.assertEqual(dispatch.provider_reference, f"ref-{sales[0].id}")
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.balance, Decimal('850.00'))
+
+    def test_retry_then_refund(self):
+        retried = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('100.00'))
+        rejected = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('200.00'))
+        exhausted = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('300.00'))
+
+        provider = ScriptedProvider({
+            retried.id: ['timeout', 'ok'],
+            rejected.id: ['invalid number'],
+            exhausted.id: ['timeout', 'timeout', 'timeout'],
+        })
+        dispatcher = self.drain(provider, max_attempts=3)
+        self.assertEqual(dispatcher.stats['failed'], 2)
+
+        self.assertEqual(RechargeSale.objects.get(id=retried.id).status, RechargeSaleStatus.COMPLETED)
+        self.assertEqual(TopUpDispatch.objects.get(recharge_sale=retried).attempts, 2)
+        for sale in (rejected, exhausted):
+            self.assertEqual(RechargeSale.objects.get(id=sale.id).status, RechargeSaleStatus.FAILED)
+            self.assertEqual(TopUpDispatch.objects.get(recharge_sale=sale).status, TopUpDispatchStatus.FAILED)
+
+        # failed top-ups are credited back with their own ledger rows
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.balance, Decimal('900.00'))
+        refunds = CreditTransaction.objects.filter(seller=self.seller, transaction_type=TransactionType.RECHARGE_REFUND)
+        self.assertEqual(sorted(refunds.values_list('reference_id', flat=True)), [rejected.id, exhausted.id])
+        self.assertTrue(CreditService.verify_accounting_integrity(self.seller.id)['is_match'])
+
+    def test_stale_claim_is_retaken(self):
+        sale = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('10.00'))
+        # a dispatcher that crashed mid-send leaves its row in flight
+        TopUpDispatch.objects.filter(recharge_sale=sale).update(
+            status=TopUpDispatchStatus.IN_FLIGHT, claimed_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.drain(ScriptedProvider({sale.id: ['ok']}), lease_seconds=60)
+        self.assertEqual(RechargeSale.objects.get(id=sale.id).status, RechargeSaleStatus.COMPLETED)
+
+    def test_late_result_of_a_reclaimed_row_is_dropped(self):
+        sale = ChargeService.charge_phone(self.seller.id, self.phone.id, Decimal('10.00'))
+        slow = TopUpDispatcher(providers={}, lease_seconds=60)
+        rows = slow.claim(10)
+        # the slow dispatcher's lease runs out; another one takes the row and completes the sale
+        TopUpDispatch.objects.filter(recharge_sale=sale).update(claimed_at=timezone.now() - timedelta(minutes=5))
+        self.drain(ScriptedProvider({sale.id: ['ok']}), lease_seconds=60)
+
+        slow.apply_results(rows, [TopUpResult(sale.id, ok=False, error='invalid number', retryable=False)])
+        self.assertEqual(slow.stats['stale'], 1)
+        self.assertEqual(RechargeSale.objects.get(id=sale.id).status, RechargeSaleStatus.COMPLETED)
+        self.assertEqual(TopUpDispatch.objects.get(recharge_sale=sale).status, TopUpDispatchStatus.DONE)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.balance, Decimal('990.00'))